@@ -5,7 +5,6 @@ Scrapes pharmacy data from Cortico Health API and transforms it for NaviCare dat
 """
 
 import asyncio
-import aiohttp
 import logging
 from datetime import datetime, timezone
 from typing import Dict, List, Optional, Any
@@ -13,7 +12,18 @@ from dataclasses import dataclass
 import time
 from urllib.parse import urljoin
 
-from utils.supabase_client import SupabaseClient
+from utils.supabase_client import FRESHNESS_BUCKETS, SupabaseClient
+from utils.db_transport import DatabaseTransportProfile
+from utils.dead_letter import DeadLetterQueue
+from utils.page_writer import PageChildWriter, RowRejectedError
+from utils.bundle_ingest import build_facility_bundle, ingest_page_bundles
+from utils.copy_loader import create_copy_loader
+from utils.shadow_reload import create_shadow_loader, finish_shadow_reload
+from utils.db_health import PageWriteBuffer
+from utils.write_spool import WriteSpool, drain_spool, spool_page
+from utils.facility_sightings import SightingRecorder
+from utils.search_documents import SearchDocumentRefresher
+from utils.http_transport import TransportProfile, TransportStats, create_session, read_json
 from utils.data_transformer import DataValidator
 
 # Configure logging
@@ -31,6 +41,14 @@ class PharmacyCrawlConfig:
     max_concurrent: int = 3  # Conservative for Supabase API limits
     delay_between_requests: float = 1.0  # seconds
     max_retries: int = 3
+    dead_letter_path: Optional[str] = None  # quarantine file for failed records/pages
+    transport: Optional[TransportProfile] = None  # defaults to TransportProfile.from_env(max_concurrent)
+    ingest_mode: str = 'rows'  # 'rows', 'bundle' (one RPC per page, migrations/002), 'copy' (COPY via DATABASE_URL)
+                               # or 'shadow' (COPY into shadow tables swapped in after crawl_all, utils/shadow_reload.py)
+    page_buffer_size: int = 4  # fetched pages that may queue up while database writes are paused
+    spool_path: Optional[str] = None  # local spool for pages built while the database is unavailable
+    record_sightings: bool = False  # record seen facility ids for the retirement sweep (migrations/004)
+    build_search_documents: bool = False  # refresh written facilities' search documents at exit (migrations/008)
 
 class PharmacyTransformer:
     """Transforms Pharmacy API data to NaviCare format"""
@@ -137,7 +155,7 @@ class PharmacyTransformer:
     @staticmethod
     def transform_operating_hours(facility_id: str, operating_hours: Optional[Dict]) -> List[Dict]:
         """Transform operating hours map to facility hours records"""
-        from data_transformer import CorticoTransformer  # Import for helper methods
+        from utils.data_transformer import CorticoTransformer  # Import for helper methods
         return CorticoTransformer.transform_operating_hours(facility_id, operating_hours)
 
     @staticmethod
@@ -174,6 +192,14 @@ class PharmacyCrawler:
         self.config = config
         self.db_client = None
         self.session = None
+        self.dead_letters = DeadLetterQueue(config.dead_letter_path) if config.dead_letter_path else None
+        self.spool = WriteSpool(config.spool_path) if config.spool_path else None
+        self.transport_stats = TransportStats()
+        self.copy_loader = None
+        self.sightings: Optional[SightingRecorder] = None
+        self.search_documents: Optional[SearchDocumentRefresher] = None
+        # Set when crawl_all reaches the last page; the retirement sweep requires a complete crawl
+        self.crawl_complete = False
         self.stats = {
             'total_processed': 0,
             'facilities_created': 0,
@@ -183,31 +209,61 @@ class PharmacyCrawler:
             'errors': 0,
             'validation_errors': 0
         }
+        # Per-page wall-clock cost of page range crawls, used by the segment planner
+        self.page_costs: List[Dict] = []
 
     async def __aenter__(self):
         """Async context manager entry"""
-        # Initialize Supabase client
-        self.db_client = SupabaseClient()
+        # Initialize Supabase client with a connection pool sized to crawler concurrency
+        self.db_client = SupabaseClient(DatabaseTransportProfile.from_env(self.config.max_concurrent))
         
         # Test connection
         if not await self.db_client.test_connection():
             raise Exception("Failed to connect to Supabase")
-        
-        # Create HTTP session
-        timeout = aiohttp.ClientTimeout(total=30)
-        connector = aiohttp.TCPConnector(limit=self.config.max_concurrent)
-        self.session = aiohttp.ClientSession(timeout=timeout, connector=connector)
+        await self.db_client.sync_mirror()
+        if self.config.record_sightings:
+            self.sightings = SightingRecorder(self.db_client, 'pharmacy')
+        if self.config.build_search_documents:
+            self.search_documents = SearchDocumentRefresher(self.db_client)
+        
+        # Create HTTP session with connection reuse, DNS caching and compressed transfers
+        profile = self.config.transport or TransportProfile.from_env(self.config.max_concurrent)
+        self.session = create_session(profile, self.transport_stats)
+        
+        # Direct Postgres connection for the COPY bulk-load modes
+        if self.config.ingest_mode == 'copy':
+            self.copy_loader = create_copy_loader()
+        elif self.config.ingest_mode == 'shadow':
+            self.copy_loader = create_shadow_loader()
+        if self.copy_loader:
+            await self.copy_loader.open()
         
         logger.info("Pharmacy Crawler initialized successfully")
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         """Async context manager exit"""
+        # Write pages spooled during a database outage if it has recovered by now
+        if self.spool:
+            try:
+                await drain_spool(self)
+            except Exception as e:
+                logger.error(f"Error draining write spool: {e}")
+        if self.sightings:
+            await self.sightings.flush()
+        # Documents are built from the committed rows, after spooled pages and any sweep
+        if self.search_documents:
+            await self.search_documents.refresh()
         if self.session:
             await self.session.close()
+        if self.copy_loader:
+            await self.copy_loader.close()
+        
+        await self.db_client.drain_writes()
         
         # Print final statistics
         await self._print_final_stats()
+        self.db_client.close()
         
         logger.info(f"Pharmacy Crawler shutdown. Final stats: {self.stats}")
 
@@ -217,7 +273,7 @@ class PharmacyCrawler:
             try:
                 async with self.session.get(page_url) as response:
                     if response.status == 200:
-                        data = await response.json()
+                        data = await read_json(response, self.transport_stats)
                         return data
                     elif response.status == 429:
                         # Rate limited, wait longer
@@ -239,8 +295,8 @@ class PharmacyCrawler:
         self.stats['errors'] += 1
         return None
 
-    async def process_pharmacy(self, pharmacy_record: Dict):
-        """Process a single pharmacy record"""
+    async def process_pharmacy(self, pharmacy_record: Dict, page_writer: Optional[PageChildWriter] = None) -> bool:
+        """Process a single pharmacy record; False if processing failed (invalid records are not retried)"""
         try:
             # Transform pharmacy data
             facility_data = PharmacyTransformer.transform_pharmacy(pharmacy_record)
@@ -250,18 +306,14 @@ class PharmacyCrawler:
             if not is_valid:
                 logger.warning(f"Validation failed for pharmacy {facility_data.get('name')}: {validation_errors}")
                 self.stats['validation_errors'] += 1
-                return
-            
-            # Check if this is a new or updated facility
-            existing = await self.db_client.find_existing_facility(
-                facility_data.get('slug', ''),
-                facility_data.get('name', ''),
-                facility_data.get('city', ''),
-                facility_data.get('province', '')
-            )
+                return True
             
-            # Upsert facility (pass existing data to avoid duplicate query)
-            facility_id = await self.db_client.upsert_facility(facility_data, existing)
+            # Upsert facility; unchanged facilities are skipped via the facility mirror when enabled
+            facility_id, existing = await self.db_client.save_facility(facility_data, 'pharmacy')
+            if self.sightings:
+                self.sightings.saw(facility_id)
+            if self.search_documents:
+                self.search_documents.touched(facility_id)
             
             if existing:
                 self.stats['facilities_updated'] += 1
@@ -270,18 +322,32 @@ class PharmacyCrawler:
             
             # Process booking channels
             booking_channels = PharmacyTransformer.transform_booking_channels(facility_id, pharmacy_record)
-            for channel in booking_channels:
-                if await self.db_client.insert_booking_channel(channel):
-                    self.stats['booking_channels_created'] += 1
+            if page_writer is None:
+                for channel in booking_channels:
+                    if await self.db_client.insert_booking_channel(channel):
+                        self.stats['booking_channels_created'] += 1
             
-            # Process operating hours
-            await self.process_facility_hours(facility_id, pharmacy_record.get('operating_hours'))
+            if page_writer is None:
+                # Process operating hours
+                await self.process_facility_hours(facility_id, pharmacy_record.get('operating_hours'))
+            else:
+                # Child rows are written in bulk once the whole page has been processed
+                page_writer.add_facility(
+                    facility_id,
+                    booking_channels,
+                    hours=PharmacyTransformer.transform_operating_hours(facility_id, pharmacy_record.get('operating_hours')),
+                    record=pharmacy_record
+                )
             
             self.stats['total_processed'] += 1
+            return True
             
         except Exception as e:
             logger.error(f"Error processing pharmacy {pharmacy_record.get('name', 'Unknown')}: {e}")
             self.stats['errors'] += 1
+            if self.dead_letters:
+                self.dead_letters.record_failure('pharmacy', pharmacy_record, e)
+            return False
 
     async def process_facility_hours(self, facility_id: str, operating_hours: Optional[Dict]):
         """Process operating hours for a facility"""
@@ -296,15 +362,123 @@ class PharmacyCrawler:
         except Exception as e:
             logger.error(f"Error processing operating hours for facility {facility_id}: {e}")
 
-    async def crawl_page_range(self, start_page: int, end_page: int):
-        """Crawl a specific range of pages"""
+    async def _flush_page_writer(self, page_writer: PageChildWriter, page_url: str, page_number: int):
+        """Write the page's child rows in bulk; a failed table quarantines the whole page"""
+        await self.db_client.health.wait_until_writable()
+        try:
+            written = await page_writer.flush()
+            failed_tables = [table for table, count in written.items() if count is None]
+        except Exception as e:
+            logger.error(f"Error writing child rows for page {page_number}: {e}")
+            written, failed_tables = {}, ['child tables']
+        self.stats['booking_channels_created'] += written.get('booking_channels') or 0
+        self.stats['facility_hours_records_created'] += written.get('facility_hours') or 0
+        if failed_tables:
+            logger.error(f"Failed to write {', '.join(failed_tables)} for page {page_number}")
+            self.stats['errors'] += 1
+            if self.dead_letters:
+                self.dead_letters.page_failure('pharmacy', page_url, page_number,
+                                               error_class='ChildWriteFailed', error=', '.join(failed_tables))
+        # Rows rejected for their data were isolated; quarantine the records they came from
+        for facility_id, rejects in page_writer.rejects_by_facility().items():
+            self.stats['errors'] += 1
+            record = page_writer.records.get(facility_id)
+            if self.dead_letters and record is not None:
+                error = '; '.join(f"{reject['table']}: {reject['error']}" for reject in rejects)
+                self.dead_letters.record_failure('pharmacy', record, RowRejectedError(error))
+
+    def build_bundle(self, pharmacy_record: Dict) -> Optional[Dict]:
+        """Transform and validate a record into an ingest_facility_bundle payload; None if invalid"""
+        facility_data = PharmacyTransformer.transform_pharmacy(pharmacy_record)
+        
+        is_valid, validation_errors = DataValidator.validate_facility(facility_data)
+        if not is_valid:
+            logger.warning(f"Validation failed for pharmacy {facility_data.get('name')}: {validation_errors}")
+            return None
+        
+        return build_facility_bundle(
+            facility_data,
+            PharmacyTransformer.transform_booking_channels(None, pharmacy_record),
+            hours=PharmacyTransformer.transform_operating_hours(None, pharmacy_record.get('operating_hours'))
+        )
+
+    async def process_page(self, results: List[Dict], page_url: str, page_number: int):
+        """Process one page of records with the configured ingest mode"""
+        # While the database is unavailable, built pages go to the local spool (utils/write_spool.py)
+        if await spool_page(self, 'pharmacy', results, page_url, page_number, self.build_bundle):
+            return
+        
+        if self.config.ingest_mode in ('bundle', 'copy', 'shadow'):
+            # Facilities and all child rows for the page in one call (RPC or COPY + merge)
+            await self.db_client.health.wait_until_writable()
+            ingest = self.copy_loader.load if self.copy_loader else None
+            await ingest_page_bundles(self, 'pharmacy', results, self.build_bundle, ingest, page_url, page_number)
+            # Facilities new to a shadow reload only exist once it is swapped in
+            if self.sightings and self.config.ingest_mode != 'shadow':
+                await self.sightings.flush()
+            logger.info(f"Progress: {self.stats['total_processed']} processed, "
+                      f"{self.stats['facilities_created']} created, "
+                      f"{self.stats['facilities_updated']} updated, "
+                      f"{self.stats['errors']} errors")
+            return
+        
+        page_writer = PageChildWriter(self.db_client)
+        
+        # Process pharmacies in smaller batches to avoid overwhelming Supabase; batch size and
+        # concurrency shrink while the database is slow or overloaded (utils/db_health.py)
+        health = self.db_client.health
+        i = 0
+        while i < len(results):
+            batch = results[i:i + health.scaled(self.config.batch_size)]
+            i += len(batch)
+            
+            async def process_with_semaphore(record):
+                async with health.slot():
+                    await self.process_pharmacy(record, page_writer)
+            
+            tasks = [process_with_semaphore(record) for record in batch]
+            await asyncio.gather(*tasks, return_exceptions=True)
+            
+            # Progress logging
+            if self.stats['total_processed'] % 50 == 0:
+                logger.info(f"Progress: {self.stats['total_processed']} processed, "
+                          f"{self.stats['facilities_created']} created, "
+                          f"{self.stats['facilities_updated']} updated, "
+                          f"{self.stats['errors']} errors")
+            
+            # Rate limiting between batches
+            if self.config.delay_between_requests > 0:
+                await asyncio.sleep(self.config.delay_between_requests)
+        
+        await self._flush_page_writer(page_writer, page_url, page_number)
+        if self.sightings:
+            await self.sightings.flush()
+
+    async def _write_buffered_page(self, results: List[Dict], page_url: str, page_number: int, fetch_seconds: float):
+        """Write a page taken from the page buffer and record its cost for the segment planner"""
+        write_start_time = time.time()
+        await self.process_page(results, page_url, page_number)
+        self.page_costs.append({
+            'page': page_number,
+            'seconds': round(fetch_seconds + time.time() - write_start_time, 3),
+            'records': len(results)
+        })
+        logger.info(f"Completed page {page_number}")
+
+    async def crawl_page_range(self, start_page: int, end_page: int) -> List[int]:
+        """Crawl a specific range of pages; returns the page numbers that could not be fetched"""
+        if self.config.ingest_mode == 'shadow':
+            raise ValueError("The shadow ingest mode rebuilds whole tables; use crawl_all()")
         logger.info(f"Starting Pharmacy API crawl for pages {start_page} to {end_page}")
         start_time = time.time()
         
         processed_pages = 0
+        failed_pages: List[int] = []
+        buffer = PageWriteBuffer(self._write_buffered_page, self.config.page_buffer_size)
         
         # Process each page in the range
         for page_number in range(start_page, end_page + 1):
+            page_start_time = time.time()
             page_url = f"{self.config.base_url}?format=json&page={page_number}"
             logger.info(f"Fetching page {page_number}: {page_url}")
             
@@ -312,45 +486,28 @@ class PharmacyCrawler:
             page_data = await self.fetch_page(page_url)
             if not page_data:
                 logger.error(f"Failed to fetch page {page_number}, skipping")
+                failed_pages.append(page_number)
+                if self.dead_letters:
+                    self.dead_letters.page_failure('pharmacy', page_url, page_number)
                 continue
             
             # Process all records in this page
             results = page_data.get('results', [])
             logger.info(f"Processing {len(results)} pharmacies from page {page_number}")
             
-            # Process pharmacies in smaller batches to avoid overwhelming Supabase
-            for i in range(0, len(results), self.config.batch_size):
-                batch = results[i:i + self.config.batch_size]
-                
-                # Process batch concurrently but with limited concurrency
-                semaphore = asyncio.Semaphore(self.config.max_concurrent)
-                
-                async def process_with_semaphore(record):
-                    async with semaphore:
-                        await self.process_pharmacy(record)
-                
-                tasks = [process_with_semaphore(record) for record in batch]
-                await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Progress logging
-                if self.stats['total_processed'] % 50 == 0:
-                    logger.info(f"Progress: {self.stats['total_processed']} processed, "
-                              f"{self.stats['facilities_created']} created, "
-                              f"{self.stats['facilities_updated']} updated, "
-                              f"{self.stats['errors']} errors")
-                
-                # Rate limiting between batches
-                if self.config.delay_between_requests > 0:
-                    await asyncio.sleep(self.config.delay_between_requests)
+            # Written in the background, so fetching continues while database writes are paused
+            await buffer.put(results, page_url, page_number, time.time() - page_start_time)
             
             processed_pages += 1
-            logger.info(f"Completed page {page_number}")
             
             # Add a small delay between pages
             await asyncio.sleep(self.config.delay_between_requests)
         
+        await buffer.close()
+        
         elapsed = time.time() - start_time
         logger.info(f"Pharmacy crawl completed {processed_pages} pages in {elapsed:.2f} seconds")
+        return failed_pages
 
     async def crawl_all(self):
         """Main crawling method - processes all pages"""
@@ -359,6 +516,7 @@ class PharmacyCrawler:
         
         current_url = f"{self.config.base_url}?format=json"
         page_count = 0
+        buffer = PageWriteBuffer(self.process_page, self.config.page_buffer_size)
         
         while current_url:
             page_count += 1
@@ -368,36 +526,15 @@ class PharmacyCrawler:
             page_data = await self.fetch_page(current_url)
             if not page_data:
                 logger.error(f"Failed to fetch page {page_count}, stopping crawl")
+                if self.dead_letters:
+                    self.dead_letters.page_failure('pharmacy', current_url, page_count)
                 break
             
             # Process all records in this page
             results = page_data.get('results', [])
             logger.info(f"Processing {len(results)} pharmacies from page {page_count}")
             
-            # Process pharmacies in smaller batches to avoid overwhelming Supabase
-            for i in range(0, len(results), self.config.batch_size):
-                batch = results[i:i + self.config.batch_size]
-                
-                # Process batch concurrently but with limited concurrency
-                semaphore = asyncio.Semaphore(self.config.max_concurrent)
-                
-                async def process_with_semaphore(record):
-                    async with semaphore:
-                        await self.process_pharmacy(record)
-                
-                tasks = [process_with_semaphore(record) for record in batch]
-                await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Progress logging
-                if self.stats['total_processed'] % 50 == 0:
-                    logger.info(f"Progress: {self.stats['total_processed']} processed, "
-                              f"{self.stats['facilities_created']} created, "
-                              f"{self.stats['facilities_updated']} updated, "
-                              f"{self.stats['errors']} errors")
-                
-                # Rate limiting between batches
-                if self.config.delay_between_requests > 0:
-                    await asyncio.sleep(self.config.delay_between_requests)
+            await buffer.put(results, current_url, page_count)
             
             # Move to next page
             links = page_data.get('links', {})
@@ -405,7 +542,12 @@ class PharmacyCrawler:
             
             # Log page completion
             total_pages = page_data.get('total_pages', 'unknown')
-            logger.info(f"Completed page {page_count} of {total_pages}")
+            logger.info(f"Fetched page {page_count} of {total_pages}")
+        
+        await buffer.close()
+        self.crawl_complete = current_url is None
+        if self.config.ingest_mode == 'shadow':
+            await finish_shadow_reload(self)
         
         elapsed = time.time() - start_time
         logger.info(f"Pharmacy crawl completed in {elapsed:.2f} seconds")
@@ -420,6 +562,35 @@ class PharmacyCrawler:
         for key, value in self.stats.items():
             logger.info(f"{key.replace('_', ' ').title()}: {value}")
         
+        # Print HTTP transport stats
+        logger.info("\nHTTP TRANSPORT STATISTICS")
+        logger.info("-" * 30)
+        for key, value in self.transport_stats.summary().items():
+            logger.info(f"{key.replace('_', ' ').title()}: {value}")
+        
+        # Print database transport stats
+        logger.info("\nDATABASE TRANSPORT STATISTICS")
+        logger.info("-" * 30)
+        for key, value in self.db_client.transport_stats.summary().items():
+            logger.info(f"{key.replace('_', ' ').title()}: {value}")
+        if self.db_client.write_coalescer:
+            for key, value in self.db_client.write_coalescer.summary().items():
+                logger.info(f"{key.replace('_', ' ').title()}: {value}")
+        for key, value in self.db_client.health.summary().items():
+            logger.info(f"{key.replace('_', ' ').title()}: {value}")
+        if self.spool:
+            for key, value in self.spool.summary().items():
+                logger.info(f"{key.replace('_', ' ').title()}: {value}")
+        
+        # Print facility diff-write stats
+        logger.info("\nFACILITY UPDATE STATISTICS")
+        logger.info("-" * 30)
+        for key, value in self.db_client.facility_update_stats.items():
+            logger.info(f"{key.replace('_', ' ').title()}: {value}")
+        if self.db_client.mirror:
+            for key, value in self.db_client.mirror.summary().items():
+                logger.info(f"{key.replace('_', ' ').title()}: {value}")
+        
         # Get database stats
         try:
             db_stats = await self.db_client.get_facility_stats()
@@ -433,6 +604,19 @@ class PharmacyCrawler:
                     logger.info("\nFacilities by Type:")
                     for facility_type, count in sorted(facility_types.items()):
                         logger.info(f"  {facility_type}: {count}")
+                
+                statuses = db_stats.get('statuses', {})
+                if statuses:
+                    logger.info("\nFacilities by Status:")
+                    for status, count in sorted(statuses.items()):
+                        logger.info(f"  {status}: {count}")
+                
+                freshness = db_stats.get('freshness', {})
+                if freshness:
+                    logger.info("\nFacilities by Last Write:")
+                    for bucket in FRESHNESS_BUCKETS:
+                        if bucket in freshness:
+                            logger.info(f"  {bucket}: {freshness[bucket]}")
         
         except Exception as e:
             logger.error(f"Error fetching database stats: {e}")
@@ -10,6 +10,7 @@ import asyncio
 import argparse
 from dotenv import load_dotenv
 from crawlers import CorticoCrawler, CrawlConfig
+from utils.facility_sightings import sweep_after_crawl
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +23,12 @@ def create_config_from_env() -> CrawlConfig:
         max_concurrent=int(os.getenv('CRAWLER_MAX_CONCURRENT', '3')),
         delay_between_requests=float(os.getenv('CRAWLER_DELAY', '1.0')),
         max_retries=int(os.getenv('CRAWLER_MAX_RETRIES', '3')),
+        dead_letter_path=os.getenv('CRAWLER_DEAD_LETTER_FILE'),
+        ingest_mode=os.getenv('CRAWLER_INGEST_MODE', 'rows'),
+        page_buffer_size=int(os.getenv('CRAWLER_PAGE_BUFFER', '4')),
+        spool_path=os.getenv('CRAWLER_SPOOL_FILE'),
+        record_sightings=os.getenv('CRAWLER_RECORD_SIGHTINGS', 'false').lower() == 'true',
+        build_search_documents=os.getenv('CRAWLER_BUILD_SEARCH_DOCUMENTS', 'false').lower() == 'true',
     )
 
 def validate_environment():
@@ -38,13 +45,16 @@ def validate_environment():
     
     return True
 
-async def run_full_crawl(config: CrawlConfig):
-    """Run the full crawl of all pages"""
+async def run_full_crawl(config: CrawlConfig, sweep: bool = False, max_fraction: float = 0.05,
+                         purge: bool = False):
+    """Run the full crawl of all pages, optionally retiring facilities the source no longer lists"""
     print("🚀 Starting NaviCare Cortico Full Crawl")
     print("=" * 50)
     
     async with CorticoCrawler(config) as crawler:
         await crawler.crawl_all()
+        if sweep:
+            await sweep_after_crawl(crawler, max_fraction, purge)
     
     print("✅ Full crawl completed successfully!")
 
@@ -69,6 +79,18 @@ async def main():
                         help='Override batch size from environment')
     parser.add_argument('--delay', type=float,
                         help='Override delay between requests from environment')
+    parser.add_argument('--sweep', action='store_true',
+                        help='Full mode: afterwards mark facilities the source no longer lists inactive '
+                             '(migrations/004; skipped if the crawl was incomplete or had errors)')
+    parser.add_argument('--sweep-max-fraction', type=float,
+                        default=float(os.getenv('CRAWLER_SWEEP_MAX_FRACTION', '0.05')),
+                        help='Refuse to retire more than this fraction of active facilities (default: 0.05)')
+    parser.add_argument('--purge-retired', action='store_true',
+                        help='With --sweep, also delete hours, availability and booking channels of retired facilities')
+    parser.add_argument('--ingest-mode', choices=['rows', 'bundle', 'copy', 'shadow'],
+                        help='Override CRAWLER_INGEST_MODE: per-record writes, one RPC per page, '
+                             'direct COPY bulk load via DATABASE_URL (full reloads), or COPY into '
+                             'shadow tables swapped in atomically at the end (full mode only)')
     
     args = parser.parse_args()
     
@@ -85,6 +107,10 @@ async def main():
             config.batch_size = args.batch_size
         if args.delay:
             config.delay_between_requests = args.delay
+        if args.ingest_mode:
+            config.ingest_mode = args.ingest_mode
+        if args.sweep:
+            config.record_sightings = True
         
         print(f"📊 Configuration:")
         print(f"   Mode: {args.mode}")
@@ -94,11 +120,12 @@ async def main():
         print(f"   Max Concurrent: {config.max_concurrent}")
         print(f"   Request Delay: {config.delay_between_requests}s")
         print(f"   Max Retries: {config.max_retries}")
+        print(f"   Ingest Mode: {config.ingest_mode}")
         print()
         
         # Run appropriate crawl mode
         if args.mode == 'full':
-            await run_full_crawl(config)
+            await run_full_crawl(config, args.sweep, args.sweep_max_fraction, args.purge_retired)
         else:
             await run_test_crawl(config, args.page)
         
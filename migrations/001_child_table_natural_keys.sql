@@ -0,0 +1,49 @@
+-- NaviCare child-table natural keys
+-- Unique indexes the page-level bulk writer (utils/page_writer.py) upserts on.
+-- Removes duplicate rows left by the old select-then-insert path before creating them.
+
+BEGIN;
+
+DELETE FROM facility_booking_channels a
+USING facility_booking_channels b
+WHERE a.facility_id = b.facility_id
+  AND a.url = b.url
+  AND a.ctid < b.ctid;
+
+DELETE FROM facility_booking_channels a
+USING facility_booking_channels b
+WHERE a.facility_id = b.facility_id
+  AND a.phone = b.phone
+  AND a.ctid < b.ctid;
+
+DELETE FROM facility_booking_channels a
+USING facility_booking_channels b
+WHERE a.facility_id = b.facility_id
+  AND a.email = b.email
+  AND a.ctid < b.ctid;
+
+DELETE FROM facility_service_offerings a
+USING facility_service_offerings b
+WHERE a.facility_id = b.facility_id
+  AND a.service_id = b.service_id
+  AND a.ctid < b.ctid;
+
+DELETE FROM facility_hours a
+USING facility_hours b
+WHERE a.facility_id = b.facility_id
+  AND a.weekday = b.weekday
+  AND a.slot = b.slot
+  AND a.ctid < b.ctid;
+
+CREATE UNIQUE INDEX IF NOT EXISTS facility_booking_channels_facility_url_key
+    ON facility_booking_channels (facility_id, url);
+CREATE UNIQUE INDEX IF NOT EXISTS facility_booking_channels_facility_phone_key
+    ON facility_booking_channels (facility_id, phone);
+CREATE UNIQUE INDEX IF NOT EXISTS facility_booking_channels_facility_email_key
+    ON facility_booking_channels (facility_id, email);
+CREATE UNIQUE INDEX IF NOT EXISTS facility_service_offerings_facility_service_key
+    ON facility_service_offerings (facility_id, service_id);
+CREATE UNIQUE INDEX IF NOT EXISTS facility_hours_facility_weekday_slot_key
+    ON facility_hours (facility_id, weekday, slot);
+
+COMMIT;
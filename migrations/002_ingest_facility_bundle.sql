@@ -0,0 +1,226 @@
+-- NaviCare facility bundle ingest
+-- ingest_facility_bundle(jsonb) upserts one transformed facility and all of its child rows in a
+-- single transaction. ingest_facility_bundles(jsonb) applies a page of bundles in one RPC call,
+-- each facility in its own subtransaction so one bad record does not roll back the page.
+--
+-- Bundle shape (child keys are optional; an absent key leaves that table untouched):
+--   {
+--     "facility":          {...facilities columns...},
+--     "booking_channels":  [{...}],            upserted on (facility_id, url|phone|email)
+--     "specialties":       ["Family Medicine"],
+--     "service_offerings": [{"service_slug": ..., "display_name": ..., "workflow_type": ..., ...}],
+--     "hours":             [{...}],            replaced
+--     "availability":      [{...}]             replaced
+--   }
+-- Child rows carry no facility_id; it is filled in here.
+-- Requires 001_child_table_natural_keys.sql.
+
+BEGIN;
+
+-- Insert (or upsert on p_conflict) one row given as jsonb; only keys that are table columns are written
+CREATE OR REPLACE FUNCTION navicare_upsert_row(p_table text, p_row jsonb, p_conflict text[] DEFAULT NULL)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_columns text;
+    v_values text;
+    v_updates text;
+    v_sql text;
+    v_result jsonb;
+BEGIN
+    SELECT string_agg(format('%I', c.column_name), ', ' ORDER BY c.ordinal_position),
+           string_agg(format('r.%I', c.column_name), ', ' ORDER BY c.ordinal_position),
+           string_agg(format('%I = EXCLUDED.%I', c.column_name, c.column_name), ', ' ORDER BY c.ordinal_position)
+               FILTER (WHERE p_conflict IS NULL OR c.column_name <> ALL (p_conflict))
+      INTO v_columns, v_values, v_updates
+      FROM information_schema.columns c
+     WHERE c.table_schema = current_schema()
+       AND c.table_name = p_table
+       AND p_row ? c.column_name;
+
+    IF v_columns IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    v_sql := format('INSERT INTO %I AS t (%s) SELECT %s FROM jsonb_populate_record(NULL::%I, $1) r',
+                    p_table, v_columns, v_values, p_table);
+    IF p_conflict IS NOT NULL THEN
+        v_sql := v_sql
+            || format(' ON CONFLICT (%s) ', (SELECT string_agg(format('%I', k), ', ') FROM unnest(p_conflict) k))
+            || CASE WHEN v_updates IS NULL THEN 'DO NOTHING' ELSE 'DO UPDATE SET ' || v_updates END;
+    END IF;
+    v_sql := v_sql || ' RETURNING to_jsonb(t)';
+
+    EXECUTE v_sql INTO v_result USING p_row;
+    RETURN v_result;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION ingest_facility_bundle(p_bundle jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_facility jsonb := p_bundle->'facility';
+    v_facility_id facilities.id%TYPE;
+    v_current facilities%ROWTYPE;
+    v_service_id services.id%TYPE;
+    v_specialty_id specialties.id%TYPE;
+    v_created boolean := false;
+    v_item jsonb;
+BEGIN
+    IF v_facility IS NULL OR coalesce(v_facility->>'name', '') = '' THEN
+        RAISE EXCEPTION 'facility bundle has no facility name';
+    END IF;
+
+    -- Same identity rules as SupabaseClient.find_existing_facility: slug first, then name + location
+    SELECT id INTO v_facility_id FROM facilities WHERE slug = v_facility->>'slug' LIMIT 1;
+    IF v_facility_id IS NULL THEN
+        SELECT id INTO v_facility_id
+          FROM facilities
+         WHERE name = v_facility->>'name'
+           AND city = v_facility->>'city'
+           AND province = v_facility->>'province'
+         LIMIT 1;
+    END IF;
+
+    IF v_facility_id IS NULL THEN
+        v_facility_id := navicare_upsert_row('facilities', v_facility || jsonb_build_object('created_at', now()))->>'id';
+        v_created := true;
+    ELSE
+        -- Unchanged facilities are not rewritten and keep their updated_at (same as the COPY merge), so
+        -- updated_at watermarks (facility mirror, search documents) only see real changes
+        SELECT * INTO v_current FROM facilities WHERE id = v_facility_id;
+        IF jsonb_populate_record(v_current, v_facility - 'id' - 'created_at' - 'updated_at') IS DISTINCT FROM v_current THEN
+            PERFORM navicare_upsert_row('facilities',
+                                        v_facility || jsonb_build_object('id', v_facility_id, 'updated_at', now()),
+                                        ARRAY['id']);
+        END IF;
+    END IF;
+
+    IF p_bundle ? 'booking_channels' THEN
+        DELETE FROM facility_booking_channels c
+         WHERE c.facility_id = v_facility_id
+           AND NOT EXISTS (
+               SELECT 1
+                 FROM jsonb_array_elements(p_bundle->'booking_channels') n
+                WHERE (n->>'url' IS NOT NULL AND n->>'url' = c.url)
+                   OR (n->>'url' IS NULL AND n->>'phone' IS NOT NULL AND n->>'phone' = c.phone)
+                   OR (n->>'url' IS NULL AND n->>'phone' IS NULL AND n->>'email' = c.email)
+           );
+
+        FOR v_item IN SELECT value FROM jsonb_array_elements(p_bundle->'booking_channels') LOOP
+            v_item := v_item || jsonb_build_object('facility_id', v_facility_id);
+            PERFORM navicare_upsert_row('facility_booking_channels', v_item,
+                CASE WHEN v_item->>'url' IS NOT NULL THEN ARRAY['facility_id', 'url']
+                     WHEN v_item->>'phone' IS NOT NULL THEN ARRAY['facility_id', 'phone']
+                     WHEN v_item->>'email' IS NOT NULL THEN ARRAY['facility_id', 'email']
+                END);
+        END LOOP;
+    END IF;
+
+    IF p_bundle ? 'specialties' THEN
+        DELETE FROM facility_specialties WHERE facility_id = v_facility_id;
+
+        FOR v_item IN SELECT value FROM jsonb_array_elements(p_bundle->'specialties') LOOP
+            v_specialty_id := NULL;
+            SELECT id INTO v_specialty_id FROM specialties WHERE name = v_item #>> '{}' LIMIT 1;
+            IF v_specialty_id IS NULL THEN
+                INSERT INTO specialties (name) VALUES (v_item #>> '{}') RETURNING id INTO v_specialty_id;
+            END IF;
+            INSERT INTO facility_specialties (facility_id, specialty_id)
+            VALUES (v_facility_id, v_specialty_id)
+            ON CONFLICT DO NOTHING;
+        END LOOP;
+    END IF;
+
+    IF p_bundle ? 'service_offerings' THEN
+        FOR v_item IN SELECT value FROM jsonb_array_elements(p_bundle->'service_offerings') LOOP
+            v_service_id := NULL;
+            SELECT id INTO v_service_id FROM services WHERE slug = v_item->>'service_slug' LIMIT 1;
+            IF v_service_id IS NULL THEN
+                INSERT INTO services (slug, display_name, category)
+                VALUES (v_item->>'service_slug', coalesce(v_item->>'display_name', ''), coalesce(v_item->>'workflow_type', ''))
+                RETURNING id INTO v_service_id;
+            END IF;
+            PERFORM navicare_upsert_row('facility_service_offerings',
+                (v_item - 'service_slug' - 'display_name' - 'workflow_type')
+                    || jsonb_build_object('facility_id', v_facility_id, 'service_id', v_service_id),
+                ARRAY['facility_id', 'service_id']);
+        END LOOP;
+
+        DELETE FROM facility_service_offerings o
+         WHERE o.facility_id = v_facility_id
+           AND NOT EXISTS (
+               SELECT 1
+                 FROM jsonb_array_elements(p_bundle->'service_offerings') n
+                 JOIN services s ON s.slug = n->>'service_slug'
+                WHERE s.id = o.service_id
+           );
+    END IF;
+
+    IF p_bundle ? 'hours' THEN
+        DELETE FROM facility_hours WHERE facility_id = v_facility_id;
+        FOR v_item IN SELECT value FROM jsonb_array_elements(p_bundle->'hours') LOOP
+            PERFORM navicare_upsert_row('facility_hours',
+                                        v_item || jsonb_build_object('facility_id', v_facility_id),
+                                        ARRAY['facility_id', 'weekday', 'slot']);
+        END LOOP;
+    END IF;
+
+    IF p_bundle ? 'availability' THEN
+        DELETE FROM facility_availability WHERE facility_id = v_facility_id;
+        FOR v_item IN SELECT value FROM jsonb_array_elements(p_bundle->'availability') LOOP
+            PERFORM navicare_upsert_row('facility_availability',
+                                        v_item || jsonb_build_object('facility_id', v_facility_id));
+        END LOOP;
+    END IF;
+
+    RETURN jsonb_build_object('facility_id', v_facility_id, 'created', v_created);
+END;
+$$;
+
+-- One RPC per page: returns [{"index", "facility_id", "created"} | {"index", "error", "sqlstate"}]
+CREATE OR REPLACE FUNCTION ingest_facility_bundles(bundles jsonb)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_bundle jsonb;
+    v_index bigint;
+    v_results jsonb := '[]'::jsonb;
+BEGIN
+    FOR v_bundle, v_index IN
+        SELECT value, ordinality - 1 FROM jsonb_array_elements(bundles) WITH ORDINALITY
+    LOOP
+        BEGIN
+            v_results := v_results || jsonb_build_array(
+                ingest_facility_bundle(v_bundle) || jsonb_build_object('index', v_index)
+            );
+        EXCEPTION WHEN OTHERS THEN
+            v_results := v_results || jsonb_build_array(
+                jsonb_build_object('index', v_index, 'error', SQLERRM, 'sqlstate', SQLSTATE)
+            );
+        END;
+    END LOOP;
+    RETURN v_results;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION navicare_upsert_row(text, jsonb, text[]) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION ingest_facility_bundle(jsonb) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION ingest_facility_bundles(jsonb) FROM PUBLIC;
+
+DO $$
+BEGIN
+    -- Supabase grants new functions to its API roles by default; only the service role may ingest
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION navicare_upsert_row(text, jsonb, text[]) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION ingest_facility_bundle(jsonb) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION ingest_facility_bundles(jsonb) FROM anon, authenticated;
+    END IF;
+END;
+$$;
+
+COMMIT;
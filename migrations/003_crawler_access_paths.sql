@@ -0,0 +1,68 @@
+-- NaviCare crawler access-path indexes
+-- Indexes and unique keys for every lookup the crawlers, bulk writers and ingest functions make.
+-- Booking channels (facility_id, url|phone|email), service offerings (facility_id, service_id) and
+-- hours (facility_id, weekday, slot) are keyed by 001_child_table_natural_keys.sql.
+-- Check index usage afterwards with: python -m scripts.explain_crawler_queries
+
+BEGIN;
+
+-- Facility, service and specialty duplicates are referenced by child rows and must be merged by
+-- hand; refuse to continue instead of deleting anything
+DO $$
+DECLARE
+    v_duplicates bigint;
+BEGIN
+    SELECT count(*) INTO v_duplicates
+      FROM (SELECT slug FROM facilities WHERE slug IS NOT NULL GROUP BY slug HAVING count(*) > 1) d;
+    IF v_duplicates > 0 THEN
+        RAISE EXCEPTION '% facility slugs are duplicated; merge those facilities before applying 003', v_duplicates;
+    END IF;
+
+    SELECT count(*) INTO v_duplicates
+      FROM (SELECT slug FROM services WHERE slug IS NOT NULL GROUP BY slug HAVING count(*) > 1) d;
+    IF v_duplicates > 0 THEN
+        RAISE EXCEPTION '% service slugs are duplicated; merge those services before applying 003', v_duplicates;
+    END IF;
+
+    SELECT count(*) INTO v_duplicates
+      FROM (SELECT name FROM specialties WHERE name IS NOT NULL GROUP BY name HAVING count(*) > 1) d;
+    IF v_duplicates > 0 THEN
+        RAISE EXCEPTION '% specialty names are duplicated; merge those specialties before applying 003', v_duplicates;
+    END IF;
+END;
+$$;
+
+-- Availability and specialty links are rewritten on every crawl, so duplicates are simply dropped
+DELETE FROM facility_availability a
+USING facility_availability b
+WHERE a.facility_id = b.facility_id
+  AND a.available_at = b.available_at
+  AND a.ctid < b.ctid;
+
+DELETE FROM facility_specialties a
+USING facility_specialties b
+WHERE a.facility_id = b.facility_id
+  AND a.specialty_id = b.specialty_id
+  AND a.ctid < b.ctid;
+
+-- find_existing_facility: slug first, then name + location
+CREATE UNIQUE INDEX IF NOT EXISTS facilities_slug_key
+    ON facilities (slug);
+CREATE INDEX IF NOT EXISTS facilities_name_city_province_idx
+    ON facilities (name, city, province);
+
+-- get_service_by_slug / get_service_ids_by_slugs, get_specialty_by_name
+CREATE UNIQUE INDEX IF NOT EXISTS services_slug_key
+    ON services (slug);
+CREATE UNIQUE INDEX IF NOT EXISTS specialties_name_key
+    ON specialties (name);
+
+-- link_facility_specialties deletes by facility_id and inserts ON CONFLICT DO NOTHING
+CREATE UNIQUE INDEX IF NOT EXISTS facility_specialties_facility_specialty_key
+    ON facility_specialties (facility_id, specialty_id);
+
+-- insert_availability dedupes on (facility_id, available_at); replace paths delete by facility_id
+CREATE UNIQUE INDEX IF NOT EXISTS facility_availability_facility_available_at_key
+    ON facility_availability (facility_id, available_at);
+
+COMMIT;
@@ -0,0 +1,98 @@
+-- NaviCare facility sightings and retirement
+-- Crawls record which facilities each source returned (facility_sightings, one bulk upsert per page).
+-- retire_unseen_facilities(...) then marks the facilities a source has stopped returning inactive in
+-- one statement, optionally purging their hours, availability and booking channels. Only facilities
+-- the source has sighted before are considered, so the first crawl after this migration sets the
+-- baseline and facilities from other imports are never retired.
+-- Run the sweep with: python -m scripts.sweep_facilities --source clinic --since <crawl start>
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS facility_sightings (
+    source text NOT NULL,
+    facility_id uuid NOT NULL REFERENCES facilities (id) ON DELETE CASCADE,
+    seen_at timestamptz NOT NULL,
+    PRIMARY KEY (source, facility_id)
+);
+CREATE INDEX IF NOT EXISTS facility_sightings_source_seen_at_idx
+    ON facility_sightings (source, seen_at);
+
+-- Returns {"active", "unseen", "retired", "purged", "refused"}. Refuses (retires nothing) when more
+-- than p_max_fraction of the source's active facilities were not seen since p_since, e.g. because
+-- the crawl stopped early. p_dry_run only counts.
+CREATE OR REPLACE FUNCTION retire_unseen_facilities(
+    p_source text,
+    p_since timestamptz,
+    p_max_fraction numeric DEFAULT 0.05,
+    p_purge boolean DEFAULT false,
+    p_dry_run boolean DEFAULT false
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_active bigint;
+    v_unseen bigint;
+    v_ids uuid[];
+    v_purged bigint := 0;
+    v_count bigint;
+BEGIN
+    SELECT count(*),
+           count(*) FILTER (WHERE s.seen_at < p_since)
+      INTO v_active, v_unseen
+      FROM facility_sightings s
+      JOIN facilities f ON f.id = s.facility_id
+     WHERE s.source = p_source
+       AND f.status = 'active';
+
+    IF v_unseen > floor(v_active * p_max_fraction) THEN
+        RETURN jsonb_build_object('active', v_active, 'unseen', v_unseen, 'retired', 0, 'purged', 0,
+                                  'refused', true);
+    END IF;
+    IF p_dry_run OR v_unseen = 0 THEN
+        RETURN jsonb_build_object('active', v_active, 'unseen', v_unseen, 'retired', 0, 'purged', 0,
+                                  'refused', false);
+    END IF;
+
+    WITH retired AS (
+        UPDATE facilities f
+           SET status = 'inactive', updated_at = now()
+          FROM facility_sightings s
+         WHERE s.facility_id = f.id
+           AND s.source = p_source
+           AND s.seen_at < p_since
+           AND f.status = 'active'
+        RETURNING f.id
+    )
+    SELECT array_agg(id) INTO v_ids FROM retired;
+
+    IF p_purge THEN
+        DELETE FROM facility_hours WHERE facility_id = ANY (v_ids);
+        GET DIAGNOSTICS v_count = ROW_COUNT;
+        v_purged := v_purged + v_count;
+        DELETE FROM facility_availability WHERE facility_id = ANY (v_ids);
+        GET DIAGNOSTICS v_count = ROW_COUNT;
+        v_purged := v_purged + v_count;
+        DELETE FROM facility_booking_channels WHERE facility_id = ANY (v_ids);
+        GET DIAGNOSTICS v_count = ROW_COUNT;
+        v_purged := v_purged + v_count;
+    END IF;
+
+    RETURN jsonb_build_object('active', v_active, 'unseen', v_unseen, 'retired', coalesce(cardinality(v_ids), 0),
+                              'purged', v_purged, 'refused', false);
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION retire_unseen_facilities(text, timestamptz, numeric, boolean, boolean) FROM PUBLIC;
+
+DO $$
+BEGIN
+    -- Supabase grants new functions to its API roles by default; only the service role may retire
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION retire_unseen_facilities(text, timestamptz, numeric, boolean, boolean)
+            FROM anon, authenticated;
+    END IF;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,90 @@
+-- NaviCare facility statistics
+-- facility_stats() aggregates facility counts in the database so crawl summaries and the status
+-- tracker fetch one small JSON document instead of every facility row (which PostgREST also caps).
+-- Freshness is bucketed by the age of the last write (updated_at, else created_at) for facilities,
+-- and by the last sighting for each crawl source (facility_sightings; apply migration 004 first).
+-- Check it with: python -m scripts.track_crawl_status
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION facility_freshness_bucket(p_at timestamptz)
+RETURNS text
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT CASE
+        WHEN p_at IS NULL THEN 'never'
+        WHEN p_at >= now() - interval '1 day' THEN '1d'
+        WHEN p_at >= now() - interval '7 days' THEN '7d'
+        WHEN p_at >= now() - interval '30 days' THEN '30d'
+        ELSE 'older'
+    END;
+$$;
+
+-- Returns {"total_facilities", "facility_types": {type: n}, "statuses": {status: n},
+-- "freshness": {bucket: n}, "sources": {source: {"facilities", "active", "last_seen_at",
+-- "freshness": {bucket: n}}}}. Null types and statuses are reported as "unknown".
+CREATE OR REPLACE FUNCTION facility_stats()
+RETURNS jsonb
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+    v_total bigint;
+    v_types jsonb;
+    v_statuses jsonb;
+    v_freshness jsonb;
+    v_sources jsonb;
+BEGIN
+    SELECT count(*) INTO v_total FROM facilities;
+
+    SELECT coalesce(jsonb_object_agg(facility_type, n), '{}')
+      INTO v_types
+      FROM (SELECT coalesce(facility_type, 'unknown') AS facility_type, count(*) AS n
+              FROM facilities GROUP BY 1) t;
+
+    SELECT coalesce(jsonb_object_agg(status, n), '{}')
+      INTO v_statuses
+      FROM (SELECT coalesce(status, 'unknown') AS status, count(*) AS n
+              FROM facilities GROUP BY 1) t;
+
+    SELECT coalesce(jsonb_object_agg(bucket, n), '{}')
+      INTO v_freshness
+      FROM (SELECT facility_freshness_bucket(coalesce(updated_at, created_at)) AS bucket, count(*) AS n
+              FROM facilities GROUP BY 1) t;
+
+    SELECT coalesce(jsonb_object_agg(source, jsonb_build_object(
+               'facilities', facilities, 'active', active, 'last_seen_at', last_seen_at, 'freshness', freshness)), '{}')
+      INTO v_sources
+      FROM (SELECT source,
+                   sum(n) AS facilities,
+                   sum(active) AS active,
+                   max(last_seen_at) AS last_seen_at,
+                   jsonb_object_agg(bucket, n) AS freshness
+              FROM (SELECT s.source,
+                           facility_freshness_bucket(s.seen_at) AS bucket,
+                           count(*) AS n,
+                           count(*) FILTER (WHERE f.status = 'active') AS active,
+                           max(s.seen_at) AS last_seen_at
+                      FROM facility_sightings s
+                      JOIN facilities f ON f.id = s.facility_id
+                     GROUP BY 1, 2) b
+             GROUP BY source) t;
+
+    RETURN jsonb_build_object('total_facilities', v_total, 'facility_types', v_types, 'statuses', v_statuses,
+                              'freshness', v_freshness, 'sources', v_sources);
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION facility_stats() FROM PUBLIC;
+
+DO $$
+BEGIN
+    -- Supabase grants new functions to its API roles by default; statistics are for the service role
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION facility_stats() FROM anon, authenticated;
+    END IF;
+END;
+$$;
+
+COMMIT;
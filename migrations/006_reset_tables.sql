@@ -0,0 +1,47 @@
+-- NaviCare fast reset
+-- reset_navicare_tables(...) empties the tables scripts/reset_database.py clears, with one TRUNCATE
+-- instead of chunked deletes. CASCADE also empties tables that reference them (e.g. facility_sightings,
+-- facility_availability). Tables that do not exist are skipped.
+-- Run it with: python -m scripts.reset_database --truncate [--include-reference]
+
+BEGIN;
+
+CREATE OR REPLACE FUNCTION reset_navicare_tables(p_include_reference boolean DEFAULT false)
+RETURNS text[]
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_tables text[] := ARRAY[
+        'facility_service_availability', 'facility_booking_channels', 'facility_hours',
+        'facility_service_offerings', 'facility_specialties', 'facility_languages', 'facility_tags',
+        'user_favorites', 'facilities'
+    ];
+    v_existing text[];
+BEGIN
+    IF p_include_reference THEN
+        v_tables := v_tables || ARRAY['services', 'specialties', 'languages'];
+    END IF;
+
+    SELECT array_agg(t) INTO v_existing
+      FROM unnest(v_tables) t
+     WHERE to_regclass(t) IS NOT NULL;
+
+    IF v_existing IS NOT NULL THEN
+        EXECUTE 'TRUNCATE ' || (SELECT string_agg(quote_ident(t), ', ') FROM unnest(v_existing) t) || ' CASCADE';
+    END IF;
+    RETURN coalesce(v_existing, '{}');
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION reset_navicare_tables(boolean) FROM PUBLIC;
+
+DO $$
+BEGIN
+    -- Supabase grants new functions to its API roles by default; only the service role may reset
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION reset_navicare_tables(boolean) FROM anon, authenticated;
+    END IF;
+END;
+$$;
+
+COMMIT;
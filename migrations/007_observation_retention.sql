@@ -0,0 +1,104 @@
+-- NaviCare facility_observations retention
+-- Raw observations older than the retention window are rolled up into facility_observation_rollups
+-- (one row per facility and day or week) and deleted, one bounded batch per call, so the raw table
+-- only holds recent history. Rolling up and deleting a batch happen in the same transaction, so a
+-- batch is never counted twice. Only facility_id and observed_at of the raw rows are used.
+-- Run it with: python -m scripts.prune_observations --keep-days 90
+
+BEGIN;
+
+CREATE INDEX IF NOT EXISTS facility_observations_observed_at_idx
+    ON facility_observations (observed_at);
+
+CREATE TABLE IF NOT EXISTS facility_observation_rollups (
+    facility_id uuid NOT NULL,
+    period text NOT NULL CHECK (period IN ('day', 'week')),
+    period_start date NOT NULL,
+    observations bigint NOT NULL,
+    first_observed_at timestamptz NOT NULL,
+    last_observed_at timestamptz NOT NULL,
+    PRIMARY KEY (facility_id, period, period_start)
+);
+CREATE INDEX IF NOT EXISTS facility_observation_rollups_period_start_idx
+    ON facility_observation_rollups (period, period_start);
+
+-- Rolls up and deletes up to p_batch_size of the oldest observations made before p_before.
+-- Returns {"rolled_up", "deleted", "remaining"} where remaining says whether older rows are left.
+CREATE OR REPLACE FUNCTION roll_up_facility_observations(
+    p_before timestamptz,
+    p_period text DEFAULT 'day',
+    p_batch_size integer DEFAULT 10000
+)
+RETURNS jsonb
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_rolled_up bigint;
+    v_deleted bigint;
+BEGIN
+    IF p_period NOT IN ('day', 'week') THEN
+        RAISE EXCEPTION 'period must be day or week, not %', p_period;
+    END IF;
+
+    CREATE TEMP TABLE observation_batch ON COMMIT DROP AS
+    SELECT id, facility_id, observed_at
+      FROM facility_observations
+     WHERE observed_at < p_before
+     ORDER BY observed_at
+     LIMIT p_batch_size;
+
+    INSERT INTO facility_observation_rollups AS r
+           (facility_id, period, period_start, observations, first_observed_at, last_observed_at)
+    SELECT facility_id, p_period, date_trunc(p_period, observed_at)::date,
+           count(*), min(observed_at), max(observed_at)
+      FROM observation_batch
+     WHERE facility_id IS NOT NULL
+     GROUP BY 1, 2, 3
+    ON CONFLICT (facility_id, period, period_start) DO UPDATE SET
+        observations = r.observations + excluded.observations,
+        first_observed_at = least(r.first_observed_at, excluded.first_observed_at),
+        last_observed_at = greatest(r.last_observed_at, excluded.last_observed_at);
+    GET DIAGNOSTICS v_rolled_up = ROW_COUNT;
+
+    DELETE FROM facility_observations o USING observation_batch b WHERE o.id = b.id;
+    GET DIAGNOSTICS v_deleted = ROW_COUNT;
+
+    DROP TABLE observation_batch;
+
+    RETURN jsonb_build_object(
+        'rolled_up', v_rolled_up,
+        'deleted', v_deleted,
+        'remaining', EXISTS (SELECT 1 FROM facility_observations WHERE observed_at < p_before)
+    );
+END;
+$$;
+
+-- Returns {"observations": {"rows", "bytes"}, "rollups": {"rows", "bytes"}}; row counts are planner
+-- estimates so the report stays cheap on large tables.
+CREATE OR REPLACE FUNCTION facility_observation_storage()
+RETURNS jsonb
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT jsonb_object_agg(name, jsonb_build_object(
+               'rows', greatest(c.reltuples, 0)::bigint,
+               'bytes', pg_total_relation_size(c.oid)))
+      FROM (VALUES ('observations', 'facility_observations'::regclass),
+                   ('rollups', 'facility_observation_rollups'::regclass)) t(name, oid)
+      JOIN pg_class c ON c.oid = t.oid;
+$$;
+
+REVOKE EXECUTE ON FUNCTION roll_up_facility_observations(timestamptz, text, integer) FROM PUBLIC;
+REVOKE EXECUTE ON FUNCTION facility_observation_storage() FROM PUBLIC;
+
+DO $$
+BEGIN
+    -- Supabase grants new functions to its API roles by default; only the service role may prune
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION roll_up_facility_observations(timestamptz, text, integer) FROM anon, authenticated;
+        REVOKE EXECUTE ON FUNCTION facility_observation_storage() FROM anon, authenticated;
+    END IF;
+END;
+$$;
+
+COMMIT;
@@ -0,0 +1,88 @@
+-- NaviCare facility search documents
+-- facility_search_documents holds one denormalized JSON document per facility (the facility row with
+-- its hours, services, specialties, active booking channels and next availability), so app reads are
+-- a single-row lookup instead of a six-way join. Crawlers refresh the documents of the facilities they
+-- wrote at the end of a run (CRAWLER_BUILD_SEARCH_DOCUMENTS=true); a document is only rewritten when
+-- it changed. Backfill or rebuild with: python -m scripts.refresh_search_documents --all
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS facility_search_documents (
+    facility_id uuid PRIMARY KEY REFERENCES facilities (id) ON DELETE CASCADE,
+    document jsonb NOT NULL,
+    built_at timestamptz NOT NULL DEFAULT now()
+);
+
+-- Finds facilities changed by other writers (e.g. the retirement sweep) since a run started
+CREATE INDEX IF NOT EXISTS facilities_updated_at_idx
+    ON facilities (updated_at);
+
+-- Rebuilds the documents of p_facility_ids and of facilities updated since p_changed_since.
+-- Returns the number of documents written. Fields that change on every crawl without changing
+-- what a reader sees (timestamps, last_checked_at) are left out so unchanged documents stay put.
+CREATE OR REPLACE FUNCTION refresh_facility_search_documents(
+    p_facility_ids uuid[] DEFAULT '{}',
+    p_changed_since timestamptz DEFAULT NULL
+)
+RETURNS integer
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_written integer;
+BEGIN
+    WITH targets AS (
+        SELECT unnest(p_facility_ids) AS id
+        UNION
+        SELECT id FROM facilities WHERE p_changed_since IS NOT NULL AND updated_at >= p_changed_since
+    ), documents AS (
+        SELECT f.id AS facility_id,
+               (to_jsonb(f) - 'created_at' - 'updated_at') || jsonb_build_object(
+                   'hours', coalesce((
+                       SELECT jsonb_agg(to_jsonb(h) - 'id' - 'facility_id' ORDER BY h.weekday, h.slot, h.open_time)
+                       FROM facility_hours h WHERE h.facility_id = f.id), '[]'),
+                   'services', coalesce((
+                       SELECT jsonb_agg((to_jsonb(o) - 'facility_id' - 'service_id')
+                                        || jsonb_build_object('slug', v.slug, 'name', v.display_name,
+                                                              'category', v.category)
+                                        ORDER BY v.slug)
+                       FROM facility_service_offerings o JOIN services v ON v.id = o.service_id
+                       WHERE o.facility_id = f.id), '[]'),
+                   'specialties', coalesce((
+                       SELECT jsonb_agg(p.name ORDER BY p.name)
+                       FROM facility_specialties s JOIN specialties p ON p.id = s.specialty_id
+                       WHERE s.facility_id = f.id), '[]'),
+                   'booking_channels', coalesce((
+                       SELECT jsonb_agg(to_jsonb(c) - 'id' - 'facility_id' - 'last_checked_at'
+                                        ORDER BY c.channel_type, c.url, c.phone, c.email)
+                       FROM facility_booking_channels c
+                       WHERE c.facility_id = f.id AND c.is_active IS NOT false), '[]'),
+                   'next_available_at', (
+                       SELECT min(a.available_at) FROM facility_availability a
+                       WHERE a.facility_id = f.id AND a.available_at >= now())
+               ) AS document
+          FROM facilities f
+          JOIN targets t ON t.id = f.id
+    ), written AS (
+        INSERT INTO facility_search_documents AS d (facility_id, document, built_at)
+        SELECT facility_id, document, now() FROM documents
+        ON CONFLICT (facility_id) DO UPDATE SET document = excluded.document, built_at = excluded.built_at
+        WHERE d.document IS DISTINCT FROM excluded.document
+        RETURNING 1
+    )
+    SELECT count(*) INTO v_written FROM written;
+    RETURN v_written;
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION refresh_facility_search_documents(uuid[], timestamptz) FROM PUBLIC;
+
+DO $$
+BEGIN
+    -- Supabase grants new functions to its API roles by default; only the service role may rebuild
+    IF EXISTS (SELECT 1 FROM pg_roles WHERE rolname = 'anon') THEN
+        REVOKE EXECUTE ON FUNCTION refresh_facility_search_documents(uuid[], timestamptz) FROM anon, authenticated;
+    END IF;
+END;
+$$;
+
+COMMIT;
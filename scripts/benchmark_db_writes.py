@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+NaviCare Database Write Benchmark
+Compares per-facility and page-level bulk write paths against the configured Supabase project.
+
+Scenarios write to throwaway facilities the script creates (inactive, slug prefix
+navicare-benchmark-) and deletes afterwards, together with their rows. Because it writes to the
+configured project, it only runs with --destructive; prefer a staging project.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Callable, Dict, List
+from dotenv import load_dotenv
+
+from utils.supabase_client import SupabaseClient, MINIMAL
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+class RequestCounter:
+    """Counts PostgREST HTTP requests and response bytes through httpx event hooks"""
+
+    def __init__(self, db_client: SupabaseClient):
+        self.requests = 0
+        self.response_bytes = 0
+        session = db_client.client.postgrest.session
+        session.event_hooks['request'].append(self._on_request)
+        session.event_hooks['response'].append(self._on_response)
+
+    def _on_request(self, request):
+        self.requests += 1
+
+    def _on_response(self, response):
+        response.read()
+        self.response_bytes += len(response.content)
+
+    def snapshot(self) -> Dict[str, int]:
+        return {'requests': self.requests, 'response_bytes': self.response_bytes}
+
+BENCHMARK_SLUG_PREFIX = 'navicare-benchmark-'
+
+async def measure(name: str, counter: RequestCounter, run: Callable) -> Dict:
+    before = counter.snapshot()
+    start = time.perf_counter()
+    await run()
+    elapsed = time.perf_counter() - start
+    after = counter.snapshot()
+    result = {
+        'path': name,
+        'seconds': round(elapsed, 3),
+        'requests': after['requests'] - before['requests'],
+        'response_bytes': after['response_bytes'] - before['response_bytes'],
+    }
+    logger.info(f"{name}: {result['seconds']}s, {result['requests']} requests, "
+                f"{result['response_bytes']} response bytes")
+    return result
+
+def synthetic_availability(facility_ids: List[str]) -> List[Dict]:
+    now = datetime.now(timezone.utc)
+    return [{
+        'facility_id': facility_id,
+        'available_at': (now + timedelta(days=1, minutes=index)).isoformat(),
+        'created_at': now.isoformat(),
+        'source': 'cortico'
+    } for index, facility_id in enumerate(facility_ids)]
+
+async def benchmark_availability(db_client: SupabaseClient, counter: RequestCounter,
+                                 facility_ids: List[str]) -> List[Dict]:
+    records = synthetic_availability(facility_ids)
+
+    async def per_facility():
+        for record in records:
+            db_client.client.table("facility_availability").delete().eq("facility_id", record['facility_id']).execute()
+            db_client.client.table("facility_availability").insert([record]).execute()
+
+    async def bulk():
+        await db_client.replace_availability_bulk(records)
+
+    return [
+        await measure('availability per-facility', counter, per_facility),
+        await measure('availability page bulk', counter, bulk),
+    ]
+
+async def benchmark_returning(db_client: SupabaseClient, counter: RequestCounter,
+                              facility_ids: List[str]) -> List[Dict]:
+    """The same page of availability upserts with every row sent back vs. return=minimal"""
+    records = synthetic_availability(facility_ids)
+    on_conflict = "facility_id,available_at"
+
+    async def representation():
+        db_client.client.table("facility_availability").upsert(records, on_conflict=on_conflict).execute()
+
+    async def minimal():
+        db_client.client.table("facility_availability").upsert(records, on_conflict=on_conflict, **MINIMAL).execute()
+
+    return [
+        await measure('upsert return=representation', counter, representation),
+        await measure('upsert return=minimal', counter, minimal),
+    ]
+
+def create_benchmark_facilities(db_client: SupabaseClient, count: int) -> List[str]:
+    """Insert `count` inactive throwaway facilities and return their ids"""
+    run_id = uuid.uuid4().hex[:8]
+    rows = [{
+        'name': f"NaviCare Benchmark {run_id} {index}",
+        'slug': f"{BENCHMARK_SLUG_PREFIX}{run_id}-{index}",
+        'status': 'inactive'
+    } for index in range(count)]
+    response = db_client.client.table("facilities").insert(rows).execute()
+    return [row['id'] for row in response.data or []]
+
+def delete_benchmark_facilities(db_client: SupabaseClient, facility_ids: List[str]):
+    """Delete the throwaway facilities and the rows the scenarios wrote for them"""
+    db_client.client.table("facility_availability").delete(**MINIMAL).in_("facility_id", facility_ids).execute()
+    db_client.client.table("facilities").delete(**MINIMAL).in_("id", facility_ids).execute()
+
+SCENARIOS = {
+    'availability': benchmark_availability,
+    'returning': benchmark_returning,
+}
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='NaviCare Database Write Benchmark')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='availability',
+                        help='Write path to benchmark (default: availability)')
+    parser.add_argument('--page-size', type=int, default=50,
+                        help='Number of facilities in the simulated page (default: 50)')
+    parser.add_argument('--destructive', action='store_true',
+                        help='Confirm writing (and deleting) throwaway facilities in the configured project')
+    args = parser.parse_args()
+
+    if not args.destructive:
+        logger.error("The benchmark writes to the configured Supabase project; pass --destructive to run it")
+        sys.exit(1)
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        sys.exit(1)
+
+    db_client = SupabaseClient()
+    counter = RequestCounter(db_client)
+
+    facility_ids = create_benchmark_facilities(db_client, args.page_size)
+    if not facility_ids:
+        logger.error("Could not create facilities to benchmark against")
+        sys.exit(1)
+    try:
+        results = await SCENARIOS[args.scenario](db_client, counter, facility_ids)
+    finally:
+        delete_benchmark_facilities(db_client, facility_ids)
+
+    baseline = results[0]
+    print(f"\n{'path':<32}{'seconds':>10}{'requests':>10}{'resp bytes':>12}{'speedup':>9}")
+    for result in results:
+        speedup = baseline['seconds'] / result['seconds'] if result['seconds'] else float('inf')
+        print(f"{result['path']:<32}{result['seconds']:>10}{result['requests']:>10}"
+              f"{result['response_bytes']:>12}{speedup:>8.1f}x")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,10 +6,14 @@ Script to run the Pharmacy crawler for a specific page range
 
 import os
 import sys
+import socket
 import asyncio
 import argparse
+from typing import Optional
 from dotenv import load_dotenv
 from crawlers import PharmacyCrawler, PharmacyCrawlConfig
+from utils.work_queue import create_work_queue, drain_work_queue
+from utils.segment_planner import append_page_costs
 
 # Load environment variables
 load_dotenv()
@@ -22,6 +26,12 @@ def create_config_from_env() -> PharmacyCrawlConfig:
         max_concurrent=int(os.getenv('CRAWLER_MAX_CONCURRENT', '5')),
         delay_between_requests=float(os.getenv('CRAWLER_DELAY', '0.5')),
         max_retries=int(os.getenv('CRAWLER_MAX_RETRIES', '3')),
+        dead_letter_path=os.getenv('CRAWLER_DEAD_LETTER_FILE'),
+        ingest_mode=os.getenv('CRAWLER_INGEST_MODE', 'rows'),
+        page_buffer_size=int(os.getenv('CRAWLER_PAGE_BUFFER', '4')),
+        spool_path=os.getenv('CRAWLER_SPOOL_FILE'),
+        record_sightings=os.getenv('CRAWLER_RECORD_SIGHTINGS', 'false').lower() == 'true',
+        build_search_documents=os.getenv('CRAWLER_BUILD_SEARCH_DOCUMENTS', 'false').lower() == 'true',
     )
 
 def validate_environment():
@@ -38,29 +48,74 @@ def validate_environment():
     
     return True
 
-async def run_page_range_crawl(config: PharmacyCrawlConfig, start_page: int, end_page: int):
+async def run_page_range_crawl(config: PharmacyCrawlConfig, start_page: int, end_page: int,
+                               cost_log: Optional[str] = None):
     """Run the crawl for a specific page range"""
     print(f"🚀 Starting NaviCare Pharmacy Page Range Crawl (Pages {start_page}-{end_page})")
     print("=" * 50)
     
     async with PharmacyCrawler(config) as crawler:
-        await crawler.crawl_page_range(start_page, end_page)
+        failed_pages = await crawler.crawl_page_range(start_page, end_page)
+        if cost_log:
+            append_page_costs(cost_log, 'pharmacy', crawler.page_costs)
     
+    if failed_pages:
+        print(f"⚠️  Pages that could not be fetched: {failed_pages}")
     print("✅ Pharmacy page range crawl completed successfully!")
 
+async def run_queue_crawl(config: PharmacyCrawlConfig, args: argparse.Namespace):
+    """Drain page ranges from the shared work queue until none are left"""
+    queue = create_work_queue(args.queue_backend, args.queue_location, lease_seconds=args.lease_seconds)
+    await queue.initialize()
+    try:
+        if args.end_page:
+            added = await queue.seed(args.crawl_id, args.start_page, args.end_page, args.chunk_size)
+            print(f"📥 Seeded {added} new page ranges for crawl {args.crawl_id}")
+
+        print(f"🚀 Starting NaviCare Pharmacy Queue Crawl (crawl {args.crawl_id}, worker {args.worker_id})")
+        print("=" * 50)
+
+        async with PharmacyCrawler(config) as crawler:
+            completed = await drain_work_queue(queue, args.crawl_id, args.worker_id, crawler.crawl_page_range)
+            if args.cost_log:
+                append_page_costs(args.cost_log, 'pharmacy', crawler.page_costs)
+
+        progress = await queue.progress(args.crawl_id)
+        print(f"✅ Worker completed {completed} page ranges. Queue status: {progress}")
+        if progress.get('failed'):
+            print(f"⚠️  {progress['failed']} page ranges failed after the maximum number of attempts")
+    finally:
+        await queue.close()
+
 async def main():
     """Main runner function"""
     parser = argparse.ArgumentParser(description='NaviCare Pharmacy Crawler - Page Range')
     parser.add_argument('--start-page', type=int, default=1,
                         help='Start page number (default: 1)')
-    parser.add_argument('--end-page', type=int, required=True,
-                        help='End page number (inclusive)')
+    parser.add_argument('--end-page', type=int,
+                        help='End page number (inclusive); with --queue-backend, seeds the queue up to this page')
     parser.add_argument('--batch-size', type=int,
                         help='Override batch size from environment')
     parser.add_argument('--delay', type=float,
                         help='Override delay between requests from environment')
+    parser.add_argument('--queue-backend', choices=['sqlite', 'postgres'],
+                        help='Pull page ranges from a lease-based work queue instead of a fixed range')
+    parser.add_argument('--queue-location',
+                        help='SQLite file path or Postgres DSN (default: crawl_queue.db / DATABASE_URL)')
+    parser.add_argument('--crawl-id', default=os.getenv('CRAWL_ID', 'pharmacy'),
+                        help='Identifier shared by all workers draining the same crawl')
+    parser.add_argument('--worker-id', default=f"{socket.gethostname()}-{os.getpid()}",
+                        help='Identifier for this worker (default: host-pid)')
+    parser.add_argument('--chunk-size', type=int, default=5,
+                        help='Pages per queued range when seeding (default: 5)')
+    parser.add_argument('--lease-seconds', type=int, default=900,
+                        help='Lease duration before an unrenewed range is reclaimed (default: 900)')
+    parser.add_argument('--cost-log', default=os.getenv('CRAWL_COST_LOG'),
+                        help='Append measured per-page cost to this JSON lines file for the segment planner')
     
     args = parser.parse_args()
+    if not args.queue_backend and args.end_page is None:
+        parser.error('--end-page is required unless --queue-backend is set')
     
     try:
         # Validate environment
@@ -83,11 +138,17 @@ async def main():
         print(f"   Max Concurrent: {config.max_concurrent}")
         print(f"   Request Delay: {config.delay_between_requests}s")
         print(f"   Max Retries: {config.max_retries}")
-        print(f"   Page Range: {args.start_page}-{args.end_page}")
+        if args.queue_backend:
+            print(f"   Work Queue: {args.queue_backend} ({args.crawl_id})")
+        else:
+            print(f"   Page Range: {args.start_page}-{args.end_page}")
         print()
         
-        # Run page range crawl
-        await run_page_range_crawl(config, args.start_page, args.end_page)
+        if args.queue_backend:
+            await run_queue_crawl(config, args)
+        else:
+            # Run page range crawl
+            await run_page_range_crawl(config, args.start_page, args.end_page, args.cost_log)
         
     except KeyboardInterrupt:
         print("\n⏹️  Crawling interrupted by user")
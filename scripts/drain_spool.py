@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+NaviCare Write Spool Drain
+Writes the pages crawlers spooled locally while the database was unavailable, in crawl order
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from dotenv import load_dotenv
+
+from crawlers import CorticoCrawler, CrawlConfig
+from utils.write_spool import drain_spool
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='NaviCare Write Spool Drain (drain-spool)')
+    parser.add_argument('--spool-file', default=os.getenv('CRAWLER_SPOOL_FILE', 'write_spool.jsonl'),
+                        help='Spool file written by the crawlers (default: CRAWLER_SPOOL_FILE)')
+    parser.add_argument('--ingest-mode', choices=['bundle', 'copy'],
+                        default='copy' if os.getenv('CRAWLER_INGEST_MODE') == 'copy' else 'bundle',
+                        help='Write path for spooled bundles (default: bundle, or copy with CRAWLER_INGEST_MODE=copy)')
+    parser.add_argument('--dead-letter-file', default=os.getenv('CRAWLER_DEAD_LETTER_FILE'),
+                        help='Quarantine file for bundles the database rejects (default: CRAWLER_DEAD_LETTER_FILE)')
+    args = parser.parse_args()
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        sys.exit(1)
+
+    if not os.path.exists(args.spool_file):
+        logger.info(f"No spool file at {args.spool_file}")
+        return
+
+    # Bundles carry their own source; the crawler only supplies the database clients and stats
+    config = CrawlConfig(
+        dead_letter_path=args.dead_letter_file,
+        ingest_mode=args.ingest_mode,
+        spool_path=args.spool_file,
+    )
+    async with CorticoCrawler(config) as crawler:
+        await crawler.db_client.health.wait_until_writable()
+        drained = await drain_spool(crawler)
+        pending = crawler.spool.pending()
+
+    logger.info(f"Drained {drained} spooled pages from {args.spool_file}")
+    if pending:
+        logger.error(f"Spooled pages remain in {args.spool_file}; run drain-spool again once the database is healthy")
+        sys.exit(2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
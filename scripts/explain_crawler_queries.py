@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+NaviCare Crawler Query Plans
+Runs EXPLAIN ANALYZE on each lookup the crawlers make and reports whether it uses an index.
+
+Everything runs in one transaction that is rolled back, including the optional synthetic seed,
+so it is safe against a local Postgres (DATABASE_URL) holding a copy of the schema.
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import logging
+from typing import Dict, List, Tuple
+from dotenv import load_dotenv
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+SEED_SQL = [
+    """
+    INSERT INTO facilities (name, slug, facility_type, city, province, country, status)
+    SELECT 'Explain Clinic ' || g, 'explain-clinic-' || g, 'clinic', 'City ' || (g % 200), 'ON', 'Canada', 'active'
+    FROM generate_series(1, $1::int) g
+    """,
+    """
+    INSERT INTO services (slug, display_name, category)
+    SELECT 'explain-service-' || g, 'Explain Service ' || g, 'clinic' FROM generate_series(1, 50) g
+    """,
+    """
+    INSERT INTO facility_booking_channels (facility_id, channel_type, url)
+    SELECT id, 'web', 'https://book.example/' || slug FROM facilities WHERE slug LIKE 'explain-clinic-%'
+    """,
+    """
+    INSERT INTO facility_booking_channels (facility_id, channel_type, phone)
+    SELECT id, 'phone', '613555' || lpad((row_number() OVER ())::text, 4, '0')
+    FROM facilities WHERE slug LIKE 'explain-clinic-%'
+    """,
+    """
+    INSERT INTO facility_service_offerings (facility_id, service_id)
+    SELECT f.id, s.id
+    FROM facilities f
+    JOIN services s ON s.slug IN ('explain-service-1', 'explain-service-2', 'explain-service-3')
+    WHERE f.slug LIKE 'explain-clinic-%'
+    """,
+    """
+    INSERT INTO facility_hours (facility_id, weekday, weekday_label, open_time, close_time, slot)
+    SELECT f.id, d, 'Day ' || d, '09:00', '17:00', 1
+    FROM facilities f, generate_series(0, 6) d
+    WHERE f.slug LIKE 'explain-clinic-%'
+    """,
+    """
+    INSERT INTO facility_availability (facility_id, available_at, source)
+    SELECT id, now() + interval '1 day', 'cortico' FROM facilities WHERE slug LIKE 'explain-clinic-%'
+    """,
+]
+
+ANALYZED_TABLES = ['facilities', 'services', 'facility_booking_channels', 'facility_service_offerings',
+                   'facility_hours', 'facility_availability']
+
+# (name, target table, SQL with $n parameters, sample columns used as parameters)
+QUERIES: List[Tuple[str, str, str, List[str]]] = [
+    ('facility by slug', 'facilities',
+     "SELECT * FROM facilities WHERE slug = $1 LIMIT 1", ['slug']),
+    ('facility by name/city/province', 'facilities',
+     "SELECT * FROM facilities WHERE name = $1 AND city = $2 AND province = $3 LIMIT 1",
+     ['name', 'city', 'province']),
+    ('service by slug', 'services',
+     "SELECT id, slug FROM services WHERE slug = $1", ['service_slug']),
+    ('booking channel by facility/url', 'facility_booking_channels',
+     "SELECT id FROM facility_booking_channels WHERE facility_id = $1 AND url = $2 LIMIT 1",
+     ['facility_id', 'url']),
+    ('booking channel by facility/phone', 'facility_booking_channels',
+     "SELECT id FROM facility_booking_channels WHERE facility_id = $1 AND phone = $2 LIMIT 1",
+     ['facility_id', 'phone']),
+    ('service offering by facility/service', 'facility_service_offerings',
+     "SELECT * FROM facility_service_offerings WHERE facility_id = $1 AND service_id = $2 LIMIT 1",
+     ['facility_id', 'service_id']),
+    ('availability by facility/available_at', 'facility_availability',
+     "SELECT id FROM facility_availability WHERE facility_id = $1 AND available_at = $2 LIMIT 1",
+     ['facility_id', 'available_at']),
+    ('page child rows by facility_id IN (...)', 'facility_hours',
+     "SELECT facility_id, weekday, slot FROM facility_hours WHERE facility_id = ANY($1)",
+     ['facility_ids']),
+    ('page availability delete by facility_id IN (...)', 'facility_availability',
+     "DELETE FROM facility_availability WHERE facility_id = ANY($1)",
+     ['facility_ids']),
+]
+
+SAMPLE_SQL = """
+SELECT f.id AS facility_id, f.slug, f.name, f.city, f.province,
+       (SELECT url FROM facility_booking_channels c WHERE c.facility_id = f.id AND url IS NOT NULL LIMIT 1) AS url,
+       (SELECT phone FROM facility_booking_channels c WHERE c.facility_id = f.id AND phone IS NOT NULL LIMIT 1) AS phone,
+       (SELECT service_id FROM facility_service_offerings o WHERE o.facility_id = f.id LIMIT 1) AS service_id,
+       (SELECT s.slug FROM facility_service_offerings o JOIN services s ON s.id = o.service_id
+         WHERE o.facility_id = f.id LIMIT 1) AS service_slug,
+       (SELECT available_at FROM facility_availability a WHERE a.facility_id = f.id LIMIT 1) AS available_at
+FROM facilities f
+WHERE EXISTS (SELECT 1 FROM facility_service_offerings o WHERE o.facility_id = f.id)
+LIMIT 1
+"""
+
+
+def _bitmap_indexes(plan: Dict) -> List[str]:
+    indexes = [plan['Index Name']] if plan['Node Type'] == 'Bitmap Index Scan' else []
+    for child in plan.get('Plans', []):
+        indexes.extend(_bitmap_indexes(child))
+    return indexes
+
+
+def plan_scans(plan: Dict) -> List[Dict]:
+    """Flatten the table scans of an EXPLAIN (FORMAT JSON) plan with the index each one uses"""
+    scans = []
+    if 'Relation Name' in plan and plan['Node Type'].endswith('Scan'):
+        index = plan.get('Index Name')
+        if plan['Node Type'] == 'Bitmap Heap Scan':
+            index = ", ".join(_bitmap_indexes(plan)) or None
+        scans.append({'node': plan['Node Type'], 'relation': plan['Relation Name'], 'index': index})
+    for child in plan.get('Plans', []):
+        scans.extend(plan_scans(child))
+    return scans
+
+
+async def explain_queries(conn, seed: int = 5000) -> List[Dict]:
+    """EXPLAIN ANALYZE every crawler query; returns one result per query. Rolls back everything."""
+    results = []
+    transaction = conn.transaction()
+    await transaction.start()
+    try:
+        if seed:
+            for statement in SEED_SQL:
+                args = [seed] if '$1' in statement else []
+                await conn.execute(statement, *args)
+            for table in ANALYZED_TABLES:
+                await conn.execute(f"ANALYZE {table}")
+
+        sample = await conn.fetchrow(SAMPLE_SQL)
+        if sample is None:
+            raise RuntimeError("No facility with service offerings to sample; run with --seed")
+        params = dict(sample)
+        params['facility_ids'] = [
+            row['id'] for row in await conn.fetch("SELECT id FROM facilities ORDER BY id LIMIT 50")
+        ]
+
+        for name, table, sql, columns in QUERIES:
+            values = [params[column] for column in columns]
+            if any(value is None for value in values):
+                results.append({'query': name, 'table': table, 'skipped': 'no sample row'})
+                continue
+            raw = await conn.fetchval(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}", *values)
+            explained = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+            scans = [scan for scan in plan_scans(explained['Plan']) if scan['relation'] == table]
+            results.append({
+                'query': name,
+                'table': table,
+                'scans': scans,
+                'uses_index': bool(scans) and all(scan['index'] for scan in scans),
+                'execution_ms': explained.get('Execution Time'),
+            })
+    finally:
+        await transaction.rollback()
+    return results
+
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='EXPLAIN ANALYZE the crawler queries against a local Postgres')
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL'),
+                        help='Postgres connection string (default: DATABASE_URL)')
+    parser.add_argument('--seed', type=int, default=5000,
+                        help='Synthetic facilities to insert first, rolled back afterwards; 0 uses existing rows')
+    args = parser.parse_args()
+
+    if not args.dsn:
+        logger.error("DATABASE_URL (or --dsn) is required")
+        sys.exit(1)
+
+    import asyncpg
+
+    conn = await asyncpg.connect(args.dsn)
+    try:
+        results = await explain_queries(conn, args.seed)
+    finally:
+        await conn.close()
+
+    print(f"\n{'query':<50}{'plan':<60}{'ms':>8}")
+    for result in results:
+        if 'skipped' in result:
+            print(f"{result['query']:<50}{'skipped: ' + result['skipped']:<60}")
+            continue
+        plan = ", ".join(f"{scan['node']}" + (f" ({scan['index']})" if scan['index'] else "") for scan in result['scans'])
+        marker = "" if result['uses_index'] else "  <-- no index"
+        print(f"{result['query']:<50}{plan:<60}{result['execution_ms'] or 0:>8.3f}{marker}")
+
+    if not all(result.get('uses_index', True) for result in results):
+        sys.exit(2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
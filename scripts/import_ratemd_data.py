@@ -9,6 +9,7 @@ import sys
 import json
 import logging
 import asyncio
+import argparse
 from typing import Dict, List, Optional, Any
 from datetime import datetime, timezone
 from urllib.parse import urlparse
@@ -21,7 +22,9 @@ load_dotenv()
 # Add the parent directory to the path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from utils.supabase_client import SupabaseClient
+from utils.supabase_client import SupabaseClient, MINIMAL
+from utils.facility_mirror import content_digest
+from utils.copy_loader import create_copy_loader
 
 # Configure logging
 logging.basicConfig(
@@ -43,7 +46,8 @@ class RateMDImporter:
             'existing_updated': 0,
             'new_created': 0,
             'errors': 0,
-            'skipped': 0
+            'skipped': 0,
+            'unchanged': 0
         }
 
     def generate_slug(self, name: str, detail_url: str) -> str:
@@ -114,8 +118,17 @@ class RateMDImporter:
         # Remove None values to avoid database issues
         return {k: v for k, v in facility_data.items() if v is not None}
 
+    def rating_digest(self, facility_data: Dict) -> str:
+        """Digest of the rating fields this importer writes, for the facility mirror"""
+        return content_digest({k: facility_data.get(k) for k in ('rating_avg', 'rating_count', 'rating_source')})
+
     async def find_existing_facility(self, facility_data: Dict) -> Optional[Dict]:
         """Find existing facility by name and location"""
+        mirror = self.supabase_client.mirror
+        if mirror:
+            known = mirror.find(None, facility_data['name'], facility_data['city'], facility_data['province'])
+            if known:
+                return known
         try:
             # Try to find by name, city, and province
             response = (
@@ -151,12 +164,12 @@ class RateMDImporter:
             
             response = (
                 self.supabase_client.client.table("facilities")
-                .update(update_data)
+                .update(update_data, **MINIMAL)
                 .eq("id", facility_id)
                 .execute()
             )
             
-            return len(response.data) > 0
+            return bool(response.count)
             
         except Exception as e:
             logger.error(f"Error updating facility {facility_id}: {e}")
@@ -169,13 +182,12 @@ class RateMDImporter:
             facility_data['created_at'] = datetime.now(timezone.utc).isoformat()
             facility_data['updated_at'] = datetime.now(timezone.utc).isoformat()
             
-            response = (
-                self.supabase_client.client.table("facilities")
-                .insert(facility_data)
-                .execute()
-            )
+            inserted = await self.supabase_client.insert_row("facilities", facility_data, columns="id")
+            if inserted and self.supabase_client.mirror:
+                self.supabase_client.mirror.remember(inserted['id'], facility_data, 'ratemd',
+                                                     self.rating_digest(facility_data))
             
-            return len(response.data) > 0
+            return bool(inserted)
             
         except Exception as e:
             logger.error(f"Error creating facility: {e}")
@@ -197,10 +209,22 @@ class RateMDImporter:
             
             # Find existing facility
             existing = await self.find_existing_facility(facility_data)
+            mirror = self.supabase_client.mirror
             
             if existing:
+                # Ratings already written by an earlier import are not written again
+                digest = self.rating_digest(facility_data)
+                if mirror and mirror.unchanged(existing['id'], 'ratemd', digest):
+                    self.stats['unchanged'] += 1
+                    return True
+                
                 # Update existing facility with rating data
                 success = await self.update_existing_facility(existing['id'], facility_data)
+                if success and mirror:
+                    mirror.remember(existing['id'], facility_data, 'ratemd', digest)
+                elif mirror:
+                    # Mirrored id no longer in the database; look it up again next time
+                    mirror.forget(existing['id'])
                 if success:
                     self.stats['existing_updated'] += 1
                     logger.info(f"Updated facility: {facility_data['name']}")
@@ -258,6 +282,55 @@ class RateMDImporter:
         except Exception as e:
             logger.error(f"Unexpected error during import: {e}")
 
+    async def import_data_copy(self, json_file_path: str, batch_size: int = 1000):
+        """Import data from JSON file with the COPY bulk loader (DATABASE_URL)"""
+        loader = create_copy_loader()
+        await loader.open()
+        try:
+            logger.info(f"Starting COPY import from {json_file_path}")
+            
+            with open(json_file_path, 'r', encoding='utf-8') as f:
+                ratemd_data = json.load(f)
+            
+            logger.info(f"Loaded {len(ratemd_data)} records from JSON file")
+            
+            for i in range(0, len(ratemd_data), batch_size):
+                bundles = []
+                for record in ratemd_data[i:i + batch_size]:
+                    self.stats['total_processed'] += 1
+                    facility_data = self.map_ratemd_to_facility(record)
+                    if not facility_data.get('name'):
+                        self.stats['skipped'] += 1
+                        continue
+                    bundles.append({'facility': facility_data})
+                
+                # Existing facilities only get their rating fields refreshed, as in update_existing_facility
+                outcomes = await loader.load(bundles, update_columns=[
+                    'rating_avg', 'rating_count', 'rating_source', 'rating_updated_at'
+                ])
+                if outcomes is None:
+                    self.stats['errors'] += len(bundles)
+                    continue
+                for outcome in outcomes:
+                    if outcome.get('error'):
+                        self.stats['errors'] += 1
+                    elif outcome.get('created'):
+                        self.stats['new_created'] += 1
+                    else:
+                        self.stats['existing_updated'] += 1
+                
+                logger.info(f"Processed {min(i + batch_size, len(ratemd_data))}/{len(ratemd_data)} records")
+            
+            logger.info("Import completed successfully")
+            self.print_stats()
+            
+        except FileNotFoundError:
+            logger.error(f"JSON file not found: {json_file_path}")
+        except json.JSONDecodeError as e:
+            logger.error(f"Invalid JSON file: {e}")
+        finally:
+            await loader.close()
+
     def print_stats(self):
         """Print import statistics"""
         logger.info("=== Import Statistics ===")
@@ -266,17 +339,24 @@ class RateMDImporter:
         logger.info(f"New facilities created: {self.stats['new_created']}")
         logger.info(f"Errors: {self.stats['errors']}")
         logger.info(f"Skipped: {self.stats['skipped']}")
+        logger.info(f"Unchanged (facility mirror): {self.stats['unchanged']}")
         logger.info("========================")
 
 async def main():
     """Main function"""
+    parser = argparse.ArgumentParser(description='Import RateMD data into the facilities table')
+    parser.add_argument('json_file', nargs='?', default='ratemd.json',
+                        help='RateMD JSON export (default: ratemd.json)')
+    parser.add_argument('--ingest-mode', choices=['rows', 'copy'], default='rows',
+                        help='Per-record writes via Supabase, or COPY bulk load via DATABASE_URL')
+    args = parser.parse_args()
+    
     # Check environment variables
     if not os.environ.get("SUPABASE_URL") or not os.environ.get("SUPABASE_KEY"):
         logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
         sys.exit(1)
     
-    # Get JSON file path from command line argument or use default
-    json_file_path = sys.argv[1] if len(sys.argv) > 1 else "ratemd.json"
+    json_file_path = args.json_file
     
     if not os.path.exists(json_file_path):
         logger.error(f"JSON file not found: {json_file_path}")
@@ -289,9 +369,13 @@ async def main():
     if not await importer.supabase_client.test_connection():
         logger.error("Failed to connect to Supabase")
         sys.exit(1)
+    await importer.supabase_client.sync_mirror()
     
     # Run import
-    await importer.import_data(json_file_path)
+    if args.ingest_mode == 'copy':
+        await importer.import_data_copy(json_file_path)
+    else:
+        await importer.import_data(json_file_path)
 
 if __name__ == "__main__":
     asyncio.run(main())
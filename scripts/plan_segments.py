@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+NaviCare Segment Planner
+Plans balanced page range segments from measured per-page cost of previous runs
+"""
+
+import os
+import sys
+import json
+import asyncio
+import argparse
+import logging
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from crawlers import CrawlConfig, LabCrawlConfig, PharmacyCrawlConfig
+from utils.segment_planner import load_page_costs, estimate_page_costs, plan_segments
+
+# Log to stderr so stdout stays machine-readable JSON
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    stream=sys.stderr
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+SOURCE_URLS = {
+    'clinic': ('CORTICO_API_URL', CrawlConfig.base_url),
+    'lab': ('CORTICO_API_URL_LAB', LabCrawlConfig.base_url),
+    'pharmacy': ('CORTICO_API_URL_PHARMACY', PharmacyCrawlConfig.base_url),
+}
+
+async def fetch_total_pages(source: str) -> Optional[int]:
+    """Read the current total_pages from the first page of the source API"""
+    env_var, default_url = SOURCE_URLS[source]
+    base_url = os.getenv(env_var) or default_url
+    timeout = aiohttp.ClientTimeout(total=30)
+    async with aiohttp.ClientSession(timeout=timeout) as session:
+        async with session.get(f"{base_url}?format=json&page=1") as response:
+            if response.status != 200:
+                logger.error(f"HTTP {response.status} fetching total pages from {base_url}")
+                return None
+            data = await response.json()
+            return data.get('total_pages')
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='NaviCare Segment Planner')
+    parser.add_argument('--source', choices=sorted(SOURCE_URLS), default='clinic',
+                        help='Crawl source to plan (default: clinic)')
+    parser.add_argument('--cost-log', default=os.getenv('CRAWL_COST_LOG', 'page_costs.jsonl'),
+                        help='JSON lines file written by the page range crawlers')
+    parser.add_argument('--history-before', type=float,
+                        help='Ignore cost measurements recorded at or after this epoch timestamp')
+    parser.add_argument('--total-pages', type=int,
+                        help='Total pages to plan (default: read from the source API)')
+    parser.add_argument('--target-minutes', type=float, default=300,
+                        help='Wall-clock budget per segment in minutes (default: 300)')
+    parser.add_argument('--setup-minutes', type=float, default=3,
+                        help='Fixed per-segment overhead such as dependency install (default: 3)')
+    parser.add_argument('--default-page-seconds', type=float, default=90,
+                        help='Assumed cost of a page when no history exists (default: 90)')
+    parser.add_argument('--segments', type=int,
+                        help='Plan exactly this many segments instead of the minimum that fits')
+    parser.add_argument('--segment', type=int,
+                        help='Print only this segment as key=value lines (for $GITHUB_OUTPUT)')
+    return parser.parse_args()
+
+async def main():
+    """Main function"""
+    args = parse_args()
+
+    total_pages = args.total_pages or await fetch_total_pages(args.source)
+    if not total_pages:
+        logger.error("Unable to determine total pages; pass --total-pages")
+        sys.exit(1)
+
+    observed = load_page_costs(args.cost_log, args.source, recorded_before=args.history_before)
+    page_costs = estimate_page_costs(observed, total_pages, args.default_page_seconds)
+    logger.info(f"Planning {total_pages} {args.source} pages "
+                f"({len(observed)} with measured cost, {total_pages - len(observed)} estimated)")
+
+    plan = plan_segments(
+        page_costs,
+        target_seconds=args.target_minutes * 60,
+        segments=args.segments,
+        setup_seconds=args.setup_minutes * 60
+    )
+
+    for segment in plan:
+        logger.info(f"Segment {segment['segment']}: pages {segment['start_page']}-{segment['end_page']}, "
+                    f"predicted {segment['predicted_seconds'] / 60:.1f} min")
+        if not segment['fits_target']:
+            logger.warning(f"Segment {segment['segment']} exceeds the {args.target_minutes:.0f} min target")
+
+    if args.segment is not None:
+        selected = next((s for s in plan if s['segment'] == args.segment), None)
+        if not selected:
+            # More segments scheduled than needed; nothing left for this one
+            print("start_page=0")
+            print("end_page=0")
+            return
+        print(f"start_page={selected['start_page']}")
+        print(f"end_page={selected['end_page']}")
+        print(f"predicted_seconds={selected['predicted_seconds']}")
+        return
+
+    print(json.dumps({'include': plan}))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+NaviCare Observation Retention
+Rolls facility_observations older than the retention window into daily or weekly aggregates and
+deletes the raw rows in bounded batches (migrations/007_observation_retention.sql)
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from utils.supabase_client import SupabaseClient
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+def format_bytes(size: Optional[int]) -> str:
+    if size is None:
+        return 'unknown'
+    for unit in ('B', 'kB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+def print_storage(label: str, storage: Dict):
+    print(f"\n{label}:")
+    for name in ('observations', 'rollups'):
+        table = storage.get(name, {})
+        print(f"  {name.title()}: ~{table.get('rows', 'unknown')} rows, {format_bytes(table.get('bytes'))}")
+
+async def prune_observations(db_client: SupabaseClient, before: datetime, period: str = 'day',
+                             batch_size: int = 10000, max_batches: Optional[int] = None) -> Optional[Dict]:
+    """Roll up and delete observations made before `before`, one batch per call, until none are left.
+
+    Returns {'batches', 'rolled_up', 'deleted', 'remaining'}; None if the first batch failed.
+    """
+    totals = {'batches': 0, 'rolled_up': 0, 'deleted': 0, 'remaining': True}
+    started = time.monotonic()
+    while totals['remaining'] and (max_batches is None or totals['batches'] < max_batches):
+        result = await db_client.roll_up_observations(before, period, batch_size)
+        if result is None:
+            return totals if totals['batches'] else None
+        totals['batches'] += 1
+        totals['rolled_up'] += result['rolled_up']
+        totals['deleted'] += result['deleted']
+        totals['remaining'] = result['remaining']
+        rate = totals['deleted'] / max(time.monotonic() - started, 1e-6)
+        logger.info(f"Batch {totals['batches']}: {totals['deleted']} observations deleted "
+                    f"({rate:.0f} rows/s), {totals['rolled_up']} rollup rows written")
+    return totals
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='NaviCare observation retention (roll up and delete old rows)')
+    parser.add_argument('--keep-days', type=int,
+                        default=int(os.getenv('OBSERVATION_RETENTION_DAYS', '90')),
+                        help='Keep raw observations for this many days (default: 90)')
+    parser.add_argument('--period', choices=['day', 'week'], default='day',
+                        help='Granularity of the rollups older observations are folded into (default: day)')
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help='Observations rolled up and deleted per call (default: 10000)')
+    parser.add_argument('--max-batches', type=int,
+                        help='Stop after this many batches (the next run continues)')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only report table sizes and how many observations are past retention')
+    args = parser.parse_args()
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        sys.exit(1)
+
+    db_client = SupabaseClient()
+    before = datetime.now(timezone.utc) - timedelta(days=args.keep_days)
+    print_storage("Before", await db_client.observation_storage())
+
+    if args.dry_run:
+        response = (
+            db_client.client.table("facility_observations")
+            .select("id", count="exact", head=True)
+            .lt("observed_at", before.isoformat())
+            .execute()
+        )
+        print(f"\nObservations before {before.date()}: {response.count}")
+        db_client.close()
+        return
+
+    result = await prune_observations(db_client, before, args.period, args.batch_size, args.max_batches)
+    print_storage("After", await db_client.observation_storage())
+    db_client.close()
+    if result is None:
+        sys.exit(1)
+
+    print(f"\nRetention: observations before {before.date()} rolled up by {args.period}")
+    for key in ('batches', 'deleted', 'rolled_up'):
+        print(f"  {key.replace('_', ' ').title()}: {result[key]}")
+    if result['remaining']:
+        print("  Older observations remain; run again to continue")
+    # Deleted rows leave free space that autovacuum hands to new rows; the file itself does not shrink
+    print("  Row estimates update after autovacuum; freed space is reused by new observations")
+
+if __name__ == "__main__":
+    asyncio.run(main())
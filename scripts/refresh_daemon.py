@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+NaviCare Continuous Refresh Daemon
+Long-running service that refreshes source pages in staleness-priority order within a request budget
+"""
+
+import os
+import sys
+import json
+import signal
+import asyncio
+import argparse
+import logging
+from typing import Dict, Optional
+from dotenv import load_dotenv
+
+from crawlers import CorticoCrawler, CrawlConfig, LabCrawler, LabCrawlConfig, PharmacyCrawler, PharmacyCrawlConfig
+from utils.refresh_scheduler import RefreshScheduler, RequestBudget, record_key, record_digest
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+def create_crawlers(sources) -> Dict:
+    """Create a crawler per enabled source with configuration from environment variables"""
+    common = dict(
+        batch_size=int(os.getenv('CRAWLER_BATCH_SIZE', '25')),
+        max_concurrent=int(os.getenv('CRAWLER_MAX_CONCURRENT', '3')),
+        delay_between_requests=float(os.getenv('CRAWLER_DELAY', '1.0')),
+        max_retries=int(os.getenv('CRAWLER_MAX_RETRIES', '3')),
+        dead_letter_path=os.getenv('CRAWLER_DEAD_LETTER_FILE'),
+    )
+    factories = {
+        'clinic': lambda: CorticoCrawler(CrawlConfig(base_url=os.getenv('CORTICO_API_URL') or CrawlConfig.base_url, **common)),
+        'lab': lambda: LabCrawler(LabCrawlConfig(base_url=os.getenv('CORTICO_API_URL_LAB') or LabCrawlConfig.base_url, **common)),
+        'pharmacy': lambda: PharmacyCrawler(PharmacyCrawlConfig(base_url=os.getenv('CORTICO_API_URL_PHARMACY') or PharmacyCrawlConfig.base_url, **common)),
+    }
+    return {source: factories[source]() for source in sources}
+
+def process_function(source: str, crawler):
+    """Return the crawler's per-record processing coroutine for a source"""
+    if source == 'clinic':
+        return crawler.process_facility
+    if source == 'lab':
+        return crawler.process_lab
+    return crawler.process_pharmacy
+
+class RefreshDaemon:
+    def __init__(self, crawlers: Dict, requests_per_minute: float, state_file: Optional[str] = None):
+        self.crawlers = crawlers
+        self.scheduler = RefreshScheduler()
+        self.budget = RequestBudget(requests_per_minute)
+        self.state_file = state_file
+        self.digests: Dict[str, Dict[str, str]] = {source: {} for source in crawlers}
+        self.stopping = asyncio.Event()
+        self.stats = {
+            'pages_refreshed': 0,
+            'pages_failed': 0,
+            'records_changed': 0,
+            'records_unchanged': 0,
+        }
+
+    def load_state(self):
+        """Restore page intervals and record digests from a previous run"""
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        with open(self.state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        # Sources dropped from --sources since the last run are not restored
+        self.scheduler.load_dict(state.get('scheduler', {}), sources=self.crawlers)
+        for source, digests in state.get('digests', {}).items():
+            if source in self.digests:
+                self.digests[source] = digests
+        logger.info(f"Restored refresh state for {len(self.scheduler)} pages from {self.state_file}")
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'scheduler': self.scheduler.to_dict(), 'digests': self.digests}, f)
+        os.replace(tmp_path, self.state_file)
+
+    async def refresh(self, target):
+        """Fetch one page and process only the records whose content changed"""
+        crawler = self.crawlers[target.source]
+        page_url = f"{crawler.config.base_url}?format=json&page={target.page}"
+
+        await self.budget.acquire()
+        page_data = await crawler.fetch_page(page_url)
+        if not page_data:
+            logger.error(f"Failed to refresh {target.source} page {target.page}")
+            self.stats['pages_failed'] += 1
+            self.scheduler.reschedule(target, changed=False, failed=True)
+            return
+
+        total_pages = page_data.get('total_pages')
+        if isinstance(total_pages, int) and total_pages > 0:
+            self.scheduler.sync_pages(target.source, total_pages)
+
+        digests = self.digests[target.source]
+        changed_records = []
+        for record in page_data.get('results', []):
+            key = record_key(record)
+            digest = record_digest(record)
+            if key is not None and digests.get(key) == digest:
+                self.stats['records_unchanged'] += 1
+                continue
+            changed_records.append((key, digest, record))
+
+        process = process_function(target.source, crawler)
+        semaphore = asyncio.Semaphore(crawler.config.max_concurrent)
+
+        async def process_with_semaphore(key, digest, record):
+            async with semaphore:
+                succeeded = await process(record)
+                # Only remember the digest if processing succeeded, so failures are retried
+                if key is not None and succeeded:
+                    digests[key] = digest
+
+        await asyncio.gather(*(process_with_semaphore(*item) for item in changed_records),
+                             return_exceptions=True)
+
+        self.stats['pages_refreshed'] += 1
+        self.stats['records_changed'] += len(changed_records)
+        self.scheduler.reschedule(target, changed=bool(changed_records))
+        logger.info(f"Refreshed {target.source} page {target.page}: {len(changed_records)} changed, "
+                    f"next in {target.interval / 60:.0f} min")
+
+    async def run(self, save_every: int = 20):
+        self.load_state()
+        for source in self.crawlers:
+            self.scheduler.add(source, 1)
+
+        while not self.stopping.is_set():
+            target = self.scheduler.pop_due()
+            if not target:
+                wait = self.scheduler.seconds_until_next()
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), timeout=60 if wait is None else min(wait, 60))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self.refresh(target)
+            if self.stats['pages_refreshed'] % save_every == 0:
+                self.save_state()
+                logger.info(f"Progress: {self.stats}, source requests spent: {self.budget.spent}")
+
+        self.save_state()
+        logger.info(f"Refresh daemon stopped. Stats: {self.stats}, source requests spent: {self.budget.spent}")
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='NaviCare Continuous Refresh Daemon')
+    parser.add_argument('--sources', default='clinic,lab,pharmacy',
+                        help='Comma separated sources to refresh (default: clinic,lab,pharmacy)')
+    parser.add_argument('--requests-per-minute', type=float, default=30,
+                        help='Source API page fetch budget per minute (default: 30)')
+    parser.add_argument('--state-file', default=os.getenv('REFRESH_STATE_FILE', 'refresh_state.json'),
+                        help='File used to persist refresh intervals and record digests')
+    args = parser.parse_args()
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        sys.exit(1)
+
+    sources = [s.strip() for s in args.sources.split(',') if s.strip()]
+    unknown = [s for s in sources if s not in ('clinic', 'lab', 'pharmacy')]
+    if unknown:
+        parser.error(f"Unknown sources: {', '.join(unknown)}")
+
+    crawlers = create_crawlers(sources)
+    for crawler in crawlers.values():
+        await crawler.__aenter__()
+
+    daemon = RefreshDaemon(crawlers, args.requests_per_minute, args.state_file)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, daemon.stopping.set)
+
+    try:
+        await daemon.run()
+    finally:
+        for crawler in crawlers.values():
+            await crawler.__aexit__(None, None, None)
+
+if __name__ == "__main__":
+    asyncio.run(main())
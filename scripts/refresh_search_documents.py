@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+NaviCare Search Document Refresh
+Builds facility search documents outside a crawl: every facility (backfill after applying
+migrations/008_facility_search_documents.sql) or those updated in the last few hours
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from dotenv import load_dotenv
+
+from utils.supabase_client import SupabaseClient
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+async def refresh_all(db_client: SupabaseClient, chunk_size: int = 500) -> Optional[int]:
+    """Refresh the documents of every facility, paging ids by key; None if a chunk failed"""
+    written = 0
+    last_id = None
+    while True:
+        query = db_client.client.table("facilities").select("id").order("id").limit(chunk_size)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        facility_ids = [row['id'] for row in query.execute().data or []]
+        if not facility_ids:
+            return written
+        count = await db_client.refresh_search_documents(facility_ids)
+        if count is None:
+            return None
+        written += count
+        last_id = facility_ids[-1]
+        logger.info(f"Through facility {last_id}: {written} documents rewritten")
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='NaviCare facility search document refresh')
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--all', action='store_true',
+                       help='Refresh the documents of every facility')
+    group.add_argument('--since-hours', type=float,
+                       help='Refresh facilities updated in the last N hours')
+    parser.add_argument('--chunk-size', type=int, default=500,
+                        help='Facilities refreshed per call with --all (default: 500)')
+    args = parser.parse_args()
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        sys.exit(1)
+
+    db_client = SupabaseClient()
+    if args.all:
+        written = await refresh_all(db_client, args.chunk_size)
+    else:
+        since = datetime.now(timezone.utc) - timedelta(hours=args.since_hours)
+        written = await db_client.refresh_search_documents([], changed_since=since)
+    db_client.close()
+    if written is None:
+        sys.exit(1)
+    print(f"Search documents rewritten: {written}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+NaviCare Dead-Letter Replay
+Reprocesses only the records and pages quarantined in a dead-letter file
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from typing import Dict, List
+from dotenv import load_dotenv
+
+from crawlers import CorticoCrawler, CrawlConfig, LabCrawler, LabCrawlConfig, PharmacyCrawler, PharmacyCrawlConfig
+from utils.dead_letter import DeadLetterQueue, dead_letter_key, RECORD, PAGE
+from utils.bundle_ingest import ingest_page_bundles
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+SOURCES = {
+    'clinic': (CorticoCrawler, CrawlConfig, 'CORTICO_API_URL', 'process_facility'),
+    'lab': (LabCrawler, LabCrawlConfig, 'CORTICO_API_URL_LAB', 'process_lab'),
+    'pharmacy': (PharmacyCrawler, PharmacyCrawlConfig, 'CORTICO_API_URL_PHARMACY', 'process_pharmacy'),
+}
+
+async def replay_source(source: str, entries: List[Dict], retry_path: str, concurrency: int,
+                        ingest_mode: str = 'rows') -> Dict:
+    """Replay one source's dead letters; anything that fails again is written to retry_path"""
+    crawler_class, config_class, url_env, process_name = SOURCES[source]
+    config = config_class(
+        base_url=os.getenv(url_env) or config_class.base_url,
+        max_concurrent=concurrency,
+        max_retries=int(os.getenv('CRAWLER_MAX_RETRIES', '3')),
+        dead_letter_path=retry_path,
+        ingest_mode=ingest_mode,
+    )
+    stats = {'records': 0, 'pages': 0}
+
+    async with crawler_class(config) as crawler:
+        process = getattr(crawler, process_name)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        if ingest_mode != 'rows':
+            # Bulk modes load every quarantined record of the source in one call. The replay has
+            # no write spool, so records that fail again are re-quarantined one by one rather than
+            # as a page, which would have no URL to fetch it from
+            records = [entry.get('record') for entry in entries if entry.get('kind') != PAGE]
+            if records:
+                try:
+                    await crawler.db_client.health.wait_until_writable()
+                    ingest = crawler.copy_loader.load if crawler.copy_loader else None
+                    await ingest_page_bundles(crawler, source, records, crawler.build_bundle, ingest)
+                except Exception as e:
+                    logger.error(f"Error replaying {len(records)} {source} records: {e}")
+                    for record in records:
+                        crawler.dead_letters.record_failure(source, record, e)
+                stats['records'] += len(records)
+            entries = [entry for entry in entries if entry.get('kind') == PAGE]
+
+        async def replay_entry(entry: Dict):
+            async with semaphore:
+                if entry.get('kind') == PAGE:
+                    page_data = await crawler.fetch_page(entry['page_url'])
+                    if not page_data:
+                        crawler.dead_letters.page_failure(source, entry['page_url'], entry.get('page_number'))
+                        return
+                    if ingest_mode != 'rows':
+                        await crawler.process_page(page_data.get('results', []), entry['page_url'], entry.get('page_number'))
+                    else:
+                        for record in page_data.get('results', []):
+                            await process(record)
+                    stats['pages'] += 1
+                else:
+                    await process(entry.get('record'))
+                    stats['records'] += 1
+
+        async def replay_or_requarantine(entry: Dict):
+            # Anything that raises goes back to the retry file, or the entry would be dropped
+            # when the dead-letter file is rewritten
+            try:
+                await replay_entry(entry)
+            except Exception as e:
+                logger.error(f"Error replaying {source} {entry.get('kind')} dead letter: {e}")
+                if entry.get('kind') == PAGE:
+                    crawler.dead_letters.page_failure(source, entry['page_url'], entry.get('page_number'),
+                                                      type(e).__name__, str(e))
+                else:
+                    crawler.dead_letters.record_failure(source, entry.get('record'), e)
+
+        await asyncio.gather(*(replay_or_requarantine(entry) for entry in entries))
+
+    return stats
+
+async def replay_failures(dead_letter_file: str, sources: List[str], concurrency: int,
+                          ingest_mode: str = 'rows') -> Dict:
+    """Replay quarantined entries and rewrite the dead-letter file with what still fails"""
+    queue = DeadLetterQueue(dead_letter_file)
+    entries = queue.load()
+    if not entries:
+        logger.info(f"No dead letters in {dead_letter_file}")
+        return {'replayed': 0, 'still_failing': 0}
+
+    selected, kept = [], []
+    for entry in entries:
+        if entry.get('kind') == PAGE and not entry.get('page_url'):
+            logger.warning(f"Keeping {entry.get('source')} page dead letter without a page URL; it cannot be refetched")
+            kept.append(entry)
+        elif entry.get('source') in sources and entry.get('kind') in (RECORD, PAGE):
+            selected.append(entry)
+        else:
+            kept.append(entry)
+    attempts = {dead_letter_key(e): e.get('attempts', 1) for e in selected}
+    logger.info(f"Replaying {len(selected)} of {len(entries)} dead letters from {dead_letter_file}")
+
+    retry_path = f"{dead_letter_file}.retry"
+    if os.path.exists(retry_path):
+        os.remove(retry_path)
+
+    for source in sources:
+        source_entries = [e for e in selected if e['source'] == source]
+        if not source_entries:
+            continue
+        stats = await replay_source(source, source_entries, retry_path, concurrency, ingest_mode)
+        logger.info(f"Replayed {source}: {stats['records']} records, {stats['pages']} pages")
+
+    # Failures during replay were re-quarantined; carry their attempt counts forward
+    retry_queue = DeadLetterQueue(retry_path)
+    still_failing = retry_queue.load()
+    for entry in still_failing:
+        entry['attempts'] = attempts.get(dead_letter_key(entry), 0) + 1
+    queue.replace(kept + still_failing)
+    if os.path.exists(retry_path):
+        os.remove(retry_path)
+
+    logger.info(f"Replay complete: {len(selected) - len(still_failing)} recovered, "
+                f"{len(still_failing)} still failing")
+    return {'replayed': len(selected), 'still_failing': len(still_failing)}
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='NaviCare Dead-Letter Replay (replay-failures)')
+    parser.add_argument('--dead-letter-file', default=os.getenv('CRAWLER_DEAD_LETTER_FILE', 'dead_letters.jsonl'),
+                        help='Dead-letter file written by the crawlers (default: CRAWLER_DEAD_LETTER_FILE)')
+    parser.add_argument('--sources', default='clinic,lab,pharmacy',
+                        help='Comma separated sources to replay (default: all)')
+    parser.add_argument('--concurrency', type=int, default=2,
+                        help='Concurrent replays, independent of CRAWLER_MAX_CONCURRENT (default: 2)')
+    parser.add_argument('--ingest-mode', choices=['rows', 'bundle', 'copy'],
+                        default=os.getenv('CRAWLER_INGEST_MODE', 'rows'),
+                        help='Write path for replayed records (default: CRAWLER_INGEST_MODE or rows)')
+    args = parser.parse_args()
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        sys.exit(1)
+
+    sources = [s.strip() for s in args.sources.split(',') if s.strip()]
+    unknown = [s for s in sources if s not in SOURCES]
+    if unknown:
+        parser.error(f"Unknown sources: {', '.join(unknown)}")
+
+    result = await replay_failures(args.dead_letter_file, sources, args.concurrency, args.ingest_mode)
+    if result['still_failing']:
+        sys.exit(2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,12 +4,14 @@
 import argparse
 import asyncio
 import logging
-from typing import Iterable, Tuple, Union
+import time
+from typing import Dict, Iterable, Optional, Tuple
 
 from dotenv import load_dotenv
 from postgrest import APIError
+from postgrest.types import CountMethod
 
-from utils.supabase_client import SupabaseClient
+from utils.supabase_client import MINIMAL, SupabaseClient
 
 
 logging.basicConfig(
@@ -19,48 +21,138 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-DUMMY_UUID = "00000000-0000-0000-0000-000000000000"
-DUMMY_TEXT = "__DELETE_ALL__"
-DUMMY_INT = -1
+# (table, key column); chunks are key ranges of this column
+ResetStep = Tuple[str, str]
+
+
+# Tables within a stage have no foreign keys between them and are cleared in parallel; a stage
+# starts once every table of the previous one is empty
+CORE_STAGES: Tuple[Tuple[ResetStep, ...], ...] = (
+    (
+        ("facility_service_availability", "id"),
+        ("facility_booking_channels", "id"),
+        ("facility_hours", "id"),
+        ("facility_service_offerings", "facility_id"),
+        ("facility_specialties", "facility_id"),
+        ("facility_languages", "facility_id"),
+        ("facility_tags", "facility_id"),
+        ("user_favorites", "facility_id"),
+    ),
+    (
+        ("facilities", "id"),
+    ),
+)
 
 
-ResetStep = Tuple[str, Tuple[str, Union[str, int]]]
+REFERENCE_STAGES: Tuple[Tuple[ResetStep, ...], ...] = (
+    (
+        ("services", "id"),
+        ("specialties", "id"),
+        ("languages", "code"),
+    ),
+)
 
+CORE_TABLES: Tuple[ResetStep, ...] = tuple(step for stage in CORE_STAGES for step in stage)
+REFERENCE_TABLES: Tuple[ResetStep, ...] = tuple(step for stage in REFERENCE_STAGES for step in stage)
 
-CORE_TABLES: Tuple[ResetStep, ...] = (
-    ("facility_service_availability", ("id", DUMMY_INT)),
-    ("facility_booking_channels", ("id", DUMMY_INT)),
-    ("facility_hours", ("id", DUMMY_INT)),
-    ("facility_service_offerings", ("facility_id", DUMMY_UUID)),
-    ("facility_specialties", ("facility_id", DUMMY_UUID)),
-    ("facility_languages", ("facility_id", DUMMY_UUID)),
-    ("facility_tags", ("facility_id", DUMMY_UUID)),
-    ("user_favorites", ("facility_id", DUMMY_UUID)),
-    ("facilities", ("id", DUMMY_UUID)),
-)
 
+class ResetProgress:
+    """Rows deleted per table and overall, with rates, for progress logging"""
 
-REFERENCE_TABLES: Tuple[ResetStep, ...] = (
-    ("services", ("id", DUMMY_INT)),
-    ("specialties", ("id", DUMMY_UUID)),
-    ("languages", ("code", DUMMY_TEXT)),
-)
+    def __init__(self):
+        self.started = time.monotonic()
+        self.deleted: Dict[str, int] = {}
+        self.estimates: Dict[str, Optional[int]] = {}
+
+    def record(self, table: str, rows: int, table_started: float):
+        self.deleted[table] = self.deleted.get(table, 0) + rows
+        done = self.deleted[table]
+        estimate = self.estimates.get(table)
+        share = f"/~{estimate} ({min(done / estimate, 1):.0%})" if estimate else ""
+        rate = done / max(time.monotonic() - table_started, 1e-6)
+        logger.info("%s: %d%s rows deleted, %.0f rows/s", table, done, share, rate)
 
+    def total(self) -> int:
+        return sum(self.deleted.values())
 
-def _delete_table_rows(client: SupabaseClient, table: str, column: str, sentinel: Union[str, int]) -> int:
-    """Delete all rows from a table using a negative filter."""
+    def rate(self) -> float:
+        return self.total() / max(time.monotonic() - self.started, 1e-6)
+
+
+def _estimate_rows(client: SupabaseClient, table: str, column: str) -> Optional[int]:
+    """Planner row estimate (exact for small tables), only used for progress"""
+    try:
+        response = client.client.table(table).select(column, count=CountMethod.estimated, head=True).execute()
+        return response.count
+    except APIError:
+        return None
+
+
+def _delete_chunk(client: SupabaseClient, table: str, column: str, chunk_size: int) -> Optional[int]:
+    """Delete the rows in the key range of the next chunk_size rows, returning nothing.
+
+    Returns the number of rows deleted, or None once the table is empty.
+    """
+    keys = client.client.table(table).select(column).order(column).limit(chunk_size).execute().data
+    if not keys:
+        return None
+    response = (
+        client.client.table(table)
+        .delete(**MINIMAL)
+        .gte(column, keys[0][column])
+        .lte(column, keys[-1][column])
+        .execute()
+    )
+    if not response.count:
+        # e.g. row level security hides rows from this key; stop instead of looping on them
+        raise RuntimeError(f"Rows in {table} could not be deleted (key range {keys[0][column]}..{keys[-1][column]})")
+    return response.count
+
+
+async def _clear_table(client: SupabaseClient, table: str, column: str, chunk_size: int,
+                       progress: ResetProgress, semaphore: asyncio.Semaphore) -> int:
+    """Delete all rows of a table in bounded chunks; the blocking client calls run in worker threads"""
+    async with semaphore:
+        progress.estimates[table] = await asyncio.to_thread(_estimate_rows, client, table, column)
+        table_started = time.monotonic()
+        while True:
+            try:
+                deleted = await asyncio.to_thread(_delete_chunk, client, table, column, chunk_size)
+            except APIError as exc:
+                logger.error("Failed to clear %s: %s", table, exc)
+                raise
+            if deleted is None:
+                break
+            progress.record(table, deleted, table_started)
+        logger.info("Cleared %s (deleted %d rows)", table, progress.deleted.get(table, 0))
+        return progress.deleted.get(table, 0)
+
+
+async def clear_stages(client: SupabaseClient, stages: Iterable[Tuple[ResetStep, ...]], chunk_size: int = 5000,
+                       workers: int = 4) -> ResetProgress:
+    """Clear the tables of each stage in parallel, one stage after the other"""
+    progress = ResetProgress()
+    semaphore = asyncio.Semaphore(workers)
+    for stage in stages:
+        await asyncio.gather(*(
+            _clear_table(client, table, column, chunk_size, progress, semaphore)
+            for table, column in stage
+        ))
+    return progress
+
+
+def _truncate_tables(client: SupabaseClient, include_reference: bool) -> None:
+    """Truncate every reset table in one statement via reset_navicare_tables() (migrations/006)"""
     try:
-        query = client.client.table(table).delete().neq(column, sentinel)
-        response = query.execute()
-        deleted_count = len(response.data) if response.data else 0
-        logger.info("Cleared %s (deleted %d rows)", table, deleted_count)
-        return deleted_count
+        response = client.client.rpc("reset_navicare_tables", {"p_include_reference": include_reference}).execute()
+        logger.info("Truncated %s", ", ".join(response.data or []) or "no tables")
     except APIError as exc:
-        logger.error("Failed to clear %s: %s", table, exc)
+        logger.error("Failed to truncate tables: %s", exc)
         raise
 
 
-async def reset_database(include_reference: bool = False) -> None:
+async def reset_database(include_reference: bool = False, chunk_size: int = 5000, workers: int = 4,
+                         truncate: bool = False) -> None:
     """Remove data from Supabase tables in dependency order."""
     load_dotenv()
 
@@ -68,12 +160,22 @@ async def reset_database(include_reference: bool = False) -> None:
     if not await client.test_connection():
         raise RuntimeError("Unable to connect to Supabase; check environment variables")
 
-    tables: Iterable[ResetStep] = CORE_TABLES
+    stages: Iterable[Tuple[ResetStep, ...]] = CORE_STAGES
     if include_reference:
-        tables = (*CORE_TABLES, *REFERENCE_TABLES)
+        stages = (*CORE_STAGES, *REFERENCE_STAGES)
 
-    for table, (column, sentinel) in tables:
-        _delete_table_rows(client, table, column, sentinel)
+    started = time.monotonic()
+    if truncate:
+        _truncate_tables(client, include_reference)
+        logger.info("Truncated in %.1fs", time.monotonic() - started)
+    else:
+        progress = await clear_stages(client, stages, chunk_size, workers)
+        logger.info("Deleted %d rows in %.1fs (%.0f rows/s)",
+                    progress.total(), time.monotonic() - progress.started, progress.rate())
+
+    # Mirrored facility ids and digests would otherwise skip writes for facilities that are gone
+    if client.mirror:
+        client.mirror.clear()
 
     logger.info("Database reset complete")
 
@@ -85,12 +187,30 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Also clear reference tables (services, specialties, languages)."
     )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=5000,
+        help="Rows deleted per request (default: 5000)."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Tables cleared in parallel within a dependency stage (default: 4)."
+    )
+    parser.add_argument(
+        "--truncate",
+        action="store_true",
+        help="Truncate all tables in one call instead (requires migrations/006_reset_tables.sql)."
+    )
     return parser.parse_args()
 
 
 async def main() -> None:
     args = parse_args()
-    await reset_database(include_reference=args.include_reference)
+    await reset_database(include_reference=args.include_reference, chunk_size=args.chunk_size,
+                         workers=args.workers, truncate=args.truncate)
 
 
 if __name__ == "__main__":
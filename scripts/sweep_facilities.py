@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+NaviCare Facility Sweep
+Marks facilities a source no longer lists inactive, after a full crawl that recorded sightings
+(CRAWLER_RECORD_SIGHTINGS=true), e.g. once every page-range segment of the crawl has finished
+"""
+
+import os
+import sys
+import asyncio
+import argparse
+import logging
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+
+from utils.supabase_client import SupabaseClient
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+def parse_since(value: str) -> datetime:
+    since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return since if since.tzinfo else since.replace(tzinfo=timezone.utc)
+
+async def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description='NaviCare Facility Sweep (retire unseen facilities)')
+    parser.add_argument('--source', choices=['clinic', 'lab', 'pharmacy'], required=True,
+                        help='Crawl source whose unseen facilities are retired')
+    parser.add_argument('--since', type=parse_since, required=True,
+                        help='Start of the full crawl (ISO timestamp, UTC if no offset); '
+                             'facilities not seen since then are retired')
+    parser.add_argument('--max-fraction', type=float,
+                        default=float(os.getenv('CRAWLER_SWEEP_MAX_FRACTION', '0.05')),
+                        help='Refuse to retire more than this fraction of active facilities (default: 0.05)')
+    parser.add_argument('--purge', action='store_true',
+                        help='Also delete hours, availability and booking channels of retired facilities')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Only report how many facilities would be retired')
+    args = parser.parse_args()
+
+    if not os.getenv('SUPABASE_URL') or not os.getenv('SUPABASE_KEY'):
+        logger.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
+        sys.exit(1)
+
+    db_client = SupabaseClient()
+    result = await db_client.retire_unseen_facilities(args.source, args.since, args.max_fraction,
+                                                      args.purge, args.dry_run)
+    db_client.close()
+    if result is None:
+        sys.exit(1)
+
+    print(f"\nSource: {args.source} (not seen since {args.since.isoformat()})")
+    for key in ('active', 'unseen', 'retired', 'purged'):
+        print(f"  {key.title()}: {result[key]}")
+    if result['refused']:
+        print(f"  Refused: more than {args.max_fraction:.0%} of active facilities unseen; nothing retired")
+        sys.exit(2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,10 +8,12 @@ import os
 import sys
 import json
 import argparse
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from supabase import create_client
 from dotenv import load_dotenv
 
+from utils.supabase_client import FRESHNESS_BUCKETS
+
 # Load environment variables
 load_dotenv()
 
@@ -25,34 +27,32 @@ def create_supabase_client():
     
     return create_client(url, key)
 
-def get_crawl_statistics(client):
-    """Get crawl statistics from database"""
+def find_stale_sources(sources, stale_hours, now=None):
+    """Sources whose last sighting is older than stale_hours"""
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(hours=stale_hours)
+    stale = []
+    for source, summary in sources.items():
+        last_seen_at = summary.get('last_seen_at')
+        if not last_seen_at or datetime.fromisoformat(last_seen_at) < cutoff:
+            stale.append(source)
+    return sorted(stale)
+
+def get_crawl_statistics(client, stale_hours=48):
+    """Get crawl statistics from database, aggregated there by facility_stats()"""
     try:
-        # Get total facilities count
-        facilities_response = client.table("facilities").select("id", count="exact").execute()
-        total_facilities = facilities_response.count
+        stats = client.rpc("facility_stats", {}).execute().data or {}
         
         # Get recent observations count
         # Calculate date 7 days ago
         week_ago = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
         week_ago_iso = week_ago.isoformat()
         
-        observations_response = client.table("facility_observations").select("id", count="exact").gte("observed_at", week_ago_iso).execute()
-        recent_observations = observations_response.count
-        
-        # Get facility types distribution
-        types_response = client.table("facilities").select("facility_type").execute()
-        facility_types = {}
-        for facility in types_response.data:
-            facility_type = facility['facility_type']
-            facility_types[facility_type] = facility_types.get(facility_type, 0) + 1
+        observations_response = client.table("facility_observations").select("id", count="exact", head=True).gte("observed_at", week_ago_iso).execute()
+        stats['recent_observations'] = observations_response.count
         
-        return {
-            'total_facilities': total_facilities,
-            'recent_observations': recent_observations,
-            'facility_types': facility_types,
-            'last_updated': datetime.now(timezone.utc).isoformat()
-        }
+        stats['stale_sources'] = find_stale_sources(stats.get('sources', {}), stale_hours)
+        stats['last_updated'] = datetime.now(timezone.utc).isoformat()
+        return stats
     except Exception as e:
         print(f"Error fetching statistics: {e}")
         return None
@@ -91,6 +91,28 @@ def print_status_report(stats):
     for facility_type, count in sorted(facility_types.items()):
         print(f"  {facility_type}: {count}")
     
+    print("\nFacilities by Status:")
+    print("-"*30)
+    for status, count in sorted(stats.get('statuses', {}).items()):
+        print(f"  {status}: {count}")
+    
+    print("\nFacilities by Last Write:")
+    print("-"*30)
+    freshness = stats.get('freshness', {})
+    for bucket in FRESHNESS_BUCKETS:
+        if bucket in freshness:
+            print(f"  {bucket}: {freshness[bucket]}")
+    
+    print("\nFreshness by Source (last sighting):")
+    print("-"*30)
+    stale_sources = stats.get('stale_sources', [])
+    for source, summary in sorted(stats.get('sources', {}).items()):
+        marker = "  STALE" if source in stale_sources else ""
+        print(f"  {source}: {summary.get('facilities', 0)} facilities ({summary.get('active', 0)} active), "
+              f"last seen {summary.get('last_seen_at', 'never')}{marker}")
+        buckets = summary.get('freshness', {})
+        print("    " + "  ".join(f"{bucket}: {buckets[bucket]}" for bucket in FRESHNESS_BUCKETS if bucket in buckets))
+    
     print("="*50)
 
 def main():
@@ -98,6 +120,8 @@ def main():
     parser = argparse.ArgumentParser(description='NaviCare Crawl Status Tracker')
     parser.add_argument('--save', action='store_true', help='Save report to file')
     parser.add_argument('--filename', help='Filename for saving report')
+    parser.add_argument('--stale-hours', type=float, default=48,
+                        help='Flag sources not seen for this many hours as stale (default: 48)')
     
     args = parser.parse_args()
     
@@ -106,7 +130,7 @@ def main():
         client = create_supabase_client()
         
         # Get crawl statistics
-        stats = get_crawl_statistics(client)
+        stats = get_crawl_statistics(client, args.stale_hours)
         
         # Print status report
         print_status_report(stats)
@@ -9,6 +9,7 @@ import sys
 import asyncio
 import argparse
 from datetime import datetime
+from typing import Optional, Tuple
 from dotenv import load_dotenv
 import logging
 
@@ -18,6 +19,7 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from crawlers import CorticoCrawler, CrawlConfig
 from utils.supabase_client import SupabaseClient
 from utils.data_transformer import CorticoTransformer
+from utils.facility_id_cache import FacilityIdCache
 
 # Configure logging
 logging.basicConfig(
@@ -37,6 +39,7 @@ def create_config_from_env() -> CrawlConfig:
         max_concurrent=int(os.getenv('CRAWLER_MAX_CONCURRENT', '3')),
         delay_between_requests=float(os.getenv('CRAWLER_DELAY', '1.0')),
         max_retries=int(os.getenv('CRAWLER_MAX_RETRIES', '3')),
+        dead_letter_path=os.getenv('CRAWLER_DEAD_LETTER_FILE'),
     )
 
 def validate_environment():
@@ -53,71 +56,104 @@ def validate_environment():
     
     return True
 
-async def update_facility_availability(crawler: CorticoCrawler, cortico_record: dict):
-    """Update availability information for a single facility"""
-    try:
-        # Defensive: cortico_record should be a dict; sometimes the API returns a list
-        if not isinstance(cortico_record, dict):
-            logger.error(f"Unexpected cortico_record type: {type(cortico_record)}. Payload: {repr(cortico_record)[:500]}")
-            return False
-        # Get facility ID from database using slug or name
-        facility_data = CorticoTransformer.transform_facility(cortico_record)
-        facility_slug = facility_data.get('slug', '')
-        facility_name = facility_data.get('name', '')
-        facility_city = facility_data.get('city', '')
-        facility_province = facility_data.get('province', '')
-        
-        # Find existing facility in database
+async def resolve_facility_id(crawler: CorticoCrawler, projected: dict, cortico_record: dict,
+                              id_cache: FacilityIdCache) -> Tuple[Optional[str], bool]:
+    """Resolve a projected record to its facility id.
+
+    Returns (facility_id, created). Facilities missing from the database are created through
+    the crawler's full processing (which also writes their availability), reported as created=True.
+    """
+    facility_name = projected['name']
+    facility_slug = projected['slug']
+    external_id = projected['external_id']
+
+    # Resolve facility ID from the cache, then the facility mirror, then a database lookup by slug or name
+    facility_id = id_cache.get(external_id)
+    if facility_id:
+        return facility_id, False
+
+    mirror = crawler.db_client.mirror
+    existing_facility = mirror.find(facility_slug, facility_name, projected['city'], projected['province']) if mirror else None
+    if not existing_facility:
         existing_facility = await crawler.db_client.find_existing_facility(
-            facility_slug, facility_name, facility_city, facility_province
+            facility_slug, facility_name, projected['city'], projected['province']
         )
-        
-        if not existing_facility:
-            logger.info(f"Facility not found in database: {facility_name} ({facility_slug}). Creating full record via crawler.")
-            try:
-                # Use the crawler's full facility processing to create facility and related records (including availability)
-                await crawler.process_facility(cortico_record)
-                logger.info(f"Created facility from Cortico record: {facility_name} ({facility_slug})")
-                return True
-            except Exception as e:
-                logger.error(f"Failed to create facility from Cortico record {facility_name}: {e}")
-                return False
-        
-        facility_id = existing_facility['id']
-        
-        # Transform and update availability data
-        availability_records = CorticoTransformer.transform_availability(facility_id, cortico_record.get('availability', {}))
-        
-        if availability_records:
-            # Delete existing availability records for this facility
-            # .execute() returns a synchronous APIResponse object, so do not await it
-            crawler.db_client.client.table("facility_availability").delete().eq("facility_id", facility_id).execute()
+
+    if not existing_facility:
+        logger.info(f"Facility not found in database: {facility_name} ({facility_slug}). Creating full record via crawler.")
+        # Use the crawler's full facility processing to create facility and related records (including availability)
+        await crawler.process_facility(cortico_record)
+        logger.info(f"Created facility from Cortico record: {facility_name} ({facility_slug})")
+        return None, True
+
+    facility_id = existing_facility['id']
+    id_cache.put(external_id, facility_id)
+    return facility_id, False
+
+async def update_page_availability(crawler: CorticoCrawler, results: list, id_cache: FacilityIdCache,
+                                   max_concurrent: int, stats: dict):
+    """Update availability for a whole page with one bulk delete and one bulk insert"""
+    semaphore = asyncio.Semaphore(max_concurrent)
+    page_records = []
+    page_external_ids = {}
+    
+    async def resolve_with_semaphore(record):
+        facility_name = 'Unknown'
+        try:
+            projected = CorticoTransformer.project_availability(record)
+            if not projected:
+                logger.error(f"Unexpected cortico_record type: {type(record)}. Payload: {repr(record)[:500]}")
+                stats['errors'] += 1
+                return
+            facility_name = projected['name']
             
-            # Insert new availability records in bulk (availability_records is a list)
-            try:
-                resp = crawler.db_client.client.table("facility_availability").insert(availability_records).execute()
-                if getattr(resp, 'data', None):
-                    logger.info(f"Updated availability for facility: {facility_name}")
-                    return True
-                else:
-                    logger.error(f"Failed to insert availability for facility: {facility_name}")
-                    return False
-            except Exception as e:
-                logger.error(f"Exception inserting availability for facility {facility_name}: {e}")
-                return False
-        else:
-            logger.info(f"No availability data for facility: {facility_name}")
-            return True
+            async with semaphore:
+                facility_id, created = await resolve_facility_id(crawler, projected, record, id_cache)
             
-    except Exception as e:
-        logger.error(f"Error updating availability for facility {facility_name}: {e}")
-        return False
+            if created:
+                stats['facilities_updated'] += 1
+                return
+            
+            availability_records = CorticoTransformer.transform_availability(facility_id, projected['availability'])
+            if availability_records:
+                page_records.extend(availability_records)
+                page_external_ids[facility_id] = projected['external_id']
+            else:
+                # Nothing to write; the facility is up to date
+                stats['facilities_updated'] += 1
+        except Exception as e:
+            logger.error(f"Error resolving availability for facility {facility_name}: {e}")
+            stats['errors'] += 1
+        finally:
+            stats['facilities_processed'] += 1
+    
+    await asyncio.gather(*(resolve_with_semaphore(record) for record in results), return_exceptions=True)
+    
+    if not page_records:
+        return
+    
+    rejects = await crawler.db_client.replace_availability_bulk(page_records)
+    if rejects is None:
+        failed_ids = set(page_external_ids)
+    else:
+        failed_ids = {reject['row'].get('facility_id') for reject in rejects} & set(page_external_ids)
+    # Cached ids may point at facilities that no longer exist; look them up again next time
+    for facility_id in failed_ids:
+        id_cache.evict(page_external_ids[facility_id])
+    stats['errors'] += len(failed_ids)
+    stats['facilities_updated'] += len(page_external_ids) - len(failed_ids)
 
-async def fetch_and_update_availability(config: CrawlConfig):
+async def fetch_and_update_availability(config: CrawlConfig, id_cache_path: Optional[str] = None):
     """Fetch and update availability for all facilities"""
     logger.info("🚀 Starting NaviCare Availability Update")
     logger.info("=" * 50)
     
+    # External id -> facility id map persisted between daily runs
+    id_cache = FacilityIdCache(id_cache_path)
+    cached_ids = id_cache.load()
+    if id_cache_path:
+        logger.info(f"Loaded {cached_ids} cached facility ids from {id_cache_path}")
+    
     stats = {
         'facilities_processed': 0,
         'facilities_updated': 0,
@@ -143,35 +179,18 @@ async def fetch_and_update_availability(config: CrawlConfig):
             results = page_data.get('results', [])
             logger.info(f"Processing {len(results)} facilities from page {page_count}")
             
-            # Process facilities in smaller batches
-            for i in range(0, len(results), config.batch_size):
-                batch = results[i:i + config.batch_size]
-                
-                # Process batch concurrently but with limited concurrency
-                semaphore = asyncio.Semaphore(config.max_concurrent)
-                
-                async def process_with_semaphore(record):
-                    async with semaphore:
-                        success = await update_facility_availability(crawler, record)
-                        stats['facilities_processed'] += 1
-                        if success:
-                            stats['facilities_updated'] += 1
-                        else:
-                            stats['errors'] += 1
-                        return success
-                
-                tasks = [process_with_semaphore(record) for record in batch]
-                await asyncio.gather(*tasks, return_exceptions=True)
-                
-                # Progress logging
-                if stats['facilities_processed'] % 50 == 0:
-                    logger.info(f"Progress: {stats['facilities_processed']} processed, "
-                              f"{stats['facilities_updated']} updated, "
-                              f"{stats['errors']} errors")
-                
-                # Rate limiting between batches
-                if config.delay_between_requests > 0:
-                    await asyncio.sleep(config.delay_between_requests)
+            # Resolve facilities concurrently, then write the page's availability in bulk
+            await update_page_availability(crawler, results, id_cache, config.max_concurrent, stats)
+            
+            logger.info(f"Progress: {stats['facilities_processed']} processed, "
+                      f"{stats['facilities_updated']} updated, "
+                      f"{stats['errors']} errors")
+            
+            # Rate limiting between pages
+            if config.delay_between_requests > 0:
+                await asyncio.sleep(config.delay_between_requests)
+            
+            id_cache.save()
             
             # Move to next page
             links = page_data.get('links', {})
@@ -189,6 +208,8 @@ async def fetch_and_update_availability(config: CrawlConfig):
     logger.info(f"Facilities Updated: {stats['facilities_updated']}")
     logger.info(f"Facilities Not Found: {stats['facilities_not_found']}")
     logger.info(f"Errors: {stats['errors']}")
+    logger.info(f"Facility ID Cache Hits: {id_cache.hits}")
+    logger.info(f"Facility ID Cache Misses: {id_cache.misses}")
     logger.info("=" * 60)
     
     return stats
@@ -200,6 +221,8 @@ async def main():
                         help='Override batch size from environment')
     parser.add_argument('--delay', type=float,
                         help='Override delay between requests from environment')
+    parser.add_argument('--id-cache', default=os.getenv('AVAILABILITY_ID_CACHE', 'facility_id_cache.json'),
+                        help='File persisting the external id -> facility id map between runs')
     
     args = parser.parse_args()
     
@@ -226,7 +249,7 @@ async def main():
         logger.info(f"   Max Retries: {config.max_retries}")
         
         # Run availability update
-        stats = await fetch_and_update_availability(config)
+        stats = await fetch_and_update_availability(config, args.id_cache)
         
         if stats['errors'] > 0:
             logger.warning(f"Completed with {stats['errors']} errors")
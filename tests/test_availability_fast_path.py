@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Tests for the availability-only decode path and facility id cache
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from scripts.update_availability import update_page_availability
+from utils.data_transformer import CorticoTransformer
+from utils.facility_id_cache import FacilityIdCache
+
+
+def test_project_availability_keeps_identity_and_availability_only():
+    record = {
+        'id': 42,
+        'clinic_name': ' Maple Clinic ',
+        'clinic_city': 'Ottawa',
+        'clinic_province': 'ON',
+        'phone_number': '6135550100',
+        'workflows': [{'display_name': 'Walk-in'}],
+        'availability': {'next': '2030-01-01T09:00:00Z'},
+    }
+    projected = CorticoTransformer.project_availability(record)
+
+    assert projected == {
+        'external_id': '42',
+        'slug': 'maple-clinic',
+        'name': 'Maple Clinic',
+        'city': 'Ottawa',
+        'province': 'ON',
+        'availability': {'next': '2030-01-01T09:00:00Z'},
+    }
+    assert CorticoTransformer.project_availability(['not', 'a', 'record']) is None
+
+
+def test_facility_id_cache_persists(tmp_path):
+    path = str(tmp_path / "ids.json")
+    cache = FacilityIdCache(path)
+    cache.load()
+    assert cache.get('42') is None
+    cache.put('42', 'facility-uuid')
+    cache.save()
+
+    restored = FacilityIdCache(path)
+    assert restored.load() == 1
+    assert restored.get('42') == 'facility-uuid'
+    restored.evict('42')
+    assert restored.get('42') is None
+    assert (restored.hits, restored.misses) == (1, 1)
+
+
+def test_rejected_availability_evicts_the_cached_facility_id():
+    async def replace_availability_bulk(records):
+        return [{'table': 'facility_availability', 'row': record, 'error': 'gone', 'code': '23503'}
+                for record in records if record['facility_id'] == 'deleted-uuid']
+
+    crawler = SimpleNamespace(db_client=SimpleNamespace(mirror=None, replace_availability_bulk=replace_availability_bulk))
+    cache = FacilityIdCache(None)
+    cache.put('1', 'live-uuid')
+    cache.put('2', 'deleted-uuid')
+    results = [{'id': external_id, 'clinic_name': f'Clinic {external_id}',
+                'availability': {'next': '2030-01-01T09:00:00Z'}} for external_id in (1, 2)]
+    stats = {'facilities_processed': 0, 'facilities_updated': 0, 'errors': 0}
+
+    asyncio.run(update_page_availability(crawler, results, cache, 2, stats))
+    assert stats == {'facilities_processed': 2, 'facilities_updated': 1, 'errors': 1}
+    assert cache.get('1') == 'live-uuid'
+    assert cache.get('2') is None
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for adaptive database write concurrency, the circuit breaker and the page write buffer
+"""
+
+import asyncio
+
+import httpx
+
+from utils.db_health import DatabaseHealth, PageWriteBuffer, OPEN, CLOSED
+from utils.db_transport import DatabaseTransportStats, InstrumentedTransport
+
+
+def test_slow_responses_halve_the_limit_and_fast_ones_grow_it_back():
+    health = DatabaseHealth(max_limit=8, latency_target=0.5)
+
+    health.record(1.0, 200)
+    assert health.limit == 4
+    # One decrease per latency_target, so a burst of slow responses does not collapse the limit
+    health.record(1.0, 200)
+    assert health.limit == 4
+
+    for _ in range(4):
+        health.record(0.01, 201)
+    assert health.limit == 5
+    assert health.scaled(25) == 15
+    assert health.counters['slow_responses'] == 2
+
+
+def test_transport_errors_open_the_breaker_and_a_probe_closes_it():
+    probes = []
+
+    async def probe():
+        probes.append(True)
+        return len(probes) > 1
+
+    health = DatabaseHealth(max_limit=4, failure_threshold=3, cooldown=0.01, probe=probe)
+    transport = InstrumentedTransport(
+        httpx.MockTransport(lambda request: httpx.Response(503)), DatabaseTransportStats(), health
+    )
+    with httpx.Client(transport=transport, base_url='http://db') as client:
+        for _ in range(3):
+            client.get('/rest/v1/facilities')
+
+    assert health.state == OPEN and health.limit == 1
+
+    # The first probe fails and reopens the breaker with a doubled cooldown; the second recovers
+    asyncio.run(health.wait_until_writable())
+    assert health.state == CLOSED and len(probes) == 2
+    assert health.counters['breaker_opens'] == 2
+    assert health.limit == 1
+
+
+def test_slots_follow_the_current_limit():
+    health = DatabaseHealth(max_limit=2)
+    active, peak = [0], [0]
+
+    async def write():
+        async with health.slot():
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            await asyncio.sleep(0.01)
+            active[0] -= 1
+
+    async def run():
+        await asyncio.gather(*(write() for _ in range(6)))
+
+    asyncio.run(run())
+    assert peak[0] == 2 and health.in_flight == 0
+
+
+def test_page_buffer_lets_fetching_run_ahead_of_paused_writes():
+    async def run():
+        written = []
+        resume = asyncio.Event()
+
+        async def write(page_number):
+            await resume.wait()
+            written.append(page_number)
+
+        buffer = PageWriteBuffer(write, size=2)
+        # The writer holds page 1 while pages 2 and 3 fill the buffer
+        for page_number in (1, 2, 3):
+            await asyncio.wait_for(buffer.put(page_number), timeout=1)
+        put_4 = asyncio.create_task(buffer.put(4))
+        await asyncio.sleep(0.01)
+        assert not put_4.done()
+
+        resume.set()
+        await put_4
+        await buffer.close()
+        return written
+
+    assert asyncio.run(run()) == [1, 2, 3, 4]
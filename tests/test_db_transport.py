@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled PostgREST transport accounting
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils.db_transport import DatabaseTransportProfile, DatabaseTransportStats, create_http_client
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'[]'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_pooled_client_reuses_connections_and_reports_pool_wait():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        stats = DatabaseTransportStats()
+        client = create_http_client(DatabaseTransportProfile(max_connections=2, http2=False), stats)
+        for _ in range(3):
+            assert client.get(f'http://127.0.0.1:{server.server_port}/rest/v1/facilities').status_code == 200
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    summary = stats.summary()
+    assert summary['requests'] == 3
+    assert summary['connections_opened'] == 1
+    assert summary['requests_per_connection'] == 3.0
+    assert summary['pool_wait_seconds'] >= 0.0
+
+
+def test_profile_pool_size_follows_concurrency(monkeypatch):
+    monkeypatch.delenv('SUPABASE_HTTP_POOL_SIZE', raising=False)
+    assert DatabaseTransportProfile.from_env(4).max_connections == 4
+    monkeypatch.setenv('SUPABASE_HTTP_POOL_SIZE', '8')
+    monkeypatch.setenv('SUPABASE_HTTP2', 'false')
+    profile = DatabaseTransportProfile.from_env(4)
+    assert (profile.max_connections, profile.http2) == (8, False)
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the dead-letter quarantine file
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import scripts.replay_failures as replay
+from utils.dead_letter import DeadLetterQueue, dead_letter_key
+
+
+def test_record_and_page_failures_round_trip(tmp_path):
+    queue = DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"))
+    queue.record_failure('clinic', {'id': 12, 'clinic_name': 'Bad Clinic'}, KeyError('point'))
+    queue.page_failure('lab', 'http://example/api/?format=json&page=4', 4)
+
+    entries = queue.load()
+    assert queue.count == 2
+    assert entries[0]['kind'] == 'record'
+    assert entries[0]['error_class'] == 'KeyError'
+    assert entries[0]['record']['clinic_name'] == 'Bad Clinic'
+    assert entries[1]['kind'] == 'page'
+    assert entries[1]['page_number'] == 4
+    assert dead_letter_key(entries[0]) == 'clinic:record:12'
+
+
+def test_replace_rewrites_file(tmp_path):
+    queue = DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"))
+    queue.record_failure('clinic', {'id': 1}, ValueError('x'))
+    queue.record_failure('clinic', {'id': 2}, ValueError('y'))
+
+    remaining = [e for e in queue.load() if e['record']['id'] == 2]
+    queue.replace(remaining)
+    assert [e['record']['id'] for e in queue.load()] == [2]
+
+
+def test_page_dead_letters_without_a_url_are_kept_not_replayed(tmp_path, monkeypatch):
+    queue = DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"))
+    queue.page_failure('clinic', None)
+    queue.record_failure('clinic', {'id': 1}, ValueError('x'))
+    replayed = []
+
+    async def replay_source(source, entries, retry_path, concurrency, ingest_mode='rows'):
+        replayed.extend(entries)
+        return {'records': len(entries), 'pages': 0}
+
+    monkeypatch.setattr(replay, 'replay_source', replay_source)
+    result = asyncio.run(replay.replay_failures(queue.path, ['clinic'], 1, 'bundle'))
+
+    assert [entry['kind'] for entry in replayed] == ['record']
+    assert result == {'replayed': 1, 'still_failing': 0}
+    assert [entry['kind'] for entry in queue.load()] == ['page']
+
+
+def test_entries_whose_replay_raises_stay_quarantined(tmp_path, monkeypatch):
+    class FakeConfig(SimpleNamespace):
+        base_url = 'http://example/api/'
+
+    class FakeCrawler:
+        def __init__(self, config):
+            self.dead_letters = DeadLetterQueue(config.dead_letter_path)
+
+        async def __aenter__(self):
+            return self
+
+        async def __aexit__(self, *exc):
+            return False
+
+        async def process_facility(self, record):
+            raise RuntimeError('database unavailable')
+
+    monkeypatch.setitem(replay.SOURCES, 'clinic', (FakeCrawler, FakeConfig, 'UNSET_URL', 'process_facility'))
+    queue = DeadLetterQueue(str(tmp_path / "dead_letters.jsonl"))
+    queue.record_failure('clinic', {'id': 1}, ValueError('x'))
+
+    result = asyncio.run(replay.replay_failures(queue.path, ['clinic'], 1))
+    assert result == {'replayed': 1, 'still_failing': 1}
+    entries = queue.load()
+    assert [(entry['record'], entry['error_class'], entry['attempts']) for entry in entries] == \
+        [({'id': 1}, 'RuntimeError', 2)]
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for the crawler query plan checker.
+
+The index checks run against a local Postgres when NAVICARE_TEST_DATABASE_URL is set (see
+tests/test_bundle_ingest.py); they work in a scratch schema with migrations 001 and 003 applied.
+"""
+
+import os
+import uuid
+import asyncio
+
+import pytest
+
+from scripts.explain_crawler_queries import explain_queries, plan_scans
+from tests.test_bundle_ingest import MIGRATIONS, SCHEMA
+
+
+def test_plan_scans_attributes_bitmap_scans_to_their_index():
+    plan = {
+        'Node Type': 'ModifyTable', 'Relation Name': 'facility_availability',
+        'Plans': [{
+            'Node Type': 'Bitmap Heap Scan', 'Relation Name': 'facility_availability',
+            'Plans': [{'Node Type': 'Bitmap Index Scan', 'Index Name': 'facility_availability_facility_available_at_key'}],
+        }],
+    }
+
+    assert plan_scans(plan) == [{
+        'node': 'Bitmap Heap Scan', 'relation': 'facility_availability',
+        'index': 'facility_availability_facility_available_at_key',
+    }]
+    assert plan_scans({'Node Type': 'Seq Scan', 'Relation Name': 'facilities'})[0]['index'] is None
+
+
+@pytest.mark.skipif(not os.getenv('NAVICARE_TEST_DATABASE_URL'), reason='NAVICARE_TEST_DATABASE_URL not set')
+def test_crawler_queries_use_indexes_after_migrations():
+    asyncpg = pytest.importorskip('asyncpg')
+
+    async def run():
+        conn = await asyncpg.connect(os.environ['NAVICARE_TEST_DATABASE_URL'])
+        schema = f"navicare_test_{uuid.uuid4().hex[:8]}"
+        try:
+            await conn.execute(f'CREATE SCHEMA {schema}; SET search_path TO {schema}')
+            await conn.execute(SCHEMA)
+            for migration in ('001_child_table_natural_keys.sql', '003_crawler_access_paths.sql'):
+                await conn.execute((MIGRATIONS / migration).read_text())
+
+            results = await explain_queries(conn, seed=5000)
+
+            assert [result['query'] for result in results if not result.get('uses_index')] == []
+            # Seed rows were rolled back
+            assert await conn.fetchval('SELECT count(*) FROM facilities') == 0
+        finally:
+            await conn.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+            await conn.close()
+
+    asyncio.run(run())
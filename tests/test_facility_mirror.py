@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the local SQLite facility mirror
+"""
+
+import asyncio
+from urllib.parse import unquote
+
+import httpx
+
+from utils.supabase_client import SupabaseClient
+
+ROWS = [
+    {'id': 'f1', 'slug': 'maple-clinic', 'name': 'Maple Clinic', 'city': 'Ottawa', 'province': 'ON',
+     'updated_at': '2024-05-01T12:00:00+00:00'},
+    {'id': 'f2', 'slug': 'oak-pharmacy', 'name': 'Oak Pharmacy', 'city': 'Toronto', 'province': 'ON',
+     'updated_at': '2024-05-01T12:00:00+00:00'},
+]
+
+
+def make_client(monkeypatch, tmp_path):
+    monkeypatch.setenv('SUPABASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('SUPABASE_KEY', 'test-key')
+    monkeypatch.setenv('FACILITY_MIRROR_PATH', str(tmp_path / 'mirror.sqlite3'))
+    monkeypatch.setenv('SUPABASE_WRITE_COALESCE_MS', '0')
+    client = SupabaseClient()
+    requests = []
+
+    def handler(request):
+        query = unquote(str(request.url.query, 'utf-8'))
+        requests.append((request.method, query))
+        if request.method == 'GET' and 'updated_at=not.is.null' in query:
+            # Keyset paging: the second sync starts after the last row it saw
+            return httpx.Response(200, json=[] if 'or=' in query else ROWS)
+        if request.method == 'GET' and 'slug=eq.maple-clinic' in query:
+            return httpx.Response(200, json=[{**ROWS[0], 'phone': '6135550100'}])
+        if request.method == 'GET':
+            return httpx.Response(200, json=[])
+        return httpx.Response(200, json=[], headers={'content-range': '*/1'})
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    return client, requests
+
+
+def test_sync_follows_the_updated_at_watermark(monkeypatch, tmp_path):
+    client, requests = make_client(monkeypatch, tmp_path)
+
+    assert asyncio.run(client.sync_mirror()) == 2
+    assert client.mirror.find('oak-pharmacy', None, None, None)['id'] == 'f2'
+    assert client.mirror.find(None, 'Maple Clinic', 'Ottawa', 'ON')['id'] == 'f1'
+
+    requests.clear()
+    assert asyncio.run(client.sync_mirror()) == 0
+    keyset = [query for _, query in requests if 'or=' in query]
+    assert keyset and 'updated_at.gt."2024-05-01T12:00:00+00:00"' in keyset[0] and 'id.gt.f2' in keyset[0]
+
+
+def test_unchanged_facilities_are_not_looked_up_or_written(monkeypatch, tmp_path):
+    client, requests = make_client(monkeypatch, tmp_path)
+    asyncio.run(client.sync_mirror())
+    facility = {'slug': 'maple-clinic', 'name': 'Maple Clinic', 'city': 'Ottawa', 'province': 'ON',
+                'phone': '6135550100'}
+
+    # First write from this source: looked up in the database, then its digest is recorded
+    requests.clear()
+    assert asyncio.run(client.save_facility(facility, 'clinic')) == ('f1', True)
+    assert requests
+
+    requests.clear()
+    assert asyncio.run(client.save_facility(dict(facility), 'clinic')) == ('f1', True)
+    assert requests == []
+
+    # A changed record or a different source is looked up and diffed again
+    asyncio.run(client.save_facility({**facility, 'phone': '6135550199'}, 'clinic'))
+    assert [method for method, _ in requests] == ['GET', 'PATCH']
+    requests.clear()
+    asyncio.run(client.save_facility(facility, 'lab'))
+    assert [method for method, _ in requests] == ['GET']
+    assert client.mirror.summary()['unchanged_skipped'] == 1
+
+
+def test_facilities_deleted_from_the_database_are_forgotten(monkeypatch, tmp_path):
+    client, requests = make_client(monkeypatch, tmp_path)
+    asyncio.run(client.sync_mirror())
+    facility = {'slug': 'maple-clinic', 'name': 'Maple Clinic', 'city': 'Ottawa', 'province': 'ON'}
+    asyncio.run(client.save_facility(facility, 'clinic'))
+
+    def handler(request):
+        return httpx.Response(409, json={'code': '23503', 'message': 'violates foreign key constraint',
+                                         'hint': None, 'details': None})
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    written, rejects = asyncio.run(client.bulk_write('facility_hours', [{'facility_id': 'f1', 'weekday': 1}]))
+
+    assert written == 0 and rejects[0]['code'] == '23503'
+    # The next write resolves the facility in the database instead of reusing the stale id
+    assert client.mirror.find('maple-clinic', None, None, None) is None
+    assert client.mirror.find('oak-pharmacy', None, None, None)['id'] == 'f2'
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tests for facility sightings and the retirement sweep.
+
+The retire_unseen_facilities checks run against a local Postgres when NAVICARE_TEST_DATABASE_URL
+is set (see tests/test_bundle_ingest.py), in a scratch schema with migration 004 applied.
+"""
+
+import os
+import uuid
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils.facility_sightings import SightingRecorder, sweep_after_crawl
+from tests.test_bundle_ingest import MIGRATIONS, SCHEMA
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.writes = []
+        self.sweeps = []
+
+    async def bulk_write(self, table, rows, on_conflict=None):
+        self.writes.append((table, on_conflict, sorted(row['facility_id'] for row in rows)))
+        return len(rows), []
+
+    async def retire_unseen_facilities(self, source, since, max_fraction, purge, dry_run):
+        self.sweeps.append((source, since, max_fraction, purge))
+        return {'active': 100, 'unseen': 2, 'retired': 2, 'purged': 0, 'refused': False}
+
+
+def make_crawler(complete=True, errors=0):
+    db_client = FakeDatabase()
+    sightings = SightingRecorder(db_client, 'lab')
+    return SimpleNamespace(db_client=db_client, sightings=sightings, crawl_complete=complete,
+                           stats={'errors': errors}, spool=None)
+
+
+def test_sightings_are_written_once_per_flush():
+    crawler = make_crawler()
+    for facility_id in ('f2', 'f1', 'f2', None):
+        crawler.sightings.saw(facility_id)
+
+    assert asyncio.run(crawler.sightings.flush())
+    assert asyncio.run(crawler.sightings.flush())
+    assert crawler.db_client.writes == [('facility_sightings', 'source,facility_id', ['f1', 'f2'])]
+
+
+def test_sweep_runs_only_after_a_complete_clean_crawl():
+    for crawler in (make_crawler(complete=False), make_crawler(errors=3)):
+        assert asyncio.run(sweep_after_crawl(crawler)) is None
+        assert crawler.db_client.sweeps == []
+
+    crawler = make_crawler()
+    crawler.sightings.saw('f1')
+    result = asyncio.run(sweep_after_crawl(crawler, max_fraction=0.1, purge=True))
+
+    assert result['retired'] == 2
+    assert crawler.db_client.sweeps == [('lab', crawler.sightings.started_at, 0.1, True)]
+    # Pending sightings are written before the sweep reads them
+    assert crawler.db_client.writes
+
+
+@pytest.mark.skipif(not os.getenv('NAVICARE_TEST_DATABASE_URL'), reason='NAVICARE_TEST_DATABASE_URL not set')
+def test_retire_unseen_facilities_against_postgres():
+    asyncpg = pytest.importorskip('asyncpg')
+
+    async def run():
+        conn = await asyncpg.connect(os.environ['NAVICARE_TEST_DATABASE_URL'])
+        schema = f"navicare_test_{uuid.uuid4().hex[:8]}"
+        try:
+            await conn.execute(f'CREATE SCHEMA {schema}; SET search_path TO {schema}')
+            await conn.execute(SCHEMA)
+            await conn.execute((MIGRATIONS / '004_facility_sightings.sql').read_text())
+            ids = [row['id'] for row in await conn.fetch(
+                "INSERT INTO facilities (name, slug, status) SELECT 'Lab ' || g, 'lab-' || g, 'active' "
+                "FROM generate_series(1, 10) g RETURNING id"
+            )]
+            # Nine seen by this crawl, one last seen by an earlier one
+            await conn.execute(
+                "INSERT INTO facility_sightings (source, facility_id, seen_at) "
+                "SELECT 'lab', id, CASE WHEN id = $1 THEN now() - interval '2 days' ELSE now() END "
+                "FROM facilities", ids[0]
+            )
+            await conn.execute("INSERT INTO facility_hours (facility_id, weekday) VALUES ($1, 1)", ids[0])
+            since = await conn.fetchval("SELECT now() - interval '1 day'")
+
+            refused = await conn.fetchval("SELECT retire_unseen_facilities('lab', $1, 0.05)", since)
+            assert '"refused": true' in refused
+
+            retired = await conn.fetchval("SELECT retire_unseen_facilities('lab', $1, 0.1, true)", since)
+            assert '"retired": 1' in retired and '"purged": 1' in retired
+            assert await conn.fetchval("SELECT status FROM facilities WHERE id = $1", ids[0]) == 'inactive'
+            assert await conn.fetchval("SELECT count(*) FROM facilities WHERE status = 'active'") == 9
+        finally:
+            await conn.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+            await conn.close()
+
+    asyncio.run(run())
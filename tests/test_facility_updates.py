@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Tests for column-level diff writes of facility updates
+"""
+
+import json
+import asyncio
+
+import httpx
+
+from utils.supabase_client import SupabaseClient, changed_facility_columns
+
+STORED = {
+    'id': 'f1', 'name': 'Maple Clinic', 'slug': 'maple-clinic', 'phone': '6135550100',
+    'longitude': -75.7, 'latitude': 45, 'accepts_new_patients': False, 'website': None,
+    'rating_updated_at': '2024-05-01T12:00:00+00:00', 'updated_at': '2024-05-01T12:00:00+00:00',
+}
+
+
+def test_changed_facility_columns_normalizes_stored_values():
+    facility_data = {
+        'name': 'Maple Clinic', 'slug': 'maple-clinic', 'phone': '6135550199',
+        'longitude': -75.7, 'latitude': 45.0, 'accepts_new_patients': 0, 'website': None,
+        'rating_updated_at': '2024-05-01T12:00:00Z', 'email': None,
+    }
+
+    changes = changed_facility_columns(facility_data, STORED)
+
+    # False vs 0 is a real change for a boolean column; email is not in the snapshot
+    assert changes == {'phone': '6135550199', 'accepts_new_patients': 0, 'email': None}
+
+
+def test_upsert_facility_sends_only_changed_columns(monkeypatch):
+    monkeypatch.setenv('SUPABASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('SUPABASE_KEY', 'test-key')
+    client = SupabaseClient()
+    requests = []
+
+    def handler(request):
+        requests.append((request.method, request.content))
+        return httpx.Response(200, json=[])
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    unchanged = {'name': 'Maple Clinic', 'slug': 'maple-clinic', 'phone': '6135550100'}
+
+    assert asyncio.run(client.upsert_facility(unchanged, STORED)) == 'f1'
+    assert requests == []
+
+    asyncio.run(client.upsert_facility({**unchanged, 'phone': '6135550199'}, STORED))
+    [(method, body)] = requests
+    assert method == 'PATCH'
+    assert set(json.loads(body)) == {'phone', 'updated_at'}
+    assert client.facility_update_stats == {'updated': 1, 'unchanged': 1, 'columns_written': 1}
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for the tuned HTTP transport profile
+"""
+
+import asyncio
+import gzip
+import json
+
+from aiohttp import web
+
+from utils.http_transport import TransportProfile, TransportStats, create_session, read_json, decode_body
+
+PAYLOAD = {'results': [{'clinic_name': f'Clinic {i}', 'clinic_city': 'Toronto'} for i in range(200)]}
+
+
+async def _serve_and_fetch(requests: int):
+    raw = json.dumps(PAYLOAD).encode('utf-8')
+
+    async def handler(request):
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            return web.Response(body=gzip.compress(raw), headers={'Content-Encoding': 'gzip',
+                                                                  'Content-Type': 'application/json'})
+        return web.Response(body=raw, content_type='application/json')
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    stats = TransportStats()
+    session = create_session(TransportProfile(limit=2), stats)
+    try:
+        results = []
+        for _ in range(requests):
+            async with session.get(f'http://127.0.0.1:{port}/') as response:
+                results.append(await read_json(response, stats))
+    finally:
+        await session.close()
+        await runner.cleanup()
+    return results, stats, len(raw)
+
+
+def test_connection_reuse_and_byte_accounting():
+    results, stats, raw_size = asyncio.run(_serve_and_fetch(5))
+    summary = stats.summary()
+
+    assert all(result == PAYLOAD for result in results)
+    assert summary['requests'] == 5
+    assert summary['connections_opened'] == 1
+    assert summary['connections_reused'] == 4
+    assert summary['tls_handshakes'] == 0
+    assert summary['bytes_decoded'] == 5 * raw_size
+    assert summary['bytes_on_wire'] < summary['bytes_decoded']
+    assert summary['encodings'] == {'gzip': 5}
+
+
+def test_decode_body_identity_and_gzip():
+    assert decode_body(b'{}', None) == b'{}'
+    assert decode_body(gzip.compress(b'{"a": 1}'), 'gzip') == b'{"a": 1}'
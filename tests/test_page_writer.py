@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Tests for the page-level child-table writer
+"""
+
+import json
+import asyncio
+from urllib.parse import unquote
+
+import httpx
+
+from utils.supabase_client import SupabaseClient
+from utils.page_writer import PageChildWriter
+
+
+def make_client(monkeypatch, existing_rows):
+    monkeypatch.setenv('SUPABASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('SUPABASE_KEY', 'test-key')
+    client = SupabaseClient()
+    requests = []
+
+    def handler(request):
+        table = request.url.path.rsplit('/', 1)[-1]
+        requests.append((request.method, table, unquote(str(request.url.query, 'utf-8')), request.content))
+        if request.method == 'GET' and table == 'services':
+            return httpx.Response(200, json=[{'id': 'svc-walk-in', 'slug': 'Walk-in'}])
+        if request.method == 'GET':
+            return httpx.Response(200, json=existing_rows.get(table, []))
+        return httpx.Response(201 if request.method == 'POST' else 200, json=[])
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    return client, requests
+
+
+def test_page_writer_costs_one_upsert_and_one_delete_per_table(monkeypatch):
+    existing = {
+        'facility_booking_channels': [
+            {'id': 'ch-1', 'facility_id': 'f1', 'url': 'https://book/f1', 'phone': None, 'email': None},
+            {'id': 'ch-2', 'facility_id': 'f1', 'url': None, 'phone': '6135550000', 'email': None},
+        ],
+        'facility_hours': [
+            {'facility_id': 'f2', 'weekday': 0, 'slot': 1},
+            {'facility_id': 'f2', 'weekday': 6, 'slot': 1},
+        ],
+    }
+    client, requests = make_client(monkeypatch, existing)
+    writer = PageChildWriter(client)
+    hours = [{'weekday': 0, 'open_time': '09:00', 'close_time': '17:00'}]
+    for facility_id in ('f1', 'f2', 'f3'):
+        writer.add_facility(
+            facility_id,
+            [{'facility_id': facility_id, 'channel_type': 'web', 'url': f'https://book/{facility_id}'}],
+            service_offerings=[{'facility_id': facility_id, 'service_slug': 'Walk-in',
+                                'display_name': 'Walk-in', 'workflow_type': 'clinic'}],
+            hours=hours,
+        )
+
+    written = asyncio.run(writer.flush())
+
+    assert written == {'booking_channels': 3, 'service_offerings': 3, 'facility_hours': 3}
+    writes = [(method, table) for method, table, _, _ in requests if method != 'GET']
+    assert writes == [
+        ('POST', 'facility_booking_channels'),
+        ('DELETE', 'facility_booking_channels'),
+        ('POST', 'facility_service_offerings'),
+        ('POST', 'facility_hours'),
+        ('DELETE', 'facility_hours'),
+    ]
+
+    by_call = {(method, table): (query, body) for method, table, query, body in requests}
+    assert 'on_conflict=facility_id,url' in by_call[('POST', 'facility_booking_channels')][0]
+    assert 'id.eq.ch-2' in by_call[('DELETE', 'facility_booking_channels')][0]
+    assert 'ch-1' not in by_call[('DELETE', 'facility_booking_channels')][0]
+    assert 'and(facility_id.eq.f2,weekday.eq.6,slot.eq.1)' in by_call[('DELETE', 'facility_hours')][0]
+    offerings = json.loads(by_call[('POST', 'facility_service_offerings')][1])
+    assert {row['service_id'] for row in offerings} == {'svc-walk-in'}
+    assert 'service_slug' not in offerings[0]
+
+
+def test_existing_rows_are_read_in_pages_past_the_row_cap(monkeypatch):
+    client, requests = make_client(monkeypatch, {})
+    stored = [{'facility_id': 'f1', 'weekday': day, 'slot': 1} for day in range(5)]
+
+    def handler(request):
+        query = dict(request.url.params)
+        requests.append((request.method, unquote(str(request.url.query, 'utf-8'))))
+        if request.method == 'GET':
+            offset, limit = int(query['offset']), int(query['limit'])
+            return httpx.Response(200, json=stored[offset:offset + limit])
+        return httpx.Response(201 if request.method == 'POST' else 200, json=[])
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    rows = [{'facility_id': 'f1', 'weekday': 0, 'slot': 1}]
+
+    asyncio.run(client.sync_child_rows_bulk('facility_hours', ['f1'], rows, [('facility_id', 'weekday', 'slot')],
+                                            ('facility_id', 'weekday', 'slot'), page_size=2))
+
+    assert [method for method, _ in requests] == ['GET', 'GET', 'GET', 'POST', 'DELETE']
+    delete_query = requests[-1][1]
+    # The rows on the last page are found and deleted too
+    assert all(f'weekday.eq.{day}' in delete_query for day in range(1, 5))
+    assert 'weekday.eq.0' not in delete_query
+
+
+def test_bulk_write_bisects_to_isolate_rejected_rows(monkeypatch):
+    client, requests = make_client(monkeypatch, {})
+
+    def handler(request):
+        rows = json.loads(request.content)
+        requests.append(len(rows))
+        if any(row['weekday'] == 9 for row in rows):
+            return httpx.Response(400, json={'code': '23514', 'message': 'weekday check violated', 'hint': None, 'details': None})
+        return httpx.Response(201, json=[])
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    rows = [{'facility_id': f'f{i}', 'weekday': 9 if i == 5 else 1} for i in range(8)]
+
+    written, rejects = asyncio.run(client.bulk_write('facility_hours', rows))
+
+    assert written == 7
+    assert [reject['row']['facility_id'] for reject in rejects] == ['f5']
+    assert rejects[0]['code'] == '23514'
+    # Only halves containing the bad row are split again
+    assert requests == [8, 4, 4, 2, 1, 1, 2]
+
+
+def test_page_writer_collects_rejects_by_facility(monkeypatch):
+    client, requests = make_client(monkeypatch, {})
+
+    def handler(request):
+        if request.method == 'POST' and any(row.get('url') == 'bad' for row in json.loads(request.content)):
+            return httpx.Response(400, json={'code': '22001', 'message': 'value too long', 'hint': None, 'details': None})
+        return httpx.Response(200 if request.method == 'GET' else 201, json=[])
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    writer = PageChildWriter(client)
+    writer.add_facility('f1', [{'facility_id': 'f1', 'url': 'https://book/f1'}], record={'id': 1})
+    writer.add_facility('f2', [{'facility_id': 'f2', 'url': 'bad'}], record={'id': 2})
+
+    assert asyncio.run(writer.flush()) == {'booking_channels': 1}
+    assert list(writer.rejects_by_facility()) == ['f2']
+    assert writer.records['f2'] == {'id': 2}
+
+
+def test_writes_ask_for_minimal_returns(monkeypatch):
+    monkeypatch.setenv('SUPABASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('SUPABASE_KEY', 'test-key')
+    client = SupabaseClient()
+    prefers = []
+
+    def handler(request):
+        prefers.append((request.method, request.headers.get('prefer', ''), unquote(str(request.url.query, 'utf-8'))))
+        if request.method == 'POST' and 'select=id' in request.url.query.decode():
+            return httpx.Response(201, json=[{'id': 'svc-1'}])
+        return httpx.Response(201 if request.method == 'POST' else 200, json=[],
+                              headers={'content-range': '*/2'})
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    hours = [{'weekday': 0, 'open_time': '09:00', 'close_time': '17:00'}]
+
+    assert asyncio.run(client.replace_facility_hours('f1', hours))
+    assert asyncio.run(client.insert_row('services', {'slug': 'walk-in'}, columns='id')) == {'id': 'svc-1'}
+
+    (delete_method, delete_prefer, _), (post_method, post_prefer, _), (_, service_prefer, service_query) = prefers
+    assert delete_method == 'DELETE' and 'return=minimal' in delete_prefer
+    assert post_method == 'POST' and 'return=minimal' in post_prefer and 'count=exact' in post_prefer
+    # Inserts that need the new key ask for just that column
+    assert 'return=representation' in service_prefer and 'select=id' in service_query
+
+
+def test_availability_and_specialty_links_skip_existing_rows(monkeypatch):
+    client, _ = make_client(monkeypatch, {})
+    posts = []
+
+    def handler(request):
+        table = request.url.path.rsplit('/', 1)[-1]
+        if request.method == 'GET':
+            return httpx.Response(200, json=[{'id': 'spec-1', 'name': 'Family Medicine'}])
+        if request.method == 'POST':
+            posts.append((table, request.url.params.get('on_conflict'), request.headers.get('prefer')))
+        return httpx.Response(201 if request.method == 'POST' else 204, json=[])
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    asyncio.run(client.insert_availability([{'facility_id': 'f1', 'available_at': '2030-01-01T09:00:00Z'}]))
+    asyncio.run(client.link_facility_specialties('f1', ['Family Medicine', 'Family Medicine']))
+
+    assert [post[:2] for post in posts] == [
+        ('facility_availability', 'facility_id,available_at'),
+        ('facility_specialties', 'facility_id,specialty_id'),
+        ('facility_specialties', 'facility_id,specialty_id'),
+    ]
+    assert all('resolution=ignore-duplicates' in post[2] for post in posts)
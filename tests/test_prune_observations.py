@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Tests for facility_observations retention.
+
+The rollup function runs against a local Postgres when NAVICARE_TEST_DATABASE_URL is set
+(see tests/test_bundle_ingest.py), in a scratch schema with migration 007 applied.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+from scripts.prune_observations import prune_observations
+from tests.test_bundle_ingest import MIGRATIONS
+
+
+class FakeDatabase:
+    def __init__(self, old_rows, fail_after=None):
+        self.old_rows = old_rows
+        self.fail_after = fail_after
+        self.calls = []
+
+    async def roll_up_observations(self, before, period, batch_size):
+        if self.fail_after is not None and len(self.calls) >= self.fail_after:
+            return None
+        self.calls.append((period, batch_size))
+        deleted = min(batch_size, self.old_rows)
+        self.old_rows -= deleted
+        return {'rolled_up': 1 if deleted else 0, 'deleted': deleted, 'remaining': self.old_rows > 0}
+
+
+BEFORE = datetime(2026, 7, 1, tzinfo=timezone.utc)
+
+
+def test_batches_run_until_no_old_observations_remain():
+    db_client = FakeDatabase(25)
+    result = asyncio.run(prune_observations(db_client, BEFORE, 'week', batch_size=10))
+
+    assert result == {'batches': 3, 'rolled_up': 3, 'deleted': 25, 'remaining': False}
+    assert db_client.calls == [('week', 10)] * 3
+
+
+def test_max_batches_and_failures_stop_early():
+    result = asyncio.run(prune_observations(FakeDatabase(25), BEFORE, batch_size=10, max_batches=1))
+    assert result['deleted'] == 10 and result['remaining']
+
+    assert asyncio.run(prune_observations(FakeDatabase(25, fail_after=0), BEFORE)) is None
+    partial = asyncio.run(prune_observations(FakeDatabase(25, fail_after=1), BEFORE, batch_size=10))
+    assert partial['deleted'] == 10 and partial['remaining']
+
+
+@pytest.mark.skipif(not os.getenv('NAVICARE_TEST_DATABASE_URL'), reason='NAVICARE_TEST_DATABASE_URL not set')
+def test_roll_up_facility_observations_against_postgres():
+    asyncpg = pytest.importorskip('asyncpg')
+
+    async def run():
+        conn = await asyncpg.connect(os.environ['NAVICARE_TEST_DATABASE_URL'])
+        schema = f"navicare_test_{uuid.uuid4().hex[:8]}"
+        try:
+            await conn.execute(f'CREATE SCHEMA {schema}; SET search_path TO {schema}; SET timezone TO UTC')
+            await conn.execute(
+                "CREATE TABLE facility_observations (id bigserial PRIMARY KEY, facility_id uuid, observed_at timestamptz)"
+            )
+            await conn.execute((MIGRATIONS / '007_observation_retention.sql').read_text())
+            facility = uuid.uuid4()
+            await conn.execute(
+                "INSERT INTO facility_observations (facility_id, observed_at) VALUES "
+                "($1, '2026-01-05 08:00Z'), ($1, '2026-01-05 09:00Z'), ($1, '2026-01-06 08:00Z'), "
+                "($1, now())", facility
+            )
+
+            first = json.loads(await conn.fetchval(
+                "SELECT roll_up_facility_observations('2026-06-01', 'day', 2)"))
+            assert first == {'rolled_up': 1, 'deleted': 2, 'remaining': True}
+            second = json.loads(await conn.fetchval(
+                "SELECT roll_up_facility_observations('2026-06-01', 'day', 2)"))
+            assert second == {'rolled_up': 1, 'deleted': 1, 'remaining': False}
+
+            rollups = await conn.fetch(
+                "SELECT period_start::text, observations FROM facility_observation_rollups ORDER BY period_start")
+            assert [tuple(row) for row in rollups] == [('2026-01-05', 2), ('2026-01-06', 1)]
+            # Recent observations are kept
+            assert await conn.fetchval("SELECT count(*) FROM facility_observations") == 1
+            storage = json.loads(await conn.fetchval("SELECT facility_observation_storage()"))
+            assert set(storage) == {'observations', 'rollups'}
+        finally:
+            await conn.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+            await conn.close()
+
+    asyncio.run(run())
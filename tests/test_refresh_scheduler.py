@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for the staleness-priority refresh scheduler
+"""
+
+import json
+import asyncio
+from types import SimpleNamespace
+
+from scripts.refresh_daemon import RefreshDaemon
+from utils.refresh_scheduler import RefreshScheduler, RefreshProfile, record_key, record_digest
+
+PROFILES = {
+    'clinic': RefreshProfile(base_interval=100, min_interval=25, max_interval=400),
+    'pharmacy': RefreshProfile(base_interval=1000, min_interval=500, max_interval=4000),
+}
+
+
+def test_most_overdue_page_first():
+    scheduler = RefreshScheduler(PROFILES)
+    scheduler.add('pharmacy', 1, due_at=50)
+    scheduler.add('clinic', 1, due_at=10)
+    scheduler.add('clinic', 2, due_at=200)
+
+    assert scheduler.pop_due(now=100).source == 'clinic'
+    assert scheduler.pop_due(now=100).source == 'pharmacy'
+    assert scheduler.pop_due(now=100) is None
+    assert scheduler.seconds_until_next(now=100) == 100
+
+
+def test_interval_adapts_to_change_rate():
+    scheduler = RefreshScheduler(PROFILES)
+    scheduler.add('clinic', 1, due_at=0)
+
+    target = scheduler.pop_due(now=0)
+    scheduler.reschedule(target, changed=True, now=0)
+    assert target.interval == 50 and target.due_at == 50
+
+    target = scheduler.pop_due(now=50)
+    scheduler.reschedule(target, changed=True, now=50)
+    target = scheduler.pop_due(now=100)
+    scheduler.reschedule(target, changed=True, now=100)
+    assert target.interval == 25  # clamped to min_interval
+
+    for _ in range(10):
+        now = target.due_at
+        target = scheduler.pop_due(now=now)
+        scheduler.reschedule(target, changed=False, now=now)
+    assert target.interval == 400  # clamped to max_interval
+
+
+def test_sync_pages_and_state_round_trip():
+    scheduler = RefreshScheduler(PROFILES)
+    scheduler.sync_pages('clinic', 3)
+    assert len(scheduler) == 3
+    scheduler.sync_pages('clinic', 2)
+    assert len(scheduler) == 2
+
+    restored = RefreshScheduler(PROFILES)
+    restored.load_dict(scheduler.to_dict())
+    assert len(restored) == 2
+    assert {restored.pop_due(now=1e12).page, restored.pop_due(now=1e12).page} == {1, 2}
+
+    scheduler.add('pharmacy', 1)
+    restored = RefreshScheduler(PROFILES)
+    restored.load_dict(scheduler.to_dict(), sources=['pharmacy'])
+    assert len(restored) == 1 and restored.pop_due(now=1e12).source == 'pharmacy'
+
+
+def test_record_identity_and_digest():
+    record = {'id': 7, 'clinic_name': 'A', 'availability': {'next': '2030-01-01T00:00:00Z'}}
+    assert record_key(record) == '7'
+    assert record_digest(record) == record_digest(dict(reversed(list(record.items()))))
+    assert record_digest(record) != record_digest({**record, 'availability': {}})
+
+
+def test_daemon_restores_enabled_sources_and_retries_failed_records(tmp_path):
+    state_file = tmp_path / 'refresh_state.json'
+    saved = RefreshScheduler()
+    saved.add('clinic', 1, due_at=0)
+    saved.add('pharmacy', 1, due_at=0)
+    state_file.write_text(json.dumps({'scheduler': saved.to_dict(), 'digests': {'pharmacy': {'1': 'x'}}}))
+
+    async def fetch_page(page_url):
+        return {'results': [{'id': 1}, {'id': 2}]}
+
+    async def process_facility(record):
+        return record['id'] == 1
+
+    crawler = SimpleNamespace(config=SimpleNamespace(base_url='http://example/api/', max_concurrent=2),
+                              fetch_page=fetch_page, process_facility=process_facility)
+    daemon = RefreshDaemon({'clinic': crawler}, requests_per_minute=600, state_file=str(state_file))
+    daemon.load_state()
+    assert len(daemon.scheduler) == 1
+
+    asyncio.run(daemon.refresh(daemon.scheduler.pop_due()))
+    assert list(daemon.digests['clinic']) == ['1']
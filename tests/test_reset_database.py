@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the chunked database reset
+"""
+
+import re
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+from scripts.reset_database import CORE_STAGES, CORE_TABLES, REFERENCE_TABLES, clear_stages
+
+MIGRATION = Path(__file__).resolve().parent.parent / 'migrations' / '006_reset_tables.sql'
+
+
+class FakeQuery:
+    def __init__(self, tables, calls, name):
+        self.tables = tables
+        self.calls = calls
+        self.name = name
+        self.deleting = None
+        self.bounds = []
+        self.limit_to = None
+
+    def select(self, column, count=None, head=False):
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, size):
+        self.limit_to = size
+        return self
+
+    def delete(self, returning=None, count=None):
+        self.deleting = returning
+        return self
+
+    def gte(self, column, value):
+        self.bounds.append(lambda key: key >= value)
+        return self
+
+    def lte(self, column, value):
+        self.bounds.append(lambda key: key <= value)
+        return self
+
+    def execute(self):
+        keys = sorted(self.tables[self.name])
+        if self.deleting is None:
+            if self.limit_to is None:
+                return SimpleNamespace(data=None, count=len(keys))
+            return SimpleNamespace(data=[{'id': key} for key in keys[:self.limit_to]], count=None)
+        doomed = [key for key in keys if all(bound(key) for bound in self.bounds)]
+        self.tables[self.name] = [key for key in keys if key not in doomed]
+        self.calls.append((self.name, len(doomed), self.deleting.value))
+        return SimpleNamespace(data=[], count=len(doomed))
+
+
+def make_client(tables):
+    calls = []
+    postgrest = SimpleNamespace(table=lambda name: FakeQuery(tables, calls, name))
+    return SimpleNamespace(client=postgrest), calls
+
+
+def test_tables_are_deleted_in_bounded_chunks_without_returned_rows():
+    tables = {table: [] for table, _ in CORE_TABLES}
+    tables['facility_hours'] = list(range(25))
+    tables['facilities'] = list(range(3))
+    client, calls = make_client(tables)
+
+    progress = asyncio.run(clear_stages(client, CORE_STAGES, chunk_size=10, workers=3))
+
+    assert [rows for table, rows, _ in calls if table == 'facility_hours'] == [10, 10, 5]
+    assert {returning for _, _, returning in calls} == {'minimal'}
+    assert progress.total() == 28 and not any(tables.values())
+    # facilities is only cleared after every table referencing it
+    assert calls[-1][0] == 'facilities'
+
+
+def test_truncate_function_covers_the_reset_tables():
+    sql = MIGRATION.read_text()
+    function = sql[sql.index('CREATE OR REPLACE FUNCTION'):sql.index('REVOKE')]
+    named = set(re.findall(r"'(\w+)'", function))
+
+    assert named == {table for table, _ in CORE_TABLES + REFERENCE_TABLES}
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Tests for facility search documents.
+
+The refresh function runs against a local Postgres when NAVICARE_TEST_DATABASE_URL is set
+(see tests/test_bundle_ingest.py), in a scratch schema with migrations 002 and 008 applied.
+"""
+
+import os
+import json
+import uuid
+import asyncio
+
+import pytest
+
+from utils.search_documents import SearchDocumentRefresher
+from tests.test_bundle_ingest import MIGRATIONS, SCHEMA, clinic_bundle
+
+
+class FakeDatabase:
+    def __init__(self, fail_chunks=()):
+        self.fail_chunks = set(fail_chunks)
+        self.calls = []
+
+    async def refresh_search_documents(self, facility_ids, changed_since=None):
+        self.calls.append((list(facility_ids), changed_since))
+        if len(self.calls) - 1 in self.fail_chunks:
+            return None
+        return len(facility_ids)
+
+
+def test_touched_facilities_are_refreshed_in_chunks_then_changed_since():
+    db_client = FakeDatabase()
+    refresher = SearchDocumentRefresher(db_client)
+    for facility_id in ('f3', 'f1', None, 'f2', 'f1'):
+        refresher.touched(facility_id)
+
+    assert asyncio.run(refresher.refresh(chunk_size=2)) == 3
+    assert db_client.calls == [(['f1', 'f2'], None), (['f3'], None), ([], refresher.started_at)]
+    assert not refresher.pending
+
+
+def test_failed_chunks_stay_pending():
+    refresher = SearchDocumentRefresher(FakeDatabase(fail_chunks=[0]))
+    for facility_id in ('f1', 'f2', 'f3'):
+        refresher.touched(facility_id)
+
+    assert asyncio.run(refresher.refresh(chunk_size=2)) is None
+    assert refresher.pending == {'f1', 'f2'}
+
+
+@pytest.mark.skipif(not os.getenv('NAVICARE_TEST_DATABASE_URL'), reason='NAVICARE_TEST_DATABASE_URL not set')
+def test_refresh_facility_search_documents_against_postgres():
+    asyncpg = pytest.importorskip('asyncpg')
+
+    async def run():
+        conn = await asyncpg.connect(os.environ['NAVICARE_TEST_DATABASE_URL'])
+        schema = f"navicare_test_{uuid.uuid4().hex[:8]}"
+        try:
+            await conn.execute(f'CREATE SCHEMA {schema}; SET search_path TO {schema}')
+            await conn.execute(SCHEMA)
+            for migration in ('001_child_table_natural_keys.sql', '002_ingest_facility_bundle.sql',
+                              '008_facility_search_documents.sql'):
+                await conn.execute((MIGRATIONS / migration).read_text())
+
+            async def ingest(bundle):
+                outcomes = json.loads(await conn.fetchval('SELECT ingest_facility_bundles($1::jsonb)',
+                                                          json.dumps([bundle])))
+                return uuid.UUID(outcomes[0]['facility_id'])
+
+            async def refresh(facility_ids, changed_since=None):
+                return await conn.fetchval('SELECT refresh_facility_search_documents($1::uuid[], $2)',
+                                           facility_ids, changed_since)
+
+            facility_id = await ingest(clinic_bundle('6135550100', ['walk-in', 'virtual'], [0, 1]))
+            assert await refresh([facility_id]) == 1
+            # Rebuilding an unchanged facility writes nothing
+            assert await refresh([facility_id]) == 0
+
+            await ingest(clinic_bundle('6135550199', ['walk-in'], [2]))
+            assert await refresh([facility_id]) == 1
+            document = json.loads(await conn.fetchval(
+                'SELECT document FROM facility_search_documents WHERE facility_id = $1', facility_id))
+            assert document['name'] == 'Maple Clinic' and 'updated_at' not in document
+            assert [hours['weekday'] for hours in document['hours']] == [2]
+            assert [service['slug'] for service in document['services']] == ['walk-in']
+            assert document['specialties'] == ['Family Medicine']
+            assert {channel['phone'] for channel in document['booking_channels']} == {None, '6135550199'}
+            assert document['next_available_at'].startswith('2030-01-01')
+
+            # Facilities updated by other writers are found by changed_since
+            since = await conn.fetchval('SELECT now()')
+            await conn.execute("UPDATE facilities SET status = 'inactive', updated_at = clock_timestamp()")
+            assert await refresh([], since) == 1
+            assert await conn.fetchval("SELECT document->>'status' FROM facility_search_documents") == 'inactive'
+        finally:
+            await conn.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+            await conn.close()
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for the cost-based segment planner
+"""
+
+from utils.segment_planner import append_page_costs, load_page_costs, estimate_page_costs, plan_segments
+
+
+def test_plan_covers_all_pages_within_target():
+    costs = [60.0] * 100 + [300.0] * 20
+    plan = plan_segments(costs, target_seconds=3600)
+
+    assert plan[0]['start_page'] == 1
+    assert plan[-1]['end_page'] == 120
+    for previous, current in zip(plan, plan[1:]):
+        assert current['start_page'] == previous['end_page'] + 1
+    assert all(segment['fits_target'] for segment in plan)
+    assert len(plan) == 4  # 12000s of work in 3600s segments
+
+
+def test_fixed_segment_count_balances_cost():
+    costs = [10.0] * 50 + [40.0] * 50
+    plan = plan_segments(costs, target_seconds=10_000, segments=4)
+
+    assert len(plan) == 4
+    predicted = [segment['predicted_seconds'] for segment in plan]
+    assert max(predicted) - min(predicted) <= 40.0
+    # Cheap pages get wider segments than expensive ones
+    assert plan[0]['end_page'] - plan[0]['start_page'] > plan[-1]['end_page'] - plan[-1]['start_page']
+
+
+def test_cost_log_round_trip(tmp_path):
+    path = str(tmp_path / "costs.jsonl")
+    append_page_costs(path, 'lab', [{'page': 1, 'seconds': 10.0, 'records': 50},
+                                    {'page': 2, 'seconds': 30.0, 'records': 50}])
+    append_page_costs(path, 'clinic', [{'page': 1, 'seconds': 99.0, 'records': 50}])
+
+    observed = load_page_costs(path, 'lab')
+    assert observed == {1: 10.0, 2: 30.0}
+    assert estimate_page_costs(observed, 3, default_seconds=90) == [10.0, 30.0, 20.0]
+    assert load_page_costs(path, 'lab', recorded_before=0) == {}
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for shadow-table full reloads.
+
+The build and swap run against a local Postgres when NAVICARE_TEST_DATABASE_URL is set
+(see tests/test_bundle_ingest.py), in a scratch schema with migration 001 applied.
+"""
+
+import os
+import uuid
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from utils.shadow_reload import ShadowLoader, finish_shadow_reload
+from tests.test_bundle_ingest import MIGRATIONS, SCHEMA, clinic_bundle
+
+
+class FakeLoader:
+    def __init__(self):
+        self.calls = []
+
+    async def swap(self):
+        self.calls.append('swap')
+        return {'facilities_created': 1}
+
+    async def discard(self):
+        self.calls.append('discard')
+
+
+def test_incomplete_crawl_discards_the_reload():
+    loader = FakeLoader()
+    crawler = SimpleNamespace(copy_loader=loader, crawl_complete=False, spool=None)
+
+    assert asyncio.run(finish_shadow_reload(crawler)) is None
+    assert loader.calls == ['discard']
+
+
+def test_complete_crawl_swaps_the_reload():
+    loader = FakeLoader()
+    crawler = SimpleNamespace(copy_loader=loader, crawl_complete=True, spool=None)
+
+    assert asyncio.run(finish_shadow_reload(crawler)) == {'facilities_created': 1}
+    assert loader.calls == ['swap']
+
+
+@pytest.mark.skipif(not os.getenv('NAVICARE_TEST_DATABASE_URL'), reason='NAVICARE_TEST_DATABASE_URL not set')
+def test_shadow_reload_against_postgres():
+    asyncpg = pytest.importorskip('asyncpg')
+
+    async def run():
+        dsn = os.environ['NAVICARE_TEST_DATABASE_URL']
+        conn = await asyncpg.connect(dsn)
+        schema = f"navicare_test_{uuid.uuid4().hex[:8]}"
+        loader = ShadowLoader(f"{dsn}{'&' if '?' in dsn else '?'}search_path={schema}")
+        try:
+            await conn.execute(f'CREATE SCHEMA {schema}; SET search_path TO {schema}')
+            await conn.execute(SCHEMA)
+            await conn.execute((MIGRATIONS / '001_child_table_natural_keys.sql').read_text())
+            # A facility from another source, whose child rows the reload must carry over
+            other = await conn.fetchval(
+                "INSERT INTO facilities (name, slug, status) VALUES ('Elm Lab', 'elm-lab', 'active') RETURNING id"
+            )
+            await conn.execute("INSERT INTO facility_hours (facility_id, weekday, slot) VALUES ($1, 5, 0)", other)
+            maple = await conn.fetchval(
+                "INSERT INTO facilities (name, slug, city, province, status) "
+                "VALUES ('Maple Clinic', 'maple-clinic', 'Ottawa', 'ON', 'active') RETURNING id"
+            )
+            await conn.execute("INSERT INTO facility_hours (facility_id, weekday, slot) VALUES ($1, 0, 0)", maple)
+            await loader.open()
+            # A second reload cannot start (and drop these shadows) while this one is being built
+            with pytest.raises(RuntimeError, match='another reload'):
+                await ShadowLoader(loader.dsn).open()
+            assert await conn.fetchval("SELECT to_regclass('facility_hours_shadow')") is not None
+
+            first = await loader.load([clinic_bundle('6135550100', ['Walk-in', 'Virtual'], [1, 2])])
+            assert first[0]['facility_id'] == str(maple) and first[0]['created'] is False
+            # A repeated facility replaces its earlier shadow rows
+            second = await loader.load([clinic_bundle('6135550199', ['Walk-in'], [3])])
+            assert second[0]['facility_id'] == str(maple)
+            pine = dict(clinic_bundle('6135550123', [], []), facility={'name': 'Pine Clinic', 'slug': 'pine-clinic'})
+            third = await loader.load([pine])
+            assert third[0]['created'] is True
+
+            # Nothing is visible before the swap
+            assert await conn.fetchval('SELECT count(*) FROM facilities') == 2
+            assert await conn.fetchval('SELECT array_agg(weekday ORDER BY weekday) FROM facility_hours') == [0, 5]
+
+            result = await loader.swap()
+            assert result['facilities_created'] == 1 and result['carried_over'] == 1
+
+            assert await conn.fetchval('SELECT count(*) FROM facilities') == 3
+            assert await conn.fetchval('SELECT array_agg(weekday ORDER BY weekday) FROM facility_hours') == [3, 5]
+            phones = await conn.fetch('SELECT phone FROM facility_booking_channels WHERE phone IS NOT NULL ORDER BY phone')
+            assert [row['phone'] for row in phones] == ['6135550123', '6135550199']
+            indexes = await conn.fetch("SELECT indexname FROM pg_indexes WHERE tablename = 'facility_hours'")
+            assert {row['indexname'] for row in indexes} == {'facility_hours_pkey', 'facility_hours_facility_weekday_slot_key'}
+            assert await conn.fetchval("SELECT to_regclass('facility_hours_shadow')") is None
+
+            # After the swap the loader writes to the live tables
+            late = await loader.load([clinic_bundle('6135550100', ['Walk-in'], [4])])
+            assert late[0]['facility_id'] == str(maple)
+            assert await conn.fetchval(
+                'SELECT array_agg(weekday ORDER BY weekday) FROM facility_hours WHERE facility_id = $1', maple
+            ) == [4]
+        finally:
+            await loader.close()
+            await conn.execute(f'DROP SCHEMA IF EXISTS {schema} CASCADE')
+            await conn.close()
+
+    asyncio.run(run())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for the crawl status tracker's server-side statistics
+"""
+
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+from scripts.track_crawl_status import find_stale_sources, get_crawl_statistics
+
+STATS = {
+    'total_facilities': 3,
+    'facility_types': {'clinic': 2, 'lab': 1},
+    'statuses': {'active': 3},
+    'freshness': {'1d': 2, 'older': 1},
+    'sources': {
+        'clinic': {'facilities': 2, 'active': 2, 'last_seen_at': '2026-10-18T06:00:00+00:00', 'freshness': {'1d': 2}},
+        'lab': {'facilities': 1, 'active': 1, 'last_seen_at': '2026-09-01T06:00:00+00:00', 'freshness': {'older': 1}},
+    },
+}
+
+
+class FakeQuery:
+    def __init__(self, calls, data=None, count=None):
+        self.calls = calls
+        self.data = data
+        self.count = count
+
+    def select(self, *columns, **options):
+        self.calls.append(('select', columns, options))
+        return self
+
+    def gte(self, column, value):
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.data, count=self.count)
+
+
+class FakeClient:
+    def __init__(self):
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append(('rpc', name))
+        return FakeQuery(self.calls, data=STATS)
+
+    def table(self, name):
+        self.calls.append(('table', name))
+        return FakeQuery(self.calls, count=7)
+
+
+def test_statistics_come_from_one_aggregate_call():
+    client = FakeClient()
+    stats = get_crawl_statistics(client, stale_hours=48)
+
+    assert ('rpc', 'facility_stats') in client.calls
+    # The only table read is a head count of recent observations; no facility rows are downloaded
+    assert [call[1] for call in client.calls if call[0] == 'table'] == ['facility_observations']
+    assert [call[2] for call in client.calls if call[0] == 'select'] == [{'count': 'exact', 'head': True}]
+    assert stats['facility_types'] == {'clinic': 2, 'lab': 1}
+    assert stats['recent_observations'] == 7
+
+
+def test_sources_not_seen_recently_are_stale():
+    now = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+    sources = dict(STATS['sources'], pharmacy={'facilities': 0, 'active': 0, 'last_seen_at': None})
+
+    assert find_stale_sources(sources, 48, now) == ['lab', 'pharmacy']
+    assert find_stale_sources(sources, 24 * 60, now) == ['pharmacy']
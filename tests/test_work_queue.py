@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the page range work queue (SQLite backend)
+"""
+
+import asyncio
+import time
+
+from utils.work_queue import SQLiteWorkQueue, drain_work_queue
+
+
+def _queue(tmp_path, lease_seconds=60):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), lease_seconds=lease_seconds)
+    asyncio.run(queue.initialize())
+    return queue
+
+
+def test_seed_is_idempotent(tmp_path):
+    queue = _queue(tmp_path)
+    assert asyncio.run(queue.seed("clinics", 1, 12, 5)) == 3
+    assert asyncio.run(queue.seed("clinics", 1, 12, 5)) == 0
+    assert asyncio.run(queue.progress("clinics")) == {"pending": 3}
+
+
+def test_claim_renew_complete(tmp_path):
+    queue = _queue(tmp_path)
+    asyncio.run(queue.seed("clinics", 1, 10, 5))
+
+    first = asyncio.run(queue.claim("clinics", "worker-a"))
+    second = asyncio.run(queue.claim("clinics", "worker-b"))
+    assert (first.start_page, first.end_page) == (1, 5)
+    assert (second.start_page, second.end_page) == (6, 10)
+    assert asyncio.run(queue.claim("clinics", "worker-c")) is None
+
+    assert asyncio.run(queue.renew(first))
+    assert asyncio.run(queue.complete(first))
+    assert asyncio.run(queue.release(second))
+    assert asyncio.run(queue.progress("clinics")) == {"done": 1, "pending": 1}
+
+
+def test_expired_lease_is_reclaimed(tmp_path):
+    queue = _queue(tmp_path, lease_seconds=60)
+    asyncio.run(queue.seed("clinics", 1, 5, 5))
+
+    stale = asyncio.run(queue.claim("clinics", "worker-a"))
+    queue.conn.execute("UPDATE crawl_page_ranges SET lease_expires_at = ?", (time.time() - 1,))
+
+    fresh = asyncio.run(queue.claim("clinics", "worker-b"))
+    assert fresh.range_id == stale.range_id
+    assert fresh.attempts == 2
+    # The original holder can no longer renew or complete the range
+    assert not asyncio.run(queue.renew(stale))
+    assert not asyncio.run(queue.complete(stale))
+    assert asyncio.run(queue.complete(fresh))
+
+
+def test_drain_work_queue(tmp_path):
+    queue = _queue(tmp_path)
+    asyncio.run(queue.seed("clinics", 1, 7, 3))
+    crawled = []
+
+    async def crawl_range(start_page, end_page):
+        crawled.append((start_page, end_page))
+
+    completed = asyncio.run(drain_work_queue(queue, "clinics", "worker-a", crawl_range))
+    assert completed == 3
+    assert crawled == [(1, 3), (4, 6), (7, 7)]
+    assert asyncio.run(queue.progress("clinics")) == {"done": 3}
+
+
+def test_ranges_with_failed_pages_are_retried_then_marked_failed(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=2)
+    asyncio.run(queue.initialize())
+    asyncio.run(queue.seed("clinics", 1, 6, 3))
+    crawled = []
+
+    async def crawl_range(start_page, end_page):
+        crawled.append((start_page, end_page))
+        return [5] if start_page == 4 else []
+
+    completed = asyncio.run(drain_work_queue(queue, "clinics", "worker-a", crawl_range))
+    assert completed == 1
+    assert crawled == [(1, 3), (4, 6), (4, 6)]
+    assert asyncio.run(queue.progress("clinics")) == {"done": 1, "failed": 1}
+
+
+def test_expired_lease_out_of_attempts_is_marked_failed(tmp_path):
+    queue = SQLiteWorkQueue(str(tmp_path / "queue.db"), lease_seconds=60, max_attempts=1)
+    asyncio.run(queue.initialize())
+    asyncio.run(queue.seed("clinics", 1, 5, 5))
+
+    asyncio.run(queue.claim("clinics", "worker-a"))
+    queue.conn.execute("UPDATE crawl_page_ranges SET lease_expires_at = ?", (time.time() - 1,))
+
+    assert asyncio.run(queue.claim("clinics", "worker-b")) is None
+    assert asyncio.run(queue.progress("clinics")) == {"failed": 1}
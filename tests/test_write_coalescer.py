@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the group-commit write coalescer
+"""
+
+import json
+import asyncio
+
+import httpx
+from postgrest import APIError
+
+from utils.supabase_client import SupabaseClient
+
+
+def make_client(monkeypatch, coalesce_ms='5', batch_size='100'):
+    monkeypatch.setenv('SUPABASE_URL', 'http://127.0.0.1:9')
+    monkeypatch.setenv('SUPABASE_KEY', 'test-key')
+    monkeypatch.setenv('SUPABASE_WRITE_COALESCE_MS', coalesce_ms)
+    monkeypatch.setenv('SUPABASE_WRITE_BATCH_SIZE', batch_size)
+    client = SupabaseClient()
+    batches = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        rows = body if isinstance(body, list) else [body]
+        batches.append(rows)
+        if any(row.get('phone') == 'bad' for row in rows):
+            return httpx.Response(400, json={'code': '22001', 'message': 'value too long', 'hint': None, 'details': None})
+        return httpx.Response(201, json=[{**row, 'id': f"id-{row['url']}"} for row in rows])
+
+    client.client.postgrest.session._transport = httpx.MockTransport(handler)
+    return client, batches
+
+
+def test_concurrent_inserts_share_one_request(monkeypatch):
+    client, batches = make_client(monkeypatch)
+
+    async def run():
+        return await asyncio.gather(*(
+            client.insert_row('facility_booking_channels', {'facility_id': 'f1', 'url': str(i)}) for i in range(10)
+        ))
+
+    inserted = asyncio.run(run())
+
+    assert len(batches) == 1 and len(batches[0]) == 10
+    assert [row['id'] for row in inserted] == [f'id-{i}' for i in range(10)]
+    assert client.write_coalescer.summary() == {'coalesced_rows': 10, 'coalesced_batches': 1, 'rows_per_batch': 10.0}
+
+
+def test_rejected_row_fails_only_its_caller(monkeypatch):
+    client, batches = make_client(monkeypatch, batch_size='4')
+
+    async def run():
+        return await asyncio.gather(*(
+            client.insert_row('facility_booking_channels', {'facility_id': 'f1', 'url': str(i), 'phone': 'bad' if i == 2 else None})
+            for i in range(4)
+        ), return_exceptions=True)
+
+    results = asyncio.run(run())
+
+    assert isinstance(results[2], APIError) and results[2].code == '22001'
+    assert [row['id'] for i, row in enumerate(results) if i != 2] == ['id-0', 'id-1', 'id-3']
+    assert len(batches[0]) == 4
+
+
+def test_rows_with_different_columns_are_not_merged(monkeypatch):
+    client, batches = make_client(monkeypatch)
+
+    async def run():
+        await asyncio.gather(
+            client.insert_row('facility_booking_channels', {'facility_id': 'f1', 'url': 'a'}),
+            client.insert_row('facility_booking_channels', {'facility_id': 'f1', 'url': 'b', 'label': 'Book'}),
+        )
+
+    asyncio.run(run())
+
+    assert sorted(len(rows) for rows in batches) == [1, 1]
+
+
+def test_coalescing_can_be_disabled(monkeypatch):
+    client, batches = make_client(monkeypatch, coalesce_ms='0')
+
+    assert client.write_coalescer is None
+    assert asyncio.run(client.insert_row('services', {'url': 's'}))['id'] == 'id-s'
+
+
+def test_close_flushes_waiting_batches_without_waiting_for_the_window(monkeypatch):
+    client, batches = make_client(monkeypatch, coalesce_ms='60000')
+
+    async def run():
+        insert = asyncio.create_task(client.insert_row('facility_booking_channels', {'facility_id': 'f1', 'url': '1'}))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(client.drain_writes(), timeout=5)
+        return await insert
+
+    assert asyncio.run(run())['id'] == 'id-1'
+    assert len(batches) == 1
+    assert not client.write_coalescer.tasks and not client.write_coalescer.timers
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Tests for the local write spool used while the database is unavailable
+"""
+
+import asyncio
+import os
+from types import SimpleNamespace
+
+import httpx
+
+from utils.bundle_ingest import ingest_page_bundles
+from utils.db_health import DatabaseHealth, OPEN, CLOSED
+from utils.write_spool import WriteSpool, spool_page, drain_spool
+
+
+def make_crawler(tmp_path, outcomes):
+    calls = []
+
+    async def ingest_facility_bundles(bundles):
+        calls.append([bundle['facility']['slug'] for bundle in bundles])
+        result = outcomes.pop(0)
+        return None if result is None else [{'index': i, 'created': True} for i in range(len(bundles))]
+
+    db_client = SimpleNamespace(health=DatabaseHealth(max_limit=2),
+                                ingest_facility_bundles=ingest_facility_bundles)
+    crawler = SimpleNamespace(
+        db_client=db_client, copy_loader=None, dead_letters=None, sightings=None, search_documents=None,
+        spool=WriteSpool(str(tmp_path / 'spool.jsonl')),
+        stats={key: 0 for key in ('errors', 'validation_errors', 'facilities_created', 'facilities_updated',
+                                  'booking_channels_created', 'facility_hours_records_created',
+                                  'service_offerings_created', 'availability_records_created',
+                                  'total_processed')},
+    )
+    return crawler, calls
+
+
+def build_bundle(record):
+    return {'facility': {'name': record['name'], 'slug': record['name']}, 'booking_channels': []}
+
+
+def test_pages_are_spooled_while_open_and_drained_in_order(tmp_path):
+    crawler, calls = make_crawler(tmp_path, outcomes=[None, True, True, True])
+    health = crawler.db_client.health
+
+    async def run():
+        health.state = OPEN
+        assert await spool_page(crawler, 'clinic', [{'name': 'a'}], 'page-1', 1, build_bundle)
+
+        # Recovered, but the first drain attempt fails: page 2 queues behind page 1
+        health.state = CLOSED
+        assert await spool_page(crawler, 'clinic', [{'name': 'b'}], 'page-2', 2, build_bundle)
+
+        # Both spooled pages are written before page 3 is let through
+        assert not await spool_page(crawler, 'clinic', [{'name': 'c'}], 'page-3', 3, build_bundle)
+
+    asyncio.run(run())
+    assert calls == [['a'], ['a'], ['b']]
+    assert crawler.stats['total_processed'] == 2
+    assert not crawler.spool.pending()
+    assert os.path.getsize(crawler.spool.path) == 0
+
+
+def test_drain_resumes_after_the_last_written_page(tmp_path):
+    crawler, calls = make_crawler(tmp_path, outcomes=[True, None, True])
+    for name in ('a', 'b'):
+        crawler.spool.append('lab', None, None, [build_bundle({'name': name})], [{'name': name}])
+    # A crash mid-append leaves a line without its newline; it is not drained yet
+    with open(crawler.spool.path, 'a') as f:
+        f.write('{"source": "lab"')
+
+    assert asyncio.run(drain_spool(crawler)) == 1
+    # A new spool instance (a later drain-spool run) continues from the checkpoint
+    crawler.spool = WriteSpool(crawler.spool.path)
+    assert asyncio.run(drain_spool(crawler)) == 1
+    assert calls == [['a'], ['b'], ['b']]
+    assert crawler.spool.pending()
+
+
+def test_pages_are_spooled_when_the_database_is_unreachable(tmp_path):
+    crawler, _ = make_crawler(tmp_path, outcomes=[])
+
+    async def ingest(bundles):
+        raise httpx.ConnectError('connection refused')
+
+    asyncio.run(ingest_page_bundles(crawler, 'clinic', [{'name': 'a'}], build_bundle, ingest, 'page-1', 1))
+    assert crawler.spool.pending()
+    assert crawler.stats['total_processed'] == 0
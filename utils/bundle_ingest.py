@@ -0,0 +1,141 @@
+"""
+NaviCare Facility Bundle Ingest
+Builds per-facility bundles and writes a whole page of them with one ingest_facility_bundles RPC
+"""
+
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from utils.supabase_client import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+
+class BundleIngestError(Exception):
+    """A facility bundle rejected by the database (ingest_facility_bundle or a COPY load)"""
+
+
+def _without_facility_id(rows: List[Dict]) -> List[Dict]:
+    return [{k: v for k, v in row.items() if k != 'facility_id'} for row in rows]
+
+
+def build_facility_bundle(facility_data: Dict, booking_channels: List[Dict],
+                          specialties: Optional[List[str]] = None,
+                          service_offerings: Optional[List[Dict]] = None,
+                          hours: Optional[List[Dict]] = None,
+                          availability: Optional[List[Dict]] = None) -> Dict:
+    """Assemble an ingest_facility_bundle payload from transformer output.
+
+    Tables are only touched when their key is present, matching the per-row paths: specialties
+    and availability are left alone when empty, offerings and hours are replaced when given.
+    """
+    bundle = {
+        'facility': facility_data,
+        'booking_channels': _without_facility_id(booking_channels),
+    }
+    if specialties:
+        bundle['specialties'] = list(specialties)
+    if service_offerings is not None:
+        bundle['service_offerings'] = _without_facility_id(service_offerings)
+    if hours is not None:
+        bundle['hours'] = _without_facility_id(SupabaseClient._sanitize_hours(None, hours))
+    if availability:
+        bundle['availability'] = _without_facility_id(availability)
+    return bundle
+
+
+def build_page_bundles(crawler, source: str, records: List[Dict],
+                       build_bundle: Callable[[Dict], Optional[Dict]]) -> Tuple[List[Dict], List[Dict]]:
+    """Build bundles for a page of records; returns (bundles, the records they were built from).
+
+    build_bundle returns None for records that fail validation; records whose bundle cannot be
+    built are quarantined when dead letters are enabled.
+    """
+    bundles: List[Dict] = []
+    bundled_records: List[Dict] = []
+    for record in records:
+        try:
+            bundle = build_bundle(record)
+        except Exception as e:
+            logger.error(f"Error building {source} bundle: {e}")
+            crawler.stats['errors'] += 1
+            if crawler.dead_letters:
+                crawler.dead_letters.record_failure(source, record, e)
+            continue
+        if bundle is None:
+            crawler.stats['validation_errors'] += 1
+            continue
+        bundles.append(bundle)
+        bundled_records.append(record)
+    return bundles, bundled_records
+
+
+async def ingest_bundles(crawler, source: str, bundles: List[Dict], records: List[Dict],
+                         ingest: Optional[Callable[[List[Dict]], Awaitable[Optional[List[Dict]]]]] = None) -> bool:
+    """Ingest built bundles in one call and update crawler.stats; False if the call itself failed.
+
+    ingest defaults to the ingest_facility_bundles RPC; CopyLoader.load has the same contract.
+    Records whose bundle is rejected are quarantined when dead letters are enabled. An unreachable
+    database (refused connection, timeout) counts as a failed call.
+    """
+    ingest = ingest or crawler.db_client.ingest_facility_bundles
+    try:
+        outcomes = await ingest(bundles)
+    except httpx.TransportError as e:
+        logger.error(f"Error ingesting {len(bundles)} {source} bundles: {e}")
+        return False
+    if outcomes is None and bundles:
+        return False
+    by_index = {outcome.get('index'): outcome for outcome in outcomes or []}
+
+    for index, (bundle, record) in enumerate(zip(bundles, records)):
+        outcome = by_index.get(index)
+        if outcome is None or outcome.get('error'):
+            error = outcome.get('error') if outcome else 'no outcome returned for bundle'
+            logger.error(f"Error ingesting {source} {bundle['facility'].get('name', 'Unknown')}: {error}")
+            crawler.stats['errors'] += 1
+            if crawler.dead_letters:
+                crawler.dead_letters.record_failure(source, record, BundleIngestError(error))
+            continue
+
+        if crawler.sightings:
+            crawler.sightings.saw(outcome.get('facility_id'))
+        if crawler.search_documents:
+            crawler.search_documents.touched(outcome.get('facility_id'))
+        if outcome.get('created'):
+            crawler.stats['facilities_created'] += 1
+        else:
+            crawler.stats['facilities_updated'] += 1
+        crawler.stats['booking_channels_created'] += len(bundle['booking_channels'])
+        crawler.stats['facility_hours_records_created'] += len(bundle.get('hours', []))
+        if 'service_offerings' in bundle:
+            crawler.stats['service_offerings_created'] += len(bundle['service_offerings'])
+        if 'availability' in bundle:
+            crawler.stats['availability_records_created'] += 1
+        crawler.stats['total_processed'] += 1
+    return True
+
+
+async def ingest_page_bundles(crawler, source: str, records: List[Dict],
+                              build_bundle: Callable[[Dict], Optional[Dict]],
+                              ingest: Optional[Callable[[List[Dict]], Awaitable[Optional[List[Dict]]]]] = None,
+                              page_url: Optional[str] = None, page_number: Optional[int] = None):
+    """Build bundles for a page of records and ingest them in one call, updating crawler.stats.
+
+    If the call fails the built page goes to the crawler's write spool when one is configured,
+    to be written once the database recovers; otherwise every record of the page is quarantined.
+    """
+    bundles, bundled_records = build_page_bundles(crawler, source, records, build_bundle)
+    if await ingest_bundles(crawler, source, bundles, bundled_records, ingest):
+        return
+
+    if crawler.spool:
+        crawler.spool.append(source, page_url, page_number, bundles, bundled_records)
+        return
+    for bundle, record in zip(bundles, bundled_records):
+        logger.error(f"Error ingesting {source} {bundle['facility'].get('name', 'Unknown')}: bundle ingest call failed")
+        crawler.stats['errors'] += 1
+        if crawler.dead_letters:
+            crawler.dead_letters.record_failure(source, record, BundleIngestError('bundle ingest call failed'))
@@ -0,0 +1,300 @@
+"""
+NaviCare COPY Bulk Loader
+Direct Postgres load path for full reloads: binary COPY of facility bundles into staging tables,
+then set-based merges into the live tables in one transaction
+"""
+
+import os
+import json
+import logging
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Bundle key -> live table (bundle shape as in utils/bundle_ingest.build_facility_bundle)
+CHILD_TABLES = {
+    'booking_channels': 'facility_booking_channels',
+    'service_offerings': 'facility_service_offerings',
+    'hours': 'facility_hours',
+    'availability': 'facility_availability',
+}
+LIVE_TABLES = ['facilities', 'services', 'specialties', 'facility_specialties'] + list(CHILD_TABLES.values())
+
+# Staged with service offerings to resolve/create services, never written to the offerings table
+SERVICE_COLUMNS = ['service_slug', 'display_name', 'workflow_type']
+# Always staged so facilities can be matched like SupabaseClient.find_existing_facility does
+IDENTITY_COLUMNS = ['slug', 'name', 'city', 'province']
+
+
+def _to_text(value) -> Optional[str]:
+    """Staging columns are text; values are cast to the live column types during the merge"""
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class CopyLoader:
+    """Loads facility bundles straight into Postgres (DATABASE_URL), bypassing PostgREST"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.pool = None
+        self.column_types: Dict[str, Dict[str, str]] = {}
+
+    async def open(self):
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        rows = await self.pool.fetch(
+            """
+            SELECT c.relname AS table_name, a.attname AS column_name,
+                   format_type(a.atttypid, a.atttypmod) AS column_type
+            FROM pg_attribute a
+            JOIN pg_class c ON c.oid = a.attrelid
+            WHERE c.oid = ANY (SELECT to_regclass(t) FROM unnest($1::text[]) t)
+              AND a.attnum > 0 AND NOT a.attisdropped
+            ORDER BY a.attnum
+            """,
+            LIVE_TABLES
+        )
+        for row in rows:
+            self.column_types.setdefault(row['table_name'], {})[row['column_name']] = row['column_type']
+        missing = [table for table in LIVE_TABLES if table not in self.column_types]
+        if missing:
+            raise RuntimeError(f"COPY loader: tables not found: {', '.join(missing)}")
+
+    async def close(self):
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+    def _cast(self, table: str, column: str, alias: str) -> str:
+        column_type = self.column_types[table][column]
+        source = f"{alias}.{_ident(column)}"
+        if column_type.endswith('[]'):
+            # Lists are staged as JSON arrays
+            return f"ARRAY(SELECT jsonb_array_elements_text({source}::jsonb))::{column_type}"
+        return f"{source}::{column_type}"
+
+    def _columns(self, table: str, rows: Sequence[Dict], exclude: Sequence[str] = ()) -> List[str]:
+        """Union of row keys that are columns of the live table, in table order"""
+        keys = set()
+        for row in rows:
+            keys.update(row)
+        return [column for column in self.column_types[table] if column in keys and column not in exclude]
+
+    async def _stage(self, conn, name: str, columns: List[str], records: List[tuple]):
+        column_defs = ", ".join(f"{_ident(column)} text" for column in columns)
+        await conn.execute(f"CREATE TEMP TABLE {name} (stage_idx integer, {column_defs}) ON COMMIT DROP")
+        if records:
+            await conn.copy_records_to_table(name, records=records, columns=['stage_idx'] + columns)
+
+    async def load(self, bundles: List[Dict], update_columns: Optional[List[str]] = None) -> Optional[List[Dict]]:
+        """Load a batch of bundles in one transaction.
+
+        Returns one outcome per bundle like SupabaseClient.ingest_facility_bundles
+        ({'index', 'facility_id', 'created'} or {'index', 'error'}), or None if the load failed.
+        update_columns limits which columns are overwritten on facilities that already exist.
+        """
+        outcomes: Dict[int, Dict] = {}
+        valid = []
+        for index, bundle in enumerate(bundles):
+            facility = bundle.get('facility') or {}
+            if not facility.get('name') or not facility.get('slug'):
+                outcomes[index] = {'index': index, 'error': 'facility bundle has no name or slug'}
+            else:
+                valid.append((index, bundle))
+
+        if valid:
+            try:
+                async with self.pool.acquire() as conn:
+                    async with conn.transaction():
+                        for row in await self._merge(conn, valid, update_columns):
+                            outcomes[row['stage_idx']] = {
+                                'index': row['stage_idx'],
+                                'facility_id': str(row['facility_id']),
+                                'created': row['created'],
+                            }
+            except Exception as e:
+                logger.error(f"COPY load of {len(valid)} facility bundles failed: {e}")
+                return None
+
+        return [outcomes.get(index, {'index': index, 'error': 'not loaded'}) for index in range(len(bundles))]
+
+    def _target(self, table: str) -> str:
+        """Table that receives merged rows for a live table (shadow builds redirect child tables)"""
+        return table
+
+    async def _merge(self, conn, bundles: List[tuple], update_columns: Optional[List[str]]) -> List:
+        await self._merge_facilities(conn, bundles, update_columns)
+
+        # Child rows follow the last bundle of each facility in the batch
+        await conn.execute("""
+            CREATE TEMP TABLE stage_latest ON COMMIT DROP AS
+            SELECT DISTINCT ON (facility_id) stage_idx, facility_id, string_to_array(stage_scope, ',') AS scope
+            FROM stage_facilities
+            ORDER BY facility_id, stage_idx DESC
+        """)
+
+        await self._merge_specialties(conn, bundles)
+        for key, table in CHILD_TABLES.items():
+            await self._merge_children(conn, bundles, key, table)
+
+        return await conn.fetch("SELECT stage_idx, facility_id, created FROM stage_facilities")
+
+    async def _stage_facilities(self, conn, bundles: List[tuple]) -> List[str]:
+        """Stage the batch's facility rows; returns the staged facility columns"""
+        facilities = [bundle['facility'] for _, bundle in bundles]
+        columns = self._columns('facilities', facilities + [dict.fromkeys(IDENTITY_COLUMNS)],
+                                exclude=('id', 'created_at', 'updated_at'))
+
+        # stage_scope lists the bundle keys present, i.e. the child tables to replace for that facility
+        await self._stage(conn, 'stage_facilities', columns + ['stage_scope'], [
+            (index, *(_to_text(bundle['facility'].get(column)) for column in columns),
+             ",".join(key for key in ['specialties', *CHILD_TABLES] if key in bundle))
+            for index, bundle in bundles
+        ])
+        await conn.execute(f"""
+            ALTER TABLE stage_facilities
+                ADD COLUMN facility_id {self.column_types['facilities']['id']},
+                ADD COLUMN created boolean NOT NULL DEFAULT false
+        """)
+        return columns
+
+    async def _merge_facilities(self, conn, bundles: List[tuple], update_columns: Optional[List[str]]):
+        facility_types = self.column_types['facilities']
+        columns = await self._stage_facilities(conn, bundles)
+
+        # Resolve identities: slug first, then name + location
+        await conn.execute("""
+            UPDATE stage_facilities s SET facility_id = f.id FROM facilities f WHERE f.slug = s.slug
+        """)
+        await conn.execute("""
+            UPDATE stage_facilities s SET facility_id = f.id
+            FROM facilities f
+            WHERE s.facility_id IS NULL AND f.name = s.name AND f.city = s.city AND f.province = s.province
+        """)
+
+        await self._insert_fresh(conn, 'facilities', columns)
+
+        set_columns = [column for column in columns if update_columns is None or column in update_columns]
+        assignments = [f"{_ident(column)} = {self._cast('facilities', column, 's')}" for column in set_columns]
+        if set_columns:
+            if 'updated_at' in facility_types:
+                assignments.append("updated_at = now()")
+            # Rows whose values are unchanged are not rewritten (same as SupabaseClient.upsert_facility)
+            stored = ", ".join(f"f.{_ident(column)}" for column in set_columns)
+            staged = ", ".join(self._cast('facilities', column, 's') for column in set_columns)
+            await conn.execute(f"""
+                UPDATE facilities f SET {', '.join(assignments)}
+                FROM (
+                    SELECT DISTINCT ON (facility_id) * FROM stage_facilities
+                    WHERE NOT created
+                    ORDER BY facility_id, stage_idx DESC
+                ) s
+                WHERE f.id = s.facility_id AND ROW({stored}) IS DISTINCT FROM ROW({staged})
+            """)
+
+    async def _insert_fresh(self, conn, table: str, columns: List[str]):
+        """Insert the staged facilities no identity matched into table and record their new ids"""
+        facility_types = self.column_types['facilities']
+        insert_columns = ", ".join(_ident(column) for column in columns)
+        insert_values = ", ".join(self._cast('facilities', column, 's') for column in columns)
+        created_at = ", created_at" if 'created_at' in facility_types else ""
+        created_now = ", now()" if 'created_at' in facility_types else ""
+        await conn.execute(f"""
+            WITH fresh AS (
+                SELECT DISTINCT ON (slug) * FROM stage_facilities
+                WHERE facility_id IS NULL
+                ORDER BY slug, stage_idx DESC
+            ), inserted AS (
+                INSERT INTO {table} ({insert_columns}{created_at})
+                SELECT {insert_values}{created_now} FROM fresh s
+                RETURNING id, slug
+            )
+            UPDATE stage_facilities s SET facility_id = i.id, created = true
+            FROM inserted i
+            WHERE s.facility_id IS NULL AND s.slug = i.slug
+        """)
+
+    async def _clear_children(self, conn, table: str, key: str):
+        """Delete the child rows the batch replaces (tables whose bundle key is present)"""
+        await conn.execute(f"""
+            DELETE FROM {self._target(table)} t
+            USING stage_latest s
+            WHERE t.facility_id = s.facility_id AND $1 = ANY (s.scope)
+        """, key)
+
+    async def _merge_specialties(self, conn, bundles: List[tuple]):
+        await self._stage(conn, 'stage_specialties', ['name'], [
+            (index, _to_text(name)) for index, bundle in bundles for name in bundle.get('specialties') or []
+        ])
+        await conn.execute("""
+            INSERT INTO specialties (name)
+            SELECT DISTINCT c.name FROM stage_specialties c
+            WHERE NOT EXISTS (SELECT 1 FROM specialties p WHERE p.name = c.name)
+        """)
+        await self._clear_children(conn, 'facility_specialties', 'specialties')
+        await conn.execute(f"""
+            INSERT INTO {self._target('facility_specialties')} (facility_id, specialty_id)
+            SELECT DISTINCT ON (s.facility_id, c.name) s.facility_id, p.id
+            FROM stage_specialties c
+            JOIN stage_latest s ON s.stage_idx = c.stage_idx
+            JOIN specialties p ON p.name = c.name
+            ON CONFLICT DO NOTHING
+        """)
+
+    async def _merge_children(self, conn, bundles: List[tuple], key: str, table: str):
+        rows = [(index, row) for index, bundle in bundles for row in bundle.get(key) or []]
+        columns = self._columns(table, [row for _, row in rows], exclude=('id', 'facility_id'))
+        extra = SERVICE_COLUMNS if table == 'facility_service_offerings' else []
+        staged = columns + [column for column in extra if column not in columns]
+        stage_name = f"stage_{key}"
+
+        await self._stage(conn, stage_name, staged, [
+            (index, *(_to_text(row.get(column)) for column in staged)) for index, row in rows
+        ])
+        await self._clear_children(conn, table, key)
+        if not rows:
+            return
+
+        target = ["facility_id"] + [_ident(column) for column in columns]
+        values = ["s.facility_id"] + [self._cast(table, column, 'c') for column in columns]
+        joins = f"JOIN stage_latest s ON s.stage_idx = c.stage_idx"
+
+        if extra:
+            await conn.execute(f"""
+                INSERT INTO services (slug, display_name, category)
+                SELECT DISTINCT ON (c.service_slug) c.service_slug, coalesce(c.display_name, ''), coalesce(c.workflow_type, '')
+                FROM {stage_name} c
+                WHERE c.service_slug IS NOT NULL
+                  AND NOT EXISTS (SELECT 1 FROM services v WHERE v.slug = c.service_slug)
+                ORDER BY c.service_slug
+            """)
+            target.append("service_id")
+            values.append("v.id")
+            joins += " JOIN services v ON v.slug = c.service_slug"
+
+        await conn.execute(f"""
+            INSERT INTO {self._target(table)} ({', '.join(target)})
+            SELECT {', '.join(values)}
+            FROM {stage_name} c
+            {joins}
+            ON CONFLICT DO NOTHING
+        """)
+
+
+def create_copy_loader(dsn: Optional[str] = None) -> CopyLoader:
+    """Create a COPY loader for DATABASE_URL (the project's direct Postgres connection string)"""
+    dsn = dsn or os.getenv('DATABASE_URL')
+    if not dsn:
+        raise ValueError("DATABASE_URL environment variable is required for the copy ingest mode")
+    return CopyLoader(dsn)
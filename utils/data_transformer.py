@@ -93,6 +93,30 @@ class CorticoTransformer:
             'status': 'active'
         }
 
+    @staticmethod
+    def project_availability(cortico_data: Dict) -> Optional[Dict]:
+        """Extract only the identity keys and availability from a Cortico record.
+
+        Used by the availability updater, which does not need the full facility transform.
+        """
+        if not isinstance(cortico_data, dict):
+            return None
+
+        clinic_name = cortico_data.get('clinic_name') or ''
+        slug = cortico_data.get('clinic_slug')
+        if not slug and clinic_name:
+            slug = CorticoTransformer._generate_slug(clinic_name)
+
+        external_id = cortico_data.get('id')
+        return {
+            'external_id': str(external_id) if external_id is not None else (f"slug:{slug}" if slug else None),
+            'slug': slug or '',
+            'name': clinic_name.strip(),
+            'city': cortico_data.get('clinic_city', ''),
+            'province': cortico_data.get('clinic_province', ''),
+            'availability': cortico_data.get('availability') or {}
+        }
+
     @staticmethod
     def transform_booking_channels(facility_id: str, cortico_data: Dict) -> List[Dict]:
         """Transform Cortico booking data to booking channels"""
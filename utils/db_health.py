@@ -0,0 +1,214 @@
+"""
+NaviCare Database Health
+Adaptive write concurrency and a circuit breaker for PostgREST, driven by the latency and status of
+every database response, plus the bounded page buffer that lets fetching run ahead of paused writes
+"""
+
+import os
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Responses that mean the database (or its gateway) is overloaded, not that a request was wrong
+UNHEALTHY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class DatabaseHealth:
+    """AIMD concurrency limit plus circuit breaker for database writes.
+
+    Every response is recorded by the transport. Fast, healthy responses raise the in-flight limit
+    by one per limit's worth of successes; slow or overloaded responses halve it (at most once per
+    latency_target). After failure_threshold consecutive overloaded responses or transport errors
+    the breaker opens: writers wait in acquire()/wait_until_writable() for the cooldown, then one
+    of them runs the probe. Success closes the breaker at a limit of 1, so load ramps back up;
+    failure reopens it with a doubled cooldown.
+    """
+
+    def __init__(self, max_limit: int, latency_target: float = 2.0, failure_threshold: int = 5,
+                 cooldown: float = 5.0, max_cooldown: float = 120.0,
+                 probe: Optional[Callable[[], Awaitable[bool]]] = None):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.latency_target = latency_target
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe = probe
+
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.in_flight = 0
+        self.consecutive_failures = 0
+        self.successes = 0
+        self.last_decrease = 0.0
+        self._changed = asyncio.Event()
+        self.counters = {'unhealthy_responses': 0, 'slow_responses': 0, 'breaker_opens': 0, 'probes': 0}
+
+    @classmethod
+    def from_env(cls, max_limit: int, probe: Optional[Callable[[], Awaitable[bool]]] = None) -> 'DatabaseHealth':
+        return cls(
+            max_limit=max_limit,
+            latency_target=float(os.getenv('SUPABASE_LATENCY_TARGET_MS', '2000')) / 1000,
+            failure_threshold=int(os.getenv('SUPABASE_BREAKER_FAILURES', '5')),
+            cooldown=float(os.getenv('SUPABASE_BREAKER_COOLDOWN', '5')),
+            probe=probe,
+        )
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def record(self, seconds: float, status: Optional[int]):
+        """Record one database response; status None means the request raised (timeout, reset, ...)"""
+        if status is None or status in UNHEALTHY_STATUSES:
+            self.counters['unhealthy_responses'] += 1
+            if self.state != CLOSED:
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.failure_threshold:
+                self._open()
+            else:
+                self._decrease()
+            return
+
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            return
+        if seconds > self.latency_target:
+            self.counters['slow_responses'] += 1
+            self._decrease()
+            return
+        self.successes += 1
+        if self.successes >= self.limit and self.limit < self.max_limit:
+            self.limit += 1
+            self.successes = 0
+            self._notify()
+
+    def _decrease(self):
+        now = time.monotonic()
+        if now - self.last_decrease < self.latency_target:
+            return
+        self.last_decrease = now
+        self.successes = 0
+        if self.limit > 1:
+            self.limit = max(1, self.limit // 2)
+            logger.info(f"Database write concurrency reduced to {self.limit}")
+
+    def _open(self):
+        self.state = OPEN
+        self.open_until = time.monotonic() + self.cooldown
+        logger.warning(f"Database circuit breaker open; pausing writes for {self.cooldown:.0f}s")
+        self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+        self.counters['breaker_opens'] += 1
+        self.limit = 1
+        self.consecutive_failures = 0
+        self._notify()
+
+    def _close(self):
+        self.state = CLOSED
+        self.cooldown = self.base_cooldown
+        self.limit = 1
+        self.successes = 0
+        logger.info("Database circuit breaker closed; resuming writes")
+        self._notify()
+
+    async def wait_until_writable(self):
+        """Return once the breaker is closed, probing for recovery when the cooldown has passed"""
+        while self.state != CLOSED:
+            if self.state == HALF_OPEN:
+                # Another writer is probing
+                await self._changed.wait()
+                continue
+            remaining = self.open_until - time.monotonic()
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+                continue
+            self.state = HALF_OPEN
+            self.counters['probes'] += 1
+            try:
+                healthy = await self.probe() if self.probe else True
+            except Exception:
+                healthy = False
+            if healthy:
+                self._close()
+            else:
+                self._open()
+
+    async def acquire(self):
+        while True:
+            await self.wait_until_writable()
+            if self.in_flight < self.limit:
+                self.in_flight += 1
+                return
+            await self._changed.wait()
+
+    def release(self):
+        self.in_flight -= 1
+        self._notify()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one of the current in-flight write slots"""
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def scaled(self, size: int) -> int:
+        """Scale a configured batch size by the current share of the concurrency limit"""
+        return max(1, size * self.limit // self.max_limit)
+
+    def summary(self) -> Dict:
+        return {
+            'breaker_state': self.state,
+            'write_concurrency_limit': self.limit,
+            **self.counters,
+        }
+
+
+class PageWriteBuffer:
+    """Bounded queue of fetched pages written by one background task.
+
+    put() returns as soon as the page is queued, so fetching keeps going while writes are paused
+    by the circuit breaker, until `size` pages are waiting.
+    """
+
+    def __init__(self, write: Callable[..., Awaitable], size: int):
+        self.write = write
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, size))
+        self.worker: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            args = await self.queue.get()
+            try:
+                if args is None:
+                    return
+                await self.write(*args)
+            except Exception as e:
+                logger.error(f"Error writing buffered page: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def put(self, *args):
+        if self.worker is None:
+            self.worker = asyncio.create_task(self._run())
+        await self.queue.put(args)
+
+    async def close(self):
+        """Wait for every queued page to be written"""
+        if self.worker is None:
+            return
+        await self.queue.put(None)
+        await self.worker
+        self.worker = None
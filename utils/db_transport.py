@@ -0,0 +1,140 @@
+"""
+NaviCare Database Transport
+Pooled keep-alive httpx client for PostgREST traffic, with per-run connection reuse and pool-wait accounting
+"""
+
+import os
+import time
+import logging
+import importlib.util
+from dataclasses import dataclass
+from typing import Any, Dict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class DatabaseTransportProfile:
+    """Connection pool and protocol settings for the Supabase REST client"""
+    max_connections: int = 10
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 60.0  # seconds an idle connection stays in the pool
+    http2: bool = True  # multiplex requests over one connection when the server supports it
+    timeout: float = 120.0
+    pool_timeout: float = 30.0  # max seconds a request may wait for a free connection
+    write_coalesce_window: float = 0.0  # seconds single-row inserts wait to be merged; 0 disables
+    write_batch_size: int = 100  # max rows per coalesced insert
+
+    @classmethod
+    def from_env(cls, pool_size: int) -> 'DatabaseTransportProfile':
+        """Build a profile sized for `pool_size` concurrent writers, overridable via environment"""
+        pool_size = int(os.getenv('SUPABASE_HTTP_POOL_SIZE', str(pool_size)))
+        return cls(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=float(os.getenv('SUPABASE_KEEPALIVE_EXPIRY', '60')),
+            http2=os.getenv('SUPABASE_HTTP2', 'true').lower() not in ('0', 'false', 'no'),
+            timeout=float(os.getenv('SUPABASE_HTTP_TIMEOUT', '120')),
+            write_coalesce_window=float(os.getenv('SUPABASE_WRITE_COALESCE_MS', '5')) / 1000,
+            write_batch_size=int(os.getenv('SUPABASE_WRITE_BATCH_SIZE', '100')),
+        )
+
+
+class DatabaseTransportStats:
+    """Per-run PostgREST transport accounting collected through httpcore trace events"""
+
+    def __init__(self):
+        self.requests = 0
+        self.http2_requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+        self.pool_wait_seconds = 0.0
+        self.max_pool_wait_seconds = 0.0
+
+    def record_pool_wait(self, seconds: float):
+        self.pool_wait_seconds += seconds
+        self.max_pool_wait_seconds = max(self.max_pool_wait_seconds, seconds)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'requests': self.requests,
+            'http2_requests': self.http2_requests,
+            'connections_opened': self.connections_opened,
+            'requests_per_connection': round(self.requests / self.connections_opened, 1) if self.connections_opened else 0.0,
+            'tls_handshakes': self.tls_handshakes,
+            'pool_wait_seconds': round(self.pool_wait_seconds, 3),
+            'max_pool_wait_seconds': round(self.max_pool_wait_seconds, 3),
+        }
+
+
+class InstrumentedTransport(httpx.BaseTransport):
+    """Wraps an HTTPTransport and feeds its httpcore trace events into DatabaseTransportStats.
+
+    Pool wait is the time between handing a request to the pool and its first connection
+    event: opening a new connection, or sending headers on a reused/multiplexed one.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, stats: DatabaseTransportStats, health=None):
+        self.transport = transport
+        self.stats = stats
+        self.health = health
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        stats = self.stats
+        stats.requests += 1
+        queued_at = time.perf_counter()
+        state = {'assigned': False}
+        downstream_trace = request.extensions.get('trace')
+
+        def trace(event_name: str, info: Dict):
+            if event_name.endswith('.started') and not state['assigned']:
+                state['assigned'] = True
+                stats.record_pool_wait(time.perf_counter() - queued_at)
+            if event_name == 'connection.connect_tcp.started':
+                stats.connections_opened += 1
+            elif event_name == 'connection.start_tls.started':
+                stats.tls_handshakes += 1
+            elif event_name == 'http2.send_request_headers.started':
+                stats.http2_requests += 1
+            if downstream_trace:
+                downstream_trace(event_name, info)
+
+        request.extensions['trace'] = trace
+        if self.health is None:
+            return self.transport.handle_request(request)
+        # Latency and status feed the adaptive write limit and circuit breaker (utils/db_health.py)
+        try:
+            response = self.transport.handle_request(request)
+        except httpx.TransportError:
+            self.health.record(time.perf_counter() - queued_at, None)
+            raise
+        self.health.record(time.perf_counter() - queued_at, response.status_code)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+def create_http_client(profile: DatabaseTransportProfile, stats: DatabaseTransportStats, health=None) -> httpx.Client:
+    """Create the pooled client handed to supabase via ClientOptions(httpx_client=...).
+
+    PostgREST sets base_url and auth headers on it; HTTP/2 is used only when the h2 package is installed.
+    """
+    http2 = profile.http2
+    if http2 and importlib.util.find_spec('h2') is None:
+        logger.warning("HTTP/2 requested for Supabase but the h2 package is not installed; using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=profile.max_connections,
+        max_keepalive_connections=profile.max_keepalive_connections,
+        keepalive_expiry=profile.keepalive_expiry,
+    )
+    transport = httpx.HTTPTransport(http2=http2, limits=limits)
+    return httpx.Client(
+        transport=InstrumentedTransport(transport, stats, health),
+        timeout=httpx.Timeout(profile.timeout, pool=profile.pool_timeout),
+        follow_redirects=True,
+    )
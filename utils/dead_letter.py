@@ -0,0 +1,97 @@
+"""
+NaviCare Dead-Letter Queue
+Append-only JSON lines file of records and pages that failed processing, for targeted replay
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+RECORD = 'record'
+PAGE = 'page'
+
+
+def dead_letter_key(entry: Dict) -> str:
+    """Identity of a dead letter, used to carry attempt counts across replays"""
+    if entry.get('kind') == PAGE:
+        return f"{entry.get('source')}:page:{entry.get('page_url')}"
+    record = entry.get('record')
+    if isinstance(record, dict):
+        identity = record.get('id') or record.get('clinic_slug') or record.get('slug') \
+            or record.get('clinic_name') or record.get('name')
+    else:
+        identity = repr(record)[:200]
+    return f"{entry.get('source')}:record:{identity}"
+
+
+class DeadLetterQueue:
+    """Quarantine file for failed records and pages"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record_failure(self, source: str, record, error: Exception, attempts: int = 1):
+        """Quarantine a source record whose processing raised"""
+        self._append({
+            'kind': RECORD,
+            'source': source,
+            'error_class': type(error).__name__,
+            'error': str(error)[:1000],
+            'record': record,
+            'attempts': attempts,
+        })
+
+    def page_failure(self, source: str, page_url: str, page_number: Optional[int] = None,
+                     error_class: str = 'PageFetchFailed', error: str = '', attempts: int = 1):
+        """Quarantine a page that could not be fetched"""
+        self._append({
+            'kind': PAGE,
+            'source': source,
+            'error_class': error_class,
+            'error': error[:1000],
+            'page_url': page_url,
+            'page_number': page_number,
+            'attempts': attempts,
+        })
+
+    def load(self) -> List[Dict]:
+        """Read all quarantined entries (skipping corrupt lines)"""
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt dead letter at {self.path}:{line_number}")
+        return entries
+
+    def replace(self, entries: List[Dict]):
+        """Atomically replace the file contents with the given entries"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=str) + '\n')
+        os.replace(tmp_path, self.path)
+
+    def _append(self, entry: Dict):
+        entry['failed_at'] = datetime.now(timezone.utc).isoformat()
+        line = json.dumps(entry, default=str) + '\n'
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.count += 1
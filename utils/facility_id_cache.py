@@ -0,0 +1,60 @@
+"""
+NaviCare Facility ID Cache
+Persistent external-id -> facility_id map so repeat runs skip facility lookups
+"""
+
+import os
+import json
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class FacilityIdCache:
+    """JSON-file backed map of source external ids to NaviCare facility ids"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.ids: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+
+    def load(self) -> int:
+        """Load the cache file if present; returns the number of cached ids"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.ids = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable facility id cache {self.path}: {e}")
+            self.ids = {}
+        return len(self.ids)
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.ids, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    def get(self, external_id: Optional[str]) -> Optional[str]:
+        facility_id = self.ids.get(external_id) if external_id else None
+        if facility_id:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return facility_id
+
+    def put(self, external_id: Optional[str], facility_id: str):
+        if external_id and self.ids.get(external_id) != facility_id:
+            self.ids[external_id] = facility_id
+            self.dirty = True
+
+    def evict(self, external_id: Optional[str]):
+        if external_id and self.ids.pop(external_id, None) is not None:
+            self.dirty = True
@@ -0,0 +1,224 @@
+"""
+NaviCare Facility Mirror
+Local SQLite copy of facility identity (id, slug, name/location) and per-source content digests,
+kept in step with the facilities table by updated_at/created_at watermarks
+"""
+
+import os
+import sqlite3
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from utils.refresh_scheduler import record_digest
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS facilities (
+    id TEXT PRIMARY KEY,
+    slug TEXT,
+    name TEXT,
+    city TEXT,
+    province TEXT,
+    last_seen_at TEXT
+);
+CREATE INDEX IF NOT EXISTS facilities_slug_idx ON facilities (slug);
+CREATE INDEX IF NOT EXISTS facilities_name_city_province_idx ON facilities (name, city, province);
+CREATE TABLE IF NOT EXISTS digests (
+    facility_id TEXT NOT NULL,
+    source TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    written_at TEXT,
+    PRIMARY KEY (facility_id, source)
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    name TEXT PRIMARY KEY,
+    value TEXT,
+    last_id TEXT
+);
+"""
+
+IDENTITY_COLUMNS = "id, slug, name, city, province"
+
+
+def content_digest(data: Dict) -> str:
+    """Digest of what a source wrote for a facility, ignoring write timestamps"""
+    return record_digest({k: v for k, v in data.items() if k not in ('created_at', 'updated_at')})
+
+
+class FacilityMirror:
+    """SQLite mirror shared by the crawlers and import scripts for facility lookups and change detection.
+
+    Lookups follow SupabaseClient.find_existing_facility: slug first, then name + city + province.
+    sync() pulls rows changed since the last sync; rows written through this process are
+    recorded immediately with remember(). Digests are per (facility, source): a source whose
+    transformed data has the same digest as its last successful write can skip the write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.stats = {'mirror_hits': 0, 'mirror_misses': 0, 'mirror_synced': 0, 'unchanged_skipped': 0}
+
+    def open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Several crawlers may share the file; WAL lets readers run beside one writer
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+    async def sync(self, db_client, page_size: int = 1000) -> int:
+        """Pull facilities changed since the last sync; returns the number of rows applied.
+
+        Updated rows are followed by an (updated_at, id) keyset; rows that were inserted without
+        an updated_at are followed by created_at instead.
+        """
+        synced = 0
+        for column, unset in (('updated_at', None), ('created_at', 'updated_at')):
+            synced += self._sync_by(db_client, column, unset, page_size)
+        self.stats['mirror_synced'] += synced
+        if synced:
+            logger.info(f"Facility mirror synced {synced} rows into {self.path}")
+        return synced
+
+    def _sync_by(self, db_client, column: str, unset: Optional[str], page_size: int) -> int:
+        row = self.conn.execute("SELECT value, last_id FROM watermarks WHERE name = ?", (column,)).fetchone()
+        watermark, last_id = (row['value'], row['last_id']) if row else (None, None)
+        synced = 0
+        while True:
+            query = (
+                db_client.client.table("facilities")
+                .select(f"{IDENTITY_COLUMNS}, {column}")
+                .not_.is_(column, "null")
+                .order(column)
+                .order("id")
+                .limit(page_size)
+            )
+            if unset:
+                query = query.is_(unset, "null")
+            if watermark:
+                query = query.or_(f'{column}.gt."{watermark}",and({column}.eq."{watermark}",id.gt.{last_id})')
+            rows = query.execute().data or []
+            if not rows:
+                return synced
+
+            with self.conn:
+                self.conn.executemany(
+                    """INSERT INTO facilities (id, slug, name, city, province) VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT (id) DO UPDATE SET slug = excluded.slug, name = excluded.name,
+                           city = excluded.city, province = excluded.province""",
+                    [(r['id'], r.get('slug'), r.get('name'), r.get('city'), r.get('province')) for r in rows]
+                )
+                if column == 'updated_at':
+                    self._drop_outdated_digests(rows)
+                watermark, last_id = rows[-1][column], rows[-1]['id']
+                self.conn.execute(
+                    """INSERT INTO watermarks (name, value, last_id) VALUES (?, ?, ?)
+                       ON CONFLICT (name) DO UPDATE SET value = excluded.value, last_id = excluded.last_id""",
+                    (column, watermark, last_id)
+                )
+            synced += len(rows)
+            if len(rows) < page_size:
+                return synced
+
+    def _drop_outdated_digests(self, rows):
+        """Forget digests written before the row was last changed in the database (e.g. retired by the
+        sweep or edited by hand), so the next crawl diffs those facilities against the stored row"""
+        for row in rows:
+            written = self.conn.execute("SELECT source, written_at FROM digests WHERE facility_id = ?",
+                                        (row['id'],)).fetchall()
+            updated_at = datetime.fromisoformat(row['updated_at'])
+            for digest in written:
+                if datetime.fromisoformat(digest['written_at']) < updated_at:
+                    self.conn.execute("DELETE FROM digests WHERE facility_id = ? AND source = ?",
+                                      (row['id'], digest['source']))
+
+    def find(self, slug: Optional[str], name: Optional[str], city: Optional[str],
+             province: Optional[str]) -> Optional[Dict]:
+        """Mirrored identity of a facility by slug, then name + location; None if unknown"""
+        row = None
+        if slug:
+            row = self.conn.execute("SELECT * FROM facilities WHERE slug = ? LIMIT 1", (slug,)).fetchone()
+        if row is None and name:
+            row = self.conn.execute(
+                "SELECT * FROM facilities WHERE name = ? AND city IS ? AND province IS ? LIMIT 1",
+                (name, city, province)
+            ).fetchone()
+        if row is None:
+            self.stats['mirror_misses'] += 1
+            return None
+        self.stats['mirror_hits'] += 1
+        return dict(row)
+
+    def remember(self, facility_id: str, facility_data: Dict, source: Optional[str] = None,
+                 digest: Optional[str] = None):
+        """Record a facility this process just wrote, and the digest of what the source wrote"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.execute(
+                """INSERT INTO facilities (id, slug, name, city, province, last_seen_at) VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (id) DO UPDATE SET
+                       slug = coalesce(excluded.slug, facilities.slug),
+                       name = coalesce(excluded.name, facilities.name),
+                       city = coalesce(excluded.city, facilities.city),
+                       province = coalesce(excluded.province, facilities.province),
+                       last_seen_at = excluded.last_seen_at""",
+                (facility_id, facility_data.get('slug'), facility_data.get('name'),
+                 facility_data.get('city'), facility_data.get('province'), now)
+            )
+            if source and digest:
+                self.conn.execute(
+                    """INSERT INTO digests (facility_id, source, digest, written_at) VALUES (?, ?, ?, ?)
+                       ON CONFLICT (facility_id, source) DO UPDATE SET
+                           digest = excluded.digest, written_at = excluded.written_at""",
+                    (facility_id, source, digest, now)
+                )
+
+    def unchanged(self, facility_id: str, source: str, digest: str) -> bool:
+        """Whether the source's last write for this facility had the same digest; marks it seen"""
+        row = self.conn.execute(
+            "SELECT digest FROM digests WHERE facility_id = ? AND source = ?", (facility_id, source)
+        ).fetchone()
+        if row is None or row['digest'] != digest:
+            return False
+        with self.conn:
+            self.conn.execute("UPDATE facilities SET last_seen_at = ? WHERE id = ?",
+                              (datetime.now(timezone.utc).isoformat(), facility_id))
+        self.stats['unchanged_skipped'] += 1
+        return True
+
+    def forget(self, facility_id: str):
+        """Drop a facility the database no longer has"""
+        with self.conn:
+            self.conn.execute("DELETE FROM digests WHERE facility_id = ?", (facility_id,))
+            self.conn.execute("DELETE FROM facilities WHERE id = ?", (facility_id,))
+
+    def clear(self):
+        """Empty the mirror, e.g. after the facilities table was wiped"""
+        with self.conn:
+            self.conn.execute("DELETE FROM digests")
+            self.conn.execute("DELETE FROM facilities")
+            self.conn.execute("DELETE FROM watermarks")
+
+    def summary(self) -> Dict:
+        return dict(self.stats)
+
+
+def create_facility_mirror() -> Optional[FacilityMirror]:
+    """Open the mirror at FACILITY_MIRROR_PATH; None when it is not configured"""
+    path = os.getenv('FACILITY_MIRROR_PATH')
+    if not path:
+        return None
+    mirror = FacilityMirror(path)
+    mirror.open()
+    return mirror
@@ -0,0 +1,87 @@
+"""
+NaviCare Facility Sightings
+Records which facilities each crawl source returned, for retiring facilities it no longer lists
+(migrations/004_facility_sightings.sql)
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class SightingRecorder:
+    """Collects the facility ids a crawl sees and upserts them to facility_sightings once per page.
+
+    seen_at is taken from the crawler's clock, the same clock that sets the crawl start passed to
+    the sweep. Ids that could not be written stay pending and go out with the next flush.
+    """
+
+    def __init__(self, db_client, source: str):
+        self.db_client = db_client
+        self.source = source
+        self.pending: Dict[str, str] = {}
+        self.seen: Set[str] = set()
+        self.started_at = datetime.now(timezone.utc)
+
+    def saw(self, facility_id: Optional[str]):
+        if facility_id:
+            self.pending[facility_id] = datetime.now(timezone.utc).isoformat()
+            self.seen.add(facility_id)
+
+    async def flush(self) -> bool:
+        """Write pending sightings in one bulk upsert; False if they could not be written"""
+        if not self.pending:
+            return True
+        rows = [{'source': self.source, 'facility_id': facility_id, 'seen_at': seen_at}
+                for facility_id, seen_at in self.pending.items()]
+        try:
+            written, rejects = await self.db_client.bulk_write('facility_sightings', rows,
+                                                               on_conflict='source,facility_id')
+        except Exception as e:
+            logger.error(f"Error recording {len(rows)} {self.source} facility sightings: {e}")
+            return False
+        # Rejected rows reference facilities that no longer exist; there is nothing to retry
+        for reject in rejects:
+            logger.warning(f"Sighting rejected for facility {reject['row']['facility_id']}: {reject['error']}")
+        self.pending.clear()
+        return True
+
+
+async def sweep_after_crawl(crawler, max_fraction: float = 0.05, purge: bool = False,
+                            dry_run: bool = False) -> Optional[Dict]:
+    """Retire the facilities a complete crawl_all() did not see; None if the sweep did not run.
+
+    Skipped unless the crawl reached the last page without errors and every spooled page and
+    sighting has been written, so a partial crawl cannot retire facilities it simply missed.
+    """
+    sightings = crawler.sightings
+    if sightings is None:
+        logger.warning("Sweep skipped: the crawl did not record sightings (record_sightings)")
+        return None
+    if not crawler.crawl_complete:
+        logger.warning(f"Sweep skipped: the {sightings.source} crawl did not reach the last page")
+        return None
+    if crawler.stats['errors']:
+        logger.warning(f"Sweep skipped: the {sightings.source} crawl had {crawler.stats['errors']} errors")
+        return None
+    if crawler.spool and crawler.spool.pending():
+        logger.warning("Sweep skipped: spooled pages have not been written yet")
+        return None
+    if not await sightings.flush():
+        logger.warning("Sweep skipped: sightings could not be written")
+        return None
+
+    result = await crawler.db_client.retire_unseen_facilities(
+        sightings.source, sightings.started_at, max_fraction, purge, dry_run
+    )
+    if result is None:
+        return None
+    if result.get('refused'):
+        logger.error(f"Sweep refused: {result['unseen']} of {result['active']} active {sightings.source} "
+                     f"facilities were not seen (limit {max_fraction:.0%})")
+    else:
+        logger.info(f"Sweep retired {result['retired']} of {result['unseen']} unseen {sightings.source} "
+                    f"facilities ({result['purged']} child rows purged)")
+    return result
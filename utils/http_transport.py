@@ -0,0 +1,165 @@
+"""
+NaviCare HTTP Transport
+Tuned aiohttp session profile for source API crawling, with per-run connection and byte accounting
+"""
+
+import os
+import json
+import zlib
+import logging
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+import aiohttp
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; fall back to gzip/deflate only
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TransportProfile:
+    """Connection pool, DNS and compression settings for a crawler session"""
+    limit: int = 10
+    limit_per_host: int = 0  # 0 = no per-host cap beyond `limit`
+    ttl_dns_cache: int = 600  # seconds; aiohttp's default is 10
+    keepalive_timeout: float = 60.0  # seconds an idle connection stays in the pool
+    total_timeout: float = 30.0
+    connect_timeout: float = 10.0
+    compression: bool = True
+
+    @classmethod
+    def from_env(cls, limit: int) -> 'TransportProfile':
+        """Build a profile sized for `limit` concurrent requests, overridable via environment"""
+        return cls(
+            limit=int(os.getenv('CRAWLER_HTTP_POOL_SIZE', str(limit))),
+            ttl_dns_cache=int(os.getenv('CRAWLER_DNS_TTL', '600')),
+            keepalive_timeout=float(os.getenv('CRAWLER_KEEPALIVE_TIMEOUT', '60')),
+            total_timeout=float(os.getenv('CRAWLER_HTTP_TIMEOUT', '30')),
+            compression=os.getenv('CRAWLER_HTTP_COMPRESSION', 'true').lower() not in ('0', 'false', 'no'),
+        )
+
+    @property
+    def accept_encoding(self) -> str:
+        if not self.compression:
+            return 'identity'
+        return 'br, gzip, deflate' if brotli else 'gzip, deflate'
+
+
+class TransportStats:
+    """Per-run transport accounting collected through aiohttp tracing"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.tls_handshakes = 0
+        self.dns_cache_hits = 0
+        self.dns_cache_misses = 0
+        self.bytes_on_wire = 0
+        self.bytes_decoded = 0
+        self.encodings: Dict[str, int] = {}
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace = aiohttp.TraceConfig(trace_config_ctx_factory=lambda trace_request_ctx: SimpleNamespace())
+
+        async def on_request_start(session, ctx, params):
+            self.requests += 1
+            ctx.scheme = urlparse(str(params.url)).scheme
+
+        async def on_connection_create_end(session, ctx, params):
+            self.connections_opened += 1
+            # aiohttp has no TLS hook; every new connection to an https URL performs a handshake
+            if getattr(ctx, 'scheme', None) == 'https':
+                self.tls_handshakes += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            self.connections_reused += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            self.dns_cache_hits += 1
+
+        async def on_dns_cache_miss(session, ctx, params):
+            self.dns_cache_misses += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace.on_dns_cache_miss.append(on_dns_cache_miss)
+        return trace
+
+    def summary(self) -> Dict[str, Any]:
+        saved = self.bytes_decoded - self.bytes_on_wire
+        return {
+            'requests': self.requests,
+            'connections_opened': self.connections_opened,
+            'connections_reused': self.connections_reused,
+            'tls_handshakes': self.tls_handshakes,
+            'dns_cache_hits': self.dns_cache_hits,
+            'dns_cache_misses': self.dns_cache_misses,
+            'bytes_on_wire': self.bytes_on_wire,
+            'bytes_decoded': self.bytes_decoded,
+            'compression_saved_pct': round(100 * saved / self.bytes_decoded, 1) if self.bytes_decoded else 0.0,
+            'encodings': dict(self.encodings),
+        }
+
+
+def create_session(profile: TransportProfile, stats: TransportStats) -> aiohttp.ClientSession:
+    """Create a session with a tuned connector.
+
+    Responses are not decompressed by aiohttp so read_json can count bytes on the wire.
+    """
+    connector = aiohttp.TCPConnector(
+        limit=profile.limit,
+        limit_per_host=profile.limit_per_host,
+        ttl_dns_cache=profile.ttl_dns_cache,
+        use_dns_cache=True,
+        keepalive_timeout=profile.keepalive_timeout,
+    )
+    timeout = aiohttp.ClientTimeout(total=profile.total_timeout, sock_connect=profile.connect_timeout)
+    return aiohttp.ClientSession(
+        timeout=timeout,
+        connector=connector,
+        headers={'Accept-Encoding': profile.accept_encoding},
+        auto_decompress=False,
+        trace_configs=[stats.trace_config()],
+    )
+
+
+def decode_body(body: bytes, content_encoding: Optional[str]) -> bytes:
+    """Decode a response body according to its Content-Encoding"""
+    encoding = (content_encoding or '').strip().lower()
+    if not encoding or encoding == 'identity':
+        return body
+    if encoding == 'gzip':
+        return zlib.decompress(body, 16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)  # raw deflate without zlib header
+    if encoding == 'br':
+        if brotli is None:
+            raise ValueError("Received a Brotli encoded response but the Brotli package is not installed")
+        return brotli.decompress(body)
+    raise ValueError(f"Unsupported Content-Encoding: {encoding}")
+
+
+async def read_json(response: aiohttp.ClientResponse, stats: TransportStats) -> Any:
+    """Read, decompress and parse a JSON response, recording wire and decoded sizes"""
+    body = await response.read()
+    content_encoding = response.headers.get('Content-Encoding')
+    decoded = decode_body(body, content_encoding)
+
+    stats.bytes_on_wire += len(body)
+    stats.bytes_decoded += len(decoded)
+    encoding_key = (content_encoding or 'identity').lower()
+    stats.encodings[encoding_key] = stats.encodings.get(encoding_key, 0) + 1
+
+    return json.loads(decoded)
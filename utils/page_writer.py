@@ -0,0 +1,126 @@
+"""
+NaviCare Page Child-Table Writer
+Collects booking channels, service offerings and operating hours for a page of records
+and writes each table with one bulk upsert plus one bulk delete of rows that disappeared
+"""
+
+import logging
+from typing import Dict, List, Optional
+
+from utils.supabase_client import SupabaseClient
+
+logger = logging.getLogger(__name__)
+
+# Natural keys; a row is upserted on the first key whose columns it carries
+BOOKING_CHANNEL_KEYS = [('facility_id', 'url'), ('facility_id', 'phone'), ('facility_id', 'email')]
+SERVICE_OFFERING_KEYS = [('facility_id', 'service_id')]
+FACILITY_HOURS_KEYS = [('facility_id', 'weekday', 'slot')]
+
+
+class RowRejectedError(Exception):
+    """A child row the database rejected for its data while the rest of the page was written"""
+
+
+class PageChildWriter:
+    """Page-scoped buffer of child rows, flushed once the page's facilities are upserted"""
+
+    def __init__(self, db_client: SupabaseClient):
+        self.db_client = db_client
+        self.channel_facilities: List[str] = []
+        self.offering_facilities: List[str] = []
+        self.hours_facilities: List[str] = []
+        self.booking_channels: List[Dict] = []
+        self.service_offerings: List[Dict] = []
+        self.facility_hours: List[Dict] = []
+        # Source record per facility, so rejected rows can be traced back for dead-lettering
+        self.records: Dict[str, Dict] = {}
+        self.rejects: List[Dict] = []
+
+    def add_facility(self, facility_id: str, booking_channels: List[Dict],
+                     service_offerings: Optional[List[Dict]] = None,
+                     hours: Optional[List[Dict]] = None,
+                     record: Optional[Dict] = None):
+        """Queue the child rows of one facility.
+
+        Passing None for service_offerings or hours leaves that table untouched for the
+        facility; an empty list removes its existing rows. record is the source record the
+        rows came from.
+        """
+        if record is not None:
+            self.records[facility_id] = record
+        self.channel_facilities.append(facility_id)
+        self.booking_channels.extend(booking_channels)
+        if service_offerings is not None:
+            self.offering_facilities.append(facility_id)
+            self.service_offerings.extend(service_offerings)
+        if hours is not None:
+            self.hours_facilities.append(facility_id)
+            self.facility_hours.extend(SupabaseClient._sanitize_hours(facility_id, hours))
+
+    async def _resolve_service_offerings(self) -> List[Dict]:
+        """Replace service_slug with service_id, creating services that do not exist yet"""
+        slugs = list(dict.fromkeys(offering['service_slug'] for offering in self.service_offerings))
+        service_ids = await self.db_client.get_service_ids_by_slugs(slugs)
+
+        resolved = []
+        for offering in self.service_offerings:
+            slug = offering['service_slug']
+            if slug not in service_ids:
+                service_id = await self.db_client.create_service({
+                    'slug': slug,
+                    'display_name': offering.get('display_name', ''),
+                    'category': offering.get('workflow_type', '')
+                })
+                if not service_id:
+                    logger.warning(f"Failed to create service for slug: {slug}")
+                    continue
+                service_ids[slug] = service_id
+
+            offering_data = {k: v for k, v in offering.items() if k not in ('service_slug', 'display_name', 'workflow_type')}
+            offering_data['service_id'] = service_ids[slug]
+            resolved.append(offering_data)
+        return resolved
+
+    def _count_written(self, rows: List[Dict], rejects: Optional[List[Dict]]) -> Optional[int]:
+        if rejects is None:
+            return None
+        self.rejects.extend(rejects)
+        return len(rows) - len(rejects)
+
+    async def flush(self) -> Dict[str, Optional[int]]:
+        """Write all queued rows; returns rows written per table, None for tables that failed.
+
+        Rows rejected for their data are left out of the counts and collected in self.rejects.
+        """
+        written: Dict[str, Optional[int]] = {}
+
+        if self.channel_facilities:
+            rejects = await self.db_client.sync_child_rows_bulk(
+                "facility_booking_channels", self.channel_facilities, self.booking_channels,
+                BOOKING_CHANNEL_KEYS, ('id',)
+            )
+            written['booking_channels'] = self._count_written(self.booking_channels, rejects)
+
+        if self.offering_facilities:
+            offerings = await self._resolve_service_offerings()
+            rejects = await self.db_client.sync_child_rows_bulk(
+                "facility_service_offerings", self.offering_facilities, offerings,
+                SERVICE_OFFERING_KEYS, ('facility_id', 'service_id')
+            )
+            written['service_offerings'] = self._count_written(offerings, rejects)
+
+        if self.hours_facilities:
+            rejects = await self.db_client.sync_child_rows_bulk(
+                "facility_hours", self.hours_facilities, self.facility_hours,
+                FACILITY_HOURS_KEYS, ('facility_id', 'weekday', 'slot')
+            )
+            written['facility_hours'] = self._count_written(self.facility_hours, rejects)
+
+        return written
+
+    def rejects_by_facility(self) -> Dict[str, List[Dict]]:
+        """Group rejects by facility: facility id -> rejects of its rows"""
+        by_facility: Dict[str, List[Dict]] = {}
+        for reject in self.rejects:
+            by_facility.setdefault(reject['row'].get('facility_id'), []).append(reject)
+        return by_facility
@@ -0,0 +1,170 @@
+"""
+NaviCare Refresh Scheduler
+Staleness-priority scheduling of page refreshes with adaptive intervals and a request budget
+"""
+
+import json
+import time
+import heapq
+import asyncio
+import hashlib
+import logging
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RefreshProfile:
+    """Refresh interval bounds (seconds) for one source"""
+    base_interval: float
+    min_interval: float
+    max_interval: float
+
+
+# Bookable clinics publish availability that changes through the day; labs and
+# pharmacies only change address/hours data, so they start slow and stay slow.
+DEFAULT_PROFILES: Dict[str, RefreshProfile] = {
+    'clinic': RefreshProfile(base_interval=3600, min_interval=900, max_interval=86400),
+    'lab': RefreshProfile(base_interval=86400, min_interval=21600, max_interval=7 * 86400),
+    'pharmacy': RefreshProfile(base_interval=3 * 86400, min_interval=86400, max_interval=14 * 86400),
+}
+
+
+@dataclass(order=True)
+class RefreshTarget:
+    """A source page due for refresh at due_at"""
+    due_at: float
+    source: str = field(compare=False)
+    page: int = field(compare=False)
+    interval: float = field(compare=False)
+    last_refreshed_at: Optional[float] = field(default=None, compare=False)
+    refreshes: int = field(default=0, compare=False)
+    changes: int = field(default=0, compare=False)
+
+
+class RefreshScheduler:
+    """Priority queue of pages ordered by when they become stale.
+
+    A page's interval halves when a refresh finds changed records and grows by
+    half when nothing changed, bounded by the source's RefreshProfile.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, RefreshProfile]] = None):
+        self.profiles = profiles or DEFAULT_PROFILES
+        self._heap: List[RefreshTarget] = []
+        self._pages: Dict[tuple, RefreshTarget] = {}
+
+    def __len__(self) -> int:
+        return len(self._pages)
+
+    def add(self, source: str, page: int, due_at: Optional[float] = None) -> bool:
+        """Track a page; new pages are due immediately unless due_at is given"""
+        if (source, page) in self._pages:
+            return False
+        target = RefreshTarget(
+            due_at=time.time() if due_at is None else due_at,
+            source=source,
+            page=page,
+            interval=self.profiles[source].base_interval
+        )
+        self._push(target)
+        return True
+
+    def sync_pages(self, source: str, total_pages: int):
+        """Add newly appeared pages and stop tracking pages past total_pages"""
+        for page in range(1, total_pages + 1):
+            self.add(source, page)
+        for key in [key for key in self._pages if key[0] == source and key[1] > total_pages]:
+            del self._pages[key]
+
+    def pop_due(self, now: Optional[float] = None) -> Optional[RefreshTarget]:
+        """Return the most overdue page, or None if nothing is due yet"""
+        now = time.time() if now is None else now
+        while self._heap:
+            target = self._heap[0]
+            if self._pages.get((target.source, target.page)) is not target:
+                heapq.heappop(self._heap)  # stale heap entry
+                continue
+            if target.due_at > now:
+                return None
+            heapq.heappop(self._heap)
+            del self._pages[(target.source, target.page)]
+            return target
+        return None
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        now = time.time() if now is None else now
+        live = [t.due_at for t in self._heap if self._pages.get((t.source, t.page)) is t]
+        return max(0.0, min(live) - now) if live else None
+
+    def reschedule(self, target: RefreshTarget, changed: bool, failed: bool = False,
+                   now: Optional[float] = None):
+        """Put a refreshed page back with an interval adapted to its observed change rate"""
+        now = time.time() if now is None else now
+        profile = self.profiles[target.source]
+
+        if failed:
+            # Retry soon without learning anything about the change rate
+            target.due_at = now + profile.min_interval
+        else:
+            target.refreshes += 1
+            if changed:
+                target.changes += 1
+                target.interval = max(profile.min_interval, target.interval / 2)
+            else:
+                target.interval = min(profile.max_interval, target.interval * 1.5)
+            target.last_refreshed_at = now
+            target.due_at = now + target.interval
+
+        self._push(target)
+
+    def to_dict(self) -> Dict:
+        return {'targets': [asdict(target) for target in self._pages.values()]}
+
+    def load_dict(self, state: Dict, sources: Optional[Iterable[str]] = None):
+        """Restore saved targets, keeping only those of the given sources when sources is set"""
+        sources = set(self.profiles if sources is None else sources) & set(self.profiles)
+        for data in state.get('targets', []):
+            if data.get('source') in sources:
+                self._push(RefreshTarget(**data))
+
+    def _push(self, target: RefreshTarget):
+        self._pages[(target.source, target.page)] = target
+        heapq.heappush(self._heap, target)
+
+
+class RequestBudget:
+    """Token bucket limiting source API requests per minute"""
+
+    def __init__(self, requests_per_minute: float):
+        self.rate = requests_per_minute / 60.0
+        self.capacity = max(1.0, requests_per_minute / 6)  # allow ~10s of burst
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.spent = 0
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self.spent += 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def record_key(record: Dict) -> Optional[str]:
+    """Stable identity of a source record across pages"""
+    if not isinstance(record, dict):
+        return None
+    key = record.get('id') or record.get('clinic_slug') or record.get('slug')
+    return str(key) if key is not None else None
+
+
+def record_digest(record: Dict) -> str:
+    """Content digest used to skip records that have not changed since the last refresh"""
+    return hashlib.sha1(json.dumps(record, sort_keys=True, default=str).encode('utf-8')).hexdigest()
@@ -0,0 +1,51 @@
+"""
+NaviCare Facility Search Documents
+Rebuilds the denormalized search document of every facility a crawl wrote, once at the end of the
+run (migrations/008_facility_search_documents.sql)
+"""
+
+import logging
+from datetime import datetime, timezone
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class SearchDocumentRefresher:
+    """Collects the facility ids a crawl writes and refreshes their search documents in chunks.
+
+    The documents are built in the database, which only rewrites the ones whose contents changed.
+    A final pass also picks up facilities other writers updated since the crawl started (e.g. the
+    retirement sweep). Ids whose chunk could not be refreshed stay pending for the next refresh.
+    """
+
+    def __init__(self, db_client):
+        self.db_client = db_client
+        self.pending: Set[str] = set()
+        self.started_at = datetime.now(timezone.utc)
+
+    def touched(self, facility_id: Optional[str]):
+        if facility_id:
+            self.pending.add(facility_id)
+
+    async def refresh(self, chunk_size: int = 500) -> Optional[int]:
+        """Refresh the documents of touched facilities; the number rewritten, or None on failure"""
+        facility_ids = sorted(self.pending)
+        written = 0
+        failed = False
+        for start in range(0, len(facility_ids), chunk_size):
+            chunk = facility_ids[start:start + chunk_size]
+            count = await self.db_client.refresh_search_documents(chunk)
+            if count is None:
+                failed = True
+                continue
+            written += count
+            self.pending.difference_update(chunk)
+
+        count = await self.db_client.refresh_search_documents([], changed_since=self.started_at)
+        if count is None or failed:
+            logger.error(f"Search documents: {len(self.pending)} facilities could not be refreshed")
+            return None
+        written += count
+        logger.info(f"Search documents: {written} rewritten for {len(facility_ids)} touched facilities")
+        return written
@@ -0,0 +1,128 @@
+"""
+NaviCare Segment Planner
+Turns measured per-page crawl cost into balanced page ranges that fit a wall-clock budget
+"""
+
+import os
+import json
+import math
+import time
+import logging
+from statistics import median
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def append_page_costs(path: str, source: str, page_costs: List[Dict]) -> int:
+    """Append per-page cost measurements from a crawl run to a JSON lines log"""
+    if not page_costs:
+        return 0
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    recorded_at = time.time()
+    with open(path, 'a', encoding='utf-8') as f:
+        for cost in page_costs:
+            f.write(json.dumps({'source': source, 'recorded_at': recorded_at, **cost}) + '\n')
+    return len(page_costs)
+
+
+def load_page_costs(path: str, source: str, max_samples: int = 5,
+                    recorded_before: Optional[float] = None) -> Dict[int, float]:
+    """Load the median of the most recent measurements per page for a source.
+
+    recorded_before (epoch seconds) ignores newer measurements so that segments
+    planned on different days of the same crawl cycle agree on their boundaries.
+    """
+    samples: Dict[int, List[float]] = {}
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get('source') != source or entry.get('page') is None or entry.get('seconds') is None:
+                continue
+            if recorded_before is not None and entry.get('recorded_at', 0) >= recorded_before:
+                continue
+            samples.setdefault(int(entry['page']), []).append(float(entry['seconds']))
+
+    return {page: median(values[-max_samples:]) for page, values in samples.items()}
+
+
+def estimate_page_costs(observed: Dict[int, float], total_pages: int, default_seconds: float) -> List[float]:
+    """Return a cost estimate for pages 1..total_pages.
+
+    Pages that were never measured fall back to the median of measured pages,
+    or default_seconds when there is no history at all.
+    """
+    fallback = median(observed.values()) if observed else default_seconds
+    return [observed.get(page, fallback) for page in range(1, total_pages + 1)]
+
+
+def _greedy_partition(costs: List[float], capacity: float) -> List[tuple]:
+    """Split costs into contiguous (start_index, end_index) parts no heavier than capacity"""
+    parts = []
+    start = 0
+    load = 0.0
+    for index, cost in enumerate(costs):
+        if index > start and load + cost > capacity:
+            parts.append((start, index - 1))
+            start = index
+            load = 0.0
+        load += cost
+    if costs:
+        parts.append((start, len(costs) - 1))
+    return parts
+
+
+def plan_segments(page_costs: List[float], target_seconds: float,
+                  segments: Optional[int] = None, setup_seconds: float = 0.0) -> List[Dict]:
+    """Plan contiguous page ranges with balanced predicted runtime.
+
+    With segments=None the smallest number of segments that fits target_seconds is used;
+    otherwise exactly that many segments (or fewer if there are fewer pages) are planned
+    and each one reports whether it fits the target.
+    """
+    if not page_costs:
+        return []
+
+    budget = target_seconds - setup_seconds
+    if budget <= 0:
+        raise ValueError("target_seconds must be larger than setup_seconds")
+
+    total_cost = sum(page_costs)
+    if segments is None:
+        segments = max(1, math.ceil(total_cost / budget))
+    segments = max(1, min(segments, len(page_costs)))
+
+    # Binary search the smallest per-segment capacity that needs at most `segments` parts
+    low = max(page_costs)
+    high = max(total_cost, low)
+    for _ in range(60):
+        middle = (low + high) / 2
+        if len(_greedy_partition(page_costs, middle)) <= segments:
+            high = middle
+        else:
+            low = middle
+
+    plan = []
+    for number, (start, end) in enumerate(_greedy_partition(page_costs, high), start=1):
+        predicted = setup_seconds + sum(page_costs[start:end + 1])
+        plan.append({
+            'segment': number,
+            'start_page': start + 1,
+            'end_page': end + 1,
+            'predicted_seconds': round(predicted, 1),
+            'fits_target': predicted <= target_seconds
+        })
+    return plan
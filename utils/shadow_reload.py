@@ -0,0 +1,430 @@
+"""
+NaviCare Shadow Reload
+Full reloads built off to the side: facility child tables are bulk-loaded into unindexed shadow
+copies and swapped in with the facility changes in one transaction
+"""
+
+import os
+import logging
+from typing import Dict, List, Optional
+
+from utils.copy_loader import CHILD_TABLES, CopyLoader, _ident
+from utils.write_spool import drain_spool
+
+logger = logging.getLogger(__name__)
+
+# Child tables rebuilt and swapped by a reload (bundle key -> table)
+SWAPPED_TABLES = {'specialties': 'facility_specialties', **CHILD_TABLES}
+SHADOW_SUFFIX = '_shadow'
+# Staged facility rows, merged into the live facilities table at swap time
+FACILITY_SHADOW = 'facilities_shadow'
+# (facility_id, bundle key) pairs loaded by this reload; all other live child rows are carried over
+SCOPE_TABLE = 'facility_reload_scope'
+# Advisory lock (per schema) held from prepare to swap or discard; the shadow names are shared by
+# every source, so a second reload would otherwise drop the first one's half-built shadows
+RELOAD_LOCK = 'navicare_shadow_reload'
+
+
+def _count(status: str) -> int:
+    """Row count of an asyncpg command status such as 'INSERT 0 12'"""
+    return int(status.split()[-1])
+
+
+class ShadowLoader(CopyLoader):
+    """CopyLoader whose child rows go to shadow tables until swap().
+
+    facilities is not swapped, since other tables (favorites, sightings, tags) reference its ids;
+    identities resolve against the live table first, new facilities get their ids in
+    facilities_shadow, and the staged columns are merged into facilities inside the swap
+    transaction. Child tables are created LIKE the live ones without indexes; swap() copies over
+    the live rows of facilities the reload did not cover, builds the indexes, constraints,
+    triggers, policies and grants of the live table, then replaces it by rename.
+
+    After swap() or discard() the loader merges into the live tables like CopyLoader, so pages
+    written late (e.g. from the write spool) still land. Only one reload per schema can be built
+    at a time; open() fails while another one holds the reload lock.
+    """
+
+    def __init__(self, dsn: str):
+        super().__init__(dsn)
+        self.building = False
+        self.facility_columns = set()
+        self.identity_columns: Dict[str, List] = {}
+        self.lock_conn = None
+
+    async def open(self):
+        await super().open()
+        try:
+            await self._lock()
+            async with self.pool.acquire() as conn:
+                await self._prepare(conn)
+        except Exception:
+            await self._unlock()
+            await super().close()
+            raise
+
+    async def close(self):
+        if self.building:
+            logger.warning("Shadow reload was not swapped in; discarding the shadow tables")
+            await self.discard()
+        await self._unlock()
+        await super().close()
+
+    async def _lock(self):
+        """Take the reload lock on a dedicated session, which holds it until _unlock() or disconnect"""
+        import asyncpg
+
+        self.lock_conn = await asyncpg.connect(self.dsn)
+        locked = await self.lock_conn.fetchval(
+            "SELECT pg_try_advisory_lock(hashtext($1 || ':' || current_schema()))", RELOAD_LOCK
+        )
+        if not locked:
+            raise RuntimeError("Shadow reload: another reload is being built in this database")
+
+    async def _unlock(self):
+        if self.lock_conn:
+            # Closing the session releases the advisory lock
+            await self.lock_conn.close()
+            self.lock_conn = None
+
+    async def _prepare(self, conn):
+        for table in SWAPPED_TABLES.values():
+            dependents = await conn.fetch(
+                """
+                SELECT DISTINCT v.oid::regclass::text AS name
+                FROM pg_depend d
+                JOIN pg_rewrite r ON r.oid = d.objid AND d.classid = 'pg_rewrite'::regclass
+                JOIN pg_class v ON v.oid = r.ev_class
+                WHERE d.refobjid = $1::regclass AND v.oid <> $1::regclass
+                UNION
+                SELECT conrelid::regclass::text FROM pg_constraint
+                WHERE confrelid = $1::regclass AND conrelid <> $1::regclass
+                """,
+                table
+            )
+            if dependents:
+                names = ', '.join(row['name'] for row in dependents)
+                raise RuntimeError(f"Shadow reload: {table} cannot be swapped, {names} depend on it")
+
+        await self._drop_shadows(conn)
+        facility_id = self.column_types['facilities']['id']
+        await conn.execute(f"""
+            CREATE UNLOGGED TABLE {FACILITY_SHADOW} (LIKE facilities INCLUDING DEFAULTS);
+            CREATE INDEX ON {FACILITY_SHADOW} (id);
+            CREATE INDEX ON {FACILITY_SHADOW} (slug);
+            CREATE INDEX ON {FACILITY_SHADOW} (name, city, province);
+            CREATE UNLOGGED TABLE {SCOPE_TABLE} (facility_id {facility_id}, scope text, PRIMARY KEY (facility_id, scope))
+        """)
+        for table in SWAPPED_TABLES.values():
+            shadow = table + SHADOW_SUFFIX
+            await conn.execute(f"CREATE TABLE {shadow} (LIKE {table} INCLUDING DEFAULTS)")
+            # Identity columns draw from the live sequence until the swap, so carried-over ids never clash
+            self.identity_columns[table] = await conn.fetch(
+                """
+                SELECT attname, attidentity, pg_get_serial_sequence($1, attname) AS sequence
+                FROM pg_attribute WHERE attrelid = $1::regclass AND attidentity <> ''
+                """,
+                table
+            )
+            for column in self.identity_columns[table]:
+                await conn.execute(f"ALTER TABLE {shadow} ALTER COLUMN {_ident(column['attname'])} "
+                                   f"SET DEFAULT nextval('{column['sequence']}'::regclass)")
+        self.building = True
+        self.facility_columns = set()
+        logger.info(f"Shadow reload prepared for {', '.join(SWAPPED_TABLES.values())}")
+
+    async def _drop_shadows(self, conn):
+        tables = [FACILITY_SHADOW, SCOPE_TABLE] + [table + SHADOW_SUFFIX for table in SWAPPED_TABLES.values()]
+        await conn.execute(f"DROP TABLE IF EXISTS {', '.join(tables)}")
+
+    async def discard(self):
+        """Drop the shadow tables without touching the live ones"""
+        self.building = False
+        async with self.pool.acquire() as conn:
+            await self._drop_shadows(conn)
+        await self._unlock()
+
+    def _target(self, table: str) -> str:
+        if self.building and table in SWAPPED_TABLES.values():
+            return table + SHADOW_SUFFIX
+        return table
+
+    async def _merge_facilities(self, conn, bundles: List[tuple], update_columns: Optional[List[str]]):
+        """Stage facility rows in facilities_shadow; update_columns is not applied to reloads"""
+        if not self.building:
+            return await super()._merge_facilities(conn, bundles, update_columns)
+
+        columns = await self._stage_facilities(conn, bundles)
+        self.facility_columns.update(columns)
+
+        # Live facilities first, then facilities created earlier in this reload
+        for table in ('facilities', FACILITY_SHADOW):
+            await conn.execute(f"""
+                UPDATE stage_facilities s SET facility_id = f.id
+                FROM {table} f
+                WHERE s.facility_id IS NULL AND f.slug = s.slug
+            """)
+            await conn.execute(f"""
+                UPDATE stage_facilities s SET facility_id = f.id
+                FROM {table} f
+                WHERE s.facility_id IS NULL AND f.name = s.name AND f.city = s.city AND f.province = s.province
+            """)
+
+        names = ", ".join(_ident(column) for column in columns)
+        values = ", ".join(self._cast('facilities', column, 's') for column in columns)
+        created_at = ", created_at" if 'created_at' in self.column_types['facilities'] else ""
+        created_now = ", now()" if created_at else ""
+        await conn.execute(f"DELETE FROM {FACILITY_SHADOW} t USING stage_facilities s WHERE t.id = s.facility_id")
+        await conn.execute(f"""
+            INSERT INTO {FACILITY_SHADOW} (id, {names}{created_at})
+            SELECT DISTINCT ON (s.facility_id) s.facility_id, {values}{created_now}
+            FROM stage_facilities s
+            WHERE s.facility_id IS NOT NULL
+            ORDER BY s.facility_id, s.stage_idx DESC
+        """)
+        await self._insert_fresh(conn, FACILITY_SHADOW, columns)
+        await conn.execute("""
+            UPDATE stage_facilities s SET created = NOT EXISTS (SELECT 1 FROM facilities f WHERE f.id = s.facility_id)
+        """)
+
+    async def _clear_children(self, conn, table: str, key: str):
+        if not self.building:
+            return await super()._clear_children(conn, table, key)
+        # Shadow tables have no indexes yet: only delete when a facility repeats within the reload
+        repeated = await conn.fetchval(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM stage_latest s JOIN {SCOPE_TABLE} r ON r.facility_id = s.facility_id AND r.scope = $1
+                WHERE $1 = ANY (s.scope)
+            )
+        """, key)
+        if repeated:
+            await super()._clear_children(conn, table, key)
+        await conn.execute(f"""
+            INSERT INTO {SCOPE_TABLE} (facility_id, scope)
+            SELECT facility_id, $1 FROM stage_latest WHERE $1 = ANY (scope)
+            ON CONFLICT DO NOTHING
+        """, key)
+
+    async def swap(self) -> Optional[Dict]:
+        """Apply the reload in one transaction; returns counts, or None if it failed (nothing changes).
+
+        Writers to facilities and the child tables wait for the swap; readers see the old tables
+        until it commits and the new ones afterwards.
+        """
+        if not self.building:
+            logger.error("Shadow reload swap requested, but no reload is being built")
+            return None
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    tables = list(SWAPPED_TABLES.values())
+                    await conn.execute(f"LOCK TABLE facilities, {', '.join(tables)} IN EXCLUSIVE MODE")
+                    result = await self._apply_facilities(conn)
+                    renames = {}
+                    for key, table in SWAPPED_TABLES.items():
+                        result['carried_over'] += await self._carry_over(conn, key, table)
+                        result['child_rows'] += await conn.fetchval(f"SELECT count(*) FROM {table}{SHADOW_SUFFIX}")
+                        renames[table] = await self._build_like(conn, table)
+                    for table in tables:
+                        await self._replace(conn, table, *renames[table])
+                    await conn.execute(f"DROP TABLE {FACILITY_SHADOW}, {SCOPE_TABLE}")
+        except Exception as e:
+            logger.error(f"Shadow reload swap failed, live tables unchanged: {e}")
+            return None
+        self.building = False
+        await self._unlock()
+        logger.info(f"Shadow reload swapped in: {result}")
+        return result
+
+    async def _apply_facilities(self, conn) -> Dict:
+        facility_types = self.column_types['facilities']
+        columns = [column for column in facility_types if column in self.facility_columns]
+        result = {'facilities_created': 0, 'facilities_updated': 0, 'child_rows': 0, 'carried_over': 0}
+        if not columns:
+            return result
+
+        names = ", ".join(_ident(column) for column in columns)
+        assignments = [f"{_ident(column)} = s.{_ident(column)}" for column in columns]
+        if 'updated_at' in facility_types:
+            assignments.append("updated_at = now()")
+        stored = ", ".join(f"f.{_ident(column)}" for column in columns)
+        staged = ", ".join(f"s.{_ident(column)}" for column in columns)
+        result['facilities_updated'] = _count(await conn.execute(f"""
+            UPDATE facilities f SET {', '.join(assignments)}
+            FROM {FACILITY_SHADOW} s
+            WHERE f.id = s.id AND ROW({stored}) IS DISTINCT FROM ROW({staged})
+        """))
+        created_at = ", created_at" if 'created_at' in facility_types else ""
+        created_staged = ", s.created_at" if created_at else ""
+        result['facilities_created'] = _count(await conn.execute(f"""
+            INSERT INTO facilities (id, {names}{created_at})
+            SELECT s.id, {staged}{created_staged}
+            FROM {FACILITY_SHADOW} s
+            WHERE NOT EXISTS (SELECT 1 FROM facilities f WHERE f.id = s.id)
+        """))
+        return result
+
+    async def _carry_over(self, conn, key: str, table: str) -> int:
+        """Copy live rows of facilities this reload did not load (other sources, failed records)"""
+        return _count(await conn.execute(f"""
+            INSERT INTO {table}{SHADOW_SUFFIX}
+            SELECT * FROM {table} t
+            WHERE NOT EXISTS (SELECT 1 FROM {SCOPE_TABLE} r WHERE r.facility_id = t.facility_id AND r.scope = $1)
+        """, key))
+
+    async def _build_like(self, conn, table: str) -> tuple:
+        """Give the loaded shadow table the live table's indexes, constraints, triggers, row security,
+        grants and sequences; returns the (index, constraint) renames to apply after the swap"""
+        shadow = table + SHADOW_SUFFIX
+        index_renames, constraint_renames = [], []
+
+        indexes = await conn.fetch(
+            """
+            SELECT i.relname AS name, x.indisunique AS is_unique, pg_get_indexdef(x.indexrelid) AS definition,
+                   CASE WHEN x.indexprs IS NULL AND x.indpred IS NULL THEN
+                       ARRAY(SELECT attname FROM pg_attribute WHERE attrelid = x.indrelid AND attnum = ANY (x.indkey))
+                   END AS columns
+            FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+            WHERE x.indrelid = $1::regclass
+              AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid AND c.conrelid = x.indrelid)
+            """,
+            table
+        )
+        constraints = await conn.fetch(
+            """
+            SELECT conname, contype, pg_get_constraintdef(oid) AS definition,
+                   ARRAY(SELECT attname FROM pg_attribute WHERE attrelid = conrelid AND attnum = ANY (conkey)) AS columns
+            FROM pg_constraint
+            WHERE conrelid = $1::regclass AND contype IN ('p', 'u', 'f', 'c', 'x')
+            ORDER BY contype = 'f', conname
+            """,
+            table
+        )
+        # The live tables skip duplicate child rows with ON CONFLICT DO NOTHING; keep the first one here too
+        keys = [index['columns'] for index in indexes if index['is_unique'] and index['columns']]
+        keys += [constraint['columns'] for constraint in constraints if constraint['contype'] in ('p', 'u')]
+        for columns in keys:
+            matches = " AND ".join(f"a.{_ident(column)} = b.{_ident(column)}" for column in columns)
+            await conn.execute(f"DELETE FROM {shadow} a USING {shadow} b WHERE {matches} AND a.ctid > b.ctid")
+
+        for number, index in enumerate(indexes):
+            temp = f"{shadow}_i{number}"
+            method = index['definition'].split(' USING ', 1)[1]
+            unique = "UNIQUE " if index['is_unique'] else ""
+            await conn.execute(f"CREATE {unique}INDEX {temp} ON {shadow} USING {method}")
+            index_renames.append((temp, index['name']))
+
+        for number, constraint in enumerate(constraints):
+            temp = f"{shadow}_c{number}"
+            await conn.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {temp} {constraint['definition']}")
+            constraint_renames.append((temp, constraint['conname']))
+
+        # Created after the load and carry-over, so they did not fire for reloaded rows
+        triggers = await conn.fetch(
+            "SELECT pg_get_triggerdef(oid) AS definition FROM pg_trigger WHERE tgrelid = $1::regclass AND NOT tgisinternal",
+            table
+        )
+        for trigger in triggers:
+            head, tail = trigger['definition'].split(' ON ', 1)
+            await conn.execute(f"{head} ON {shadow} {tail.split(' ', 1)[1]}")
+
+        security = await conn.fetchrow(
+            "SELECT relrowsecurity, relforcerowsecurity FROM pg_class WHERE oid = $1::regclass", table
+        )
+        if security['relrowsecurity']:
+            await conn.execute(f"ALTER TABLE {shadow} ENABLE ROW LEVEL SECURITY")
+        if security['relforcerowsecurity']:
+            await conn.execute(f"ALTER TABLE {shadow} FORCE ROW LEVEL SECURITY")
+        policies = await conn.fetch(
+            """
+            SELECT p.policyname, p.permissive, p.cmd, p.roles, p.qual, p.with_check
+            FROM pg_policies p JOIN pg_class c ON c.relname = p.tablename
+            JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = p.schemaname
+            WHERE c.oid = $1::regclass
+            """,
+            table
+        )
+        for policy in policies:
+            roles = ", ".join('PUBLIC' if role == 'public' else _ident(role) for role in policy['roles'])
+            using = f" USING ({policy['qual']})" if policy['qual'] else ""
+            check = f" WITH CHECK ({policy['with_check']})" if policy['with_check'] else ""
+            await conn.execute(f"CREATE POLICY {_ident(policy['policyname'])} ON {shadow} AS {policy['permissive']} "
+                               f"FOR {policy['cmd']} TO {roles}{using}{check}")
+
+        grants = await conn.fetch(
+            """
+            SELECT coalesce(r.rolname, 'PUBLIC') AS grantee, a.privilege_type, a.is_grantable
+            FROM pg_class c CROSS JOIN aclexplode(c.relacl) a LEFT JOIN pg_roles r ON r.oid = a.grantee
+            WHERE c.oid = $1::regclass AND a.grantee <> c.relowner
+            """,
+            table
+        )
+        for grant in grants:
+            grantee = 'PUBLIC' if grant['grantee'] == 'PUBLIC' else _ident(grant['grantee'])
+            option = " WITH GRANT OPTION" if grant['is_grantable'] else ""
+            await conn.execute(f"GRANT {grant['privilege_type']} ON {shadow} TO {grantee}{option}")
+
+        # Serial sequences would be dropped with the live table; identity columns get their own
+        owned = await conn.fetch(
+            """
+            SELECT s.oid::regclass::text AS sequence, a.attname
+            FROM pg_depend d
+            JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S'
+            JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid
+            WHERE d.refobjid = $1::regclass AND d.deptype = 'a'
+            """,
+            table
+        )
+        for sequence in owned:
+            await conn.execute(f"ALTER SEQUENCE {sequence['sequence']} OWNED BY {shadow}.{_ident(sequence['attname'])}")
+        for column in self.identity_columns.get(table, []):
+            kind = 'ALWAYS' if column['attidentity'] == 'a' else 'BY DEFAULT'
+            name = _ident(column['attname'])
+            await conn.execute(f"ALTER TABLE {shadow} ALTER COLUMN {name} DROP DEFAULT, "
+                               f"ALTER COLUMN {name} ADD GENERATED {kind} AS IDENTITY")
+            position = await conn.fetchrow(f"SELECT last_value, is_called FROM {column['sequence']}")
+            await conn.execute("SELECT setval(pg_get_serial_sequence($1, $2), $3, $4)",
+                               shadow, column['attname'], position['last_value'], position['is_called'])
+
+        return index_renames, constraint_renames
+
+    async def _replace(self, conn, table: str, index_renames: List[tuple], constraint_renames: List[tuple]):
+        shadow = table + SHADOW_SUFFIX
+        await conn.execute(f"DROP TABLE {table}")
+        await conn.execute(f"ALTER TABLE {shadow} RENAME TO {table}")
+        for temp, name in index_renames:
+            await conn.execute(f"ALTER INDEX {temp} RENAME TO {_ident(name)}")
+        for temp, name in constraint_renames:
+            await conn.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {temp} TO {_ident(name)}")
+
+
+async def finish_shadow_reload(crawler) -> Optional[Dict]:
+    """Swap in a crawler's shadow reload after crawl_all(); None if it was discarded or failed.
+
+    Spooled pages are written into the shadow first. The reload is discarded unless the crawl
+    reached the last page and nothing is left in the spool, since a partial reload would drop
+    the child rows of every facility it missed.
+    """
+    loader = crawler.copy_loader
+    if crawler.spool:
+        try:
+            await drain_spool(crawler)
+        except Exception as e:
+            logger.error(f"Error draining write spool: {e}")
+    if not crawler.crawl_complete:
+        logger.warning("Shadow reload discarded: the crawl did not reach the last page")
+        await loader.discard()
+        return None
+    if crawler.spool and crawler.spool.pending():
+        logger.warning("Shadow reload discarded: spooled pages have not been written")
+        await loader.discard()
+        return None
+    return await loader.swap()
+
+
+def create_shadow_loader(dsn: Optional[str] = None) -> ShadowLoader:
+    """Create a shadow reload loader for DATABASE_URL"""
+    dsn = dsn or os.getenv('DATABASE_URL')
+    if not dsn:
+        raise ValueError("DATABASE_URL environment variable is required for the shadow ingest mode")
+    return ShadowLoader(dsn)
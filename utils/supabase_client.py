@@ -5,37 +5,131 @@ Handles all database operations using Supabase Python client
 
 import os
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timezone, timedelta
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 from postgrest import APIError
+from postgrest.types import CountMethod, ReturnMethod
 import json
 
+from utils.db_transport import DatabaseTransportProfile, DatabaseTransportStats, create_http_client
+from utils.write_coalescer import WriteCoalescer
+from utils.db_health import DatabaseHealth
+from utils.facility_mirror import FacilityMirror, content_digest, create_facility_mirror
+
 logger = logging.getLogger(__name__)
 
+# Write options for callers that only need to know the write succeeded: PostgREST sends no rows
+# back (Prefer: return=minimal) and reports the affected row count in Content-Range instead
+MINIMAL = {'returning': ReturnMethod.minimal, 'count': CountMethod.exact}
+
+# SQLSTATE classes that reject a row's data rather than the request: data exceptions and
+# integrity constraint violations. Anything else fails the whole bulk write.
+ROW_ERROR_SQLSTATE_CLASSES = ('22', '23')
+
+# A child row whose facility_id no longer exists in facilities
+FOREIGN_KEY_VIOLATION = '23503'
+
+# Freshness buckets of facility_stats() (migrations/005_facility_stats.sql), youngest first; jsonb
+# returns object keys sorted by length, so reports iterate over this list instead
+FRESHNESS_BUCKETS = ['1d', '7d', '30d', 'older', 'never']
+
+def is_row_error(error: APIError) -> bool:
+    """Whether a failed bulk write was caused by the data of one or more rows"""
+    return str(error.code or '')[:2] in ROW_ERROR_SQLSTATE_CLASSES
+
+def _same_value(new: Any, stored: Any) -> bool:
+    """Compare a transformed value with the stored one as PostgREST returns it"""
+    if new is None or stored is None:
+        return new is None and stored is None
+    if isinstance(new, bool) or isinstance(stored, bool):
+        return type(new) is type(stored) and new == stored
+    if isinstance(new, (int, float)) and isinstance(stored, (int, float)):
+        return float(new) == float(stored)
+    if isinstance(new, str) and isinstance(stored, str) and new != stored:
+        # Timestamps come back normalized, e.g. '2024-01-01T00:00:00+00:00'
+        try:
+            return datetime.fromisoformat(new) == datetime.fromisoformat(stored)
+        except ValueError:
+            return False
+    return new == stored
+
+def changed_facility_columns(facility_data: Dict, stored: Dict) -> Dict:
+    """Columns of facility_data whose values differ from the stored row (missing columns count as changed)"""
+    return {
+        column: value for column, value in facility_data.items()
+        if column not in stored or not _same_value(value, stored[column])
+    }
+
 class SupabaseClient:
-    def __init__(self):
-        """Initialize Supabase client"""
+    def __init__(self, transport: Optional[DatabaseTransportProfile] = None):
+        """Initialize Supabase client on a pooled keep-alive HTTP client"""
         self.url = os.environ.get("SUPABASE_URL")
         self.key = os.environ.get("SUPABASE_KEY")
         
         if not self.url or not self.key:
             raise ValueError("SUPABASE_URL and SUPABASE_KEY environment variables are required")
         
-        self.client: Client = create_client(self.url, self.key)
+        self.transport = transport or DatabaseTransportProfile.from_env(pool_size=10)
+        self.transport_stats = DatabaseTransportStats()
+        self.health = DatabaseHealth.from_env(self.transport.max_connections, probe=self.test_connection)
+        self.http_client = create_http_client(self.transport, self.transport_stats, self.health)
+        self.client: Client = create_client(self.url, self.key, options=ClientOptions(httpx_client=self.http_client))
+        self.facility_update_stats = {'updated': 0, 'unchanged': 0, 'columns_written': 0}
+        self.write_coalescer: Optional[WriteCoalescer] = None
+        if self.transport.write_coalesce_window > 0:
+            self.write_coalescer = WriteCoalescer(self, self.transport.write_coalesce_window,
+                                                  self.transport.write_batch_size, self.health)
+        # Local facility identity/digest mirror (FACILITY_MIRROR_PATH), refreshed by sync_mirror()
+        self.mirror: Optional[FacilityMirror] = create_facility_mirror()
         logger.info("Supabase client initialized successfully")
 
+    def close(self):
+        """Close pooled database connections"""
+        self.http_client.close()
+        if self.mirror:
+            self.mirror.close()
+
+    async def drain_writes(self):
+        """Send coalesced inserts still waiting for their window and wait for batches in flight"""
+        if self.write_coalescer:
+            await self.write_coalescer.close()
+
+    async def sync_mirror(self) -> int:
+        """Bring the facility mirror up to date with the facilities table, if it is enabled"""
+        if not self.mirror:
+            return 0
+        try:
+            return await self.mirror.sync(self)
+        except APIError as e:
+            logger.error(f"Error syncing facility mirror: {e}")
+            return 0
+
+    async def insert_row(self, table: str, row: Dict, columns: Optional[str] = '*') -> Optional[Dict]:
+        """Insert one row and return it as stored, raising APIError on failure.
+
+        columns limits what is sent back ('id' for just the key); None returns nothing and
+        yields {} on success. Concurrent inserts into the same table are merged into bulk
+        requests by the write coalescer (SUPABASE_WRITE_COALESCE_MS); each caller still gets
+        its own row or error.
+        """
+        if self.write_coalescer:
+            return await self.write_coalescer.insert(table, row, columns)
+        if columns is None:
+            self.client.table(table).insert(row, **MINIMAL).execute()
+            return {}
+        query = self.client.table(table).insert(row)
+        query.params = query.params.add("select", columns)
+        response = query.execute()
+        return response.data[0] if response.data else None
+
     async def create_service(self, service_data: Dict) -> Optional[str]:
         """Create a new service and return its ID"""
         try:
-            response = (
-                self.client.table("services")
-                .insert(service_data)
-                .execute()
-            )
+            inserted = await self.insert_row("services", service_data, columns="id")
             
-            if response.data:
-                service_id = response.data[0]['id']
+            if inserted:
+                service_id = inserted['id']
                 logger.debug(f"Created service: {service_data.get('display_name')}")
                 return service_id
             else:
@@ -50,12 +144,15 @@ class SupabaseClient:
     
     
     async def find_existing_facility(self, slug: str, name: str, city: str, province: str) -> Optional[Dict]:
-        """Find existing facility by slug or name/location combination"""
+        """Find existing facility by slug or name/location combination.
+
+        Returns the full row so upsert_facility can diff against it.
+        """
         try:
             # First try by slug
             response = (
                 self.client.table("facilities")
-                .select("id, name, slug")
+                .select("*")
                 .eq("slug", slug)
                 .limit(1)
                 .execute()
@@ -67,7 +164,7 @@ class SupabaseClient:
             # If not found by slug, try by name and location
             response = (
                 self.client.table("facilities")
-                .select("id, name, slug")
+                .select("*")
                 .eq("name", name)
                 .eq("city", city)
                 .eq("province", province)
@@ -81,8 +178,38 @@ class SupabaseClient:
             logger.error(f"Error finding existing facility: {e}")
             return None
 
+    async def save_facility(self, facility_data: Dict, source: str) -> Tuple[str, bool]:
+        """Find and upsert a facility; returns (facility_id, whether it already existed).
+
+        With the facility mirror, a facility whose transformed data has the same digest as the
+        source's last write is neither looked up nor written.
+        """
+        digest = None
+        if self.mirror:
+            digest = content_digest(facility_data)
+            known = self.mirror.find(facility_data.get('slug'), facility_data.get('name'),
+                                     facility_data.get('city'), facility_data.get('province'))
+            if known and self.mirror.unchanged(known['id'], source, digest):
+                self.facility_update_stats['unchanged'] += 1
+                return known['id'], True
+
+        existing = await self.find_existing_facility(
+            facility_data.get('slug', ''),
+            facility_data.get('name', ''),
+            facility_data.get('city', ''),
+            facility_data.get('province', '')
+        )
+        facility_id = await self.upsert_facility(facility_data, existing)
+        if self.mirror:
+            self.mirror.remember(facility_id, facility_data, source, digest)
+        return facility_id, existing is not None
+
     async def upsert_facility(self, facility_data: Dict, existing: Optional[Dict] = None) -> str:
-        """Insert or update facility and return facility ID"""
+        """Insert or update facility and return facility ID.
+
+        Updates only send the columns that differ from existing (the stored row) and are skipped
+        when nothing changed, so updated_at reflects real changes.
+        """
         try:
             # Check if facility exists (use provided existing data or query if not provided)
             if existing is None:
@@ -94,32 +221,36 @@ class SupabaseClient:
                 )
             
             if existing:
-                # Update existing facility
+                # Update only the columns that changed since the stored row
                 facility_id = existing['id']
-                update_data = {**facility_data, 'updated_at': datetime.now(timezone.utc).isoformat()}
+                changes = changed_facility_columns(facility_data, existing)
+                if not changes:
+                    self.facility_update_stats['unchanged'] += 1
+                    logger.debug(f"Facility unchanged: {facility_data.get('name')}")
+                    return facility_id
+                
+                update_data = {**changes, 'updated_at': datetime.now(timezone.utc).isoformat()}
                 
                 response = (
                     self.client.table("facilities")
-                    .update(update_data)
+                    .update(update_data, **MINIMAL)
                     .eq("id", facility_id)
                     .execute()
                 )
                 
-                logger.debug(f"Updated facility: {facility_data.get('name')}")
+                self.facility_update_stats['updated'] += 1
+                self.facility_update_stats['columns_written'] += len(changes)
+                logger.debug(f"Updated facility: {facility_data.get('name')} ({', '.join(changes)})")
                 return facility_id
                 
             else:
                 # Insert new facility
                 insert_data = {**facility_data, 'created_at': datetime.now(timezone.utc).isoformat()}
                 
-                response = (
-                    self.client.table("facilities")
-                    .insert(insert_data)
-                    .execute()
-                )
+                inserted = await self.insert_row("facilities", insert_data, columns="id")
                 
-                if response.data:
-                    facility_id = response.data[0]['id']
+                if inserted:
+                    facility_id = inserted['id']
                     logger.debug(f"Created facility: {facility_data.get('name')}")
                     return facility_id
                 else:
@@ -148,13 +279,7 @@ class SupabaseClient:
                 return response.data[0]
             
             # If not found, create new specialty
-            response = (
-                self.client.table("specialties")
-                .insert({"name": name})
-                .execute()
-            )
-            
-            return response.data[0] if response.data else None
+            return await self.insert_row("specialties", {"name": name}, columns="id, name")
             
         except APIError as e:
             logger.error(f"Error getting/creating specialty {name}: {e}")
@@ -164,16 +289,16 @@ class SupabaseClient:
         """Link specialties to a facility"""
         try:
             # First remove existing links
-            self.client.table("facility_specialties").delete().eq("facility_id", facility_id).execute()
+            self.client.table("facility_specialties").delete(returning=ReturnMethod.minimal).eq("facility_id", facility_id).execute()
             
-            # Get or create specialties and create links
+            # Get or create specialties and create links; a specialty named twice is linked once
             for specialty_name in specialties:
                 specialty = await self.get_specialty_by_name(specialty_name)
                 if specialty:
-                    self.client.table("facility_specialties").insert({
+                    self.client.table("facility_specialties").upsert({
                         "facility_id": facility_id,
                         "specialty_id": specialty["id"]
-                    }).execute()
+                    }, on_conflict="facility_id,specialty_id", ignore_duplicates=True, **MINIMAL).execute()
             
             return True
             
@@ -215,20 +340,15 @@ class SupabaseClient:
                 # Update existing offering
                 update_response = (
                     self.client.table("facility_service_offerings")
-                    .update(offering_data)
+                    .update(offering_data, **MINIMAL)
                     .eq("facility_id", offering_data['facility_id'])
                     .eq("service_id", offering_data['service_id'])
                     .execute()
                 )
-                return len(update_response.data) > 0
+                return bool(update_response.count)
             else:
                 # Insert new offering
-                insert_response = (
-                    self.client.table("facility_service_offerings")
-                    .insert(offering_data)
-                    .execute()
-                )
-                return len(insert_response.data) > 0
+                return await self.insert_row("facility_service_offerings", offering_data, columns=None) is not None
                 
         except APIError as e:
             logger.error(f"Error upserting service offering: {e}")
@@ -257,18 +377,13 @@ class SupabaseClient:
                 existing_id = resp.data[0]["id"]
                 update_response = (
                     self.client.table("facility_booking_channels")
-                    .update(channel_data)
+                    .update(channel_data, **MINIMAL)
                     .eq("id", existing_id)
                     .execute()
                 )
-                return len(update_response.data) > 0
+                return bool(update_response.count)
 
-            insert_response = (
-                self.client.table("facility_booking_channels")
-                .insert(channel_data)
-                .execute()
-            )
-            return len(insert_response.data) > 0
+            return await self.insert_row("facility_booking_channels", channel_data, columns=None) is not None
             
         except APIError as e:
             logger.error(f"Error inserting booking channel: {e}")
@@ -277,16 +392,18 @@ class SupabaseClient:
     async def insert_availability(self, availability_data: Dict) -> bool:
         """Insert facility service availability"""
         try:
-            # If a list of availability records is provided, insert in bulk
+            # If a list of availability records is provided, insert in bulk, skipping slots
+            # already stored (facility_availability_facility_available_at_key, migration 003)
             if isinstance(availability_data, list):
                 if not availability_data:
                     return True
                 response = (
                     self.client.table("facility_availability")
-                    .insert(availability_data)
+                    .upsert(availability_data, on_conflict="facility_id,available_at",
+                            ignore_duplicates=True, **MINIMAL)
                     .execute()
                 )
-                return bool(getattr(response, 'data', None))
+                return bool(response.count)
 
             # Single record path (dict) - deduplicate by facility_id + available_at if provided
             facility_id = availability_data.get('facility_id')
@@ -307,106 +424,340 @@ class SupabaseClient:
                     avail_id = existing.data[0]["id"]
                     update_response = (
                         self.client.table("facility_availability")
-                        .update(availability_data)
+                        .update(availability_data, **MINIMAL)
                         .eq("id", avail_id)
                         .execute()
                     )
-                    return len(update_response.data) > 0
-
-            response = (
-                self.client.table("facility_availability")
-                .insert(availability_data)
-                .execute()
-            )
+                    return bool(update_response.count)
 
-            return bool(getattr(response, 'data', None))
+            return await self.insert_row("facility_availability", availability_data, columns=None) is not None
             
         except APIError as e:
             logger.error(f"Error inserting availability: {e}")
             return False
 
+    def _write_bisecting(self, table: str, rows: List[Dict], on_conflict: Optional[str],
+                         rejects: List[Dict], returned: Optional[List[Dict]], columns: str = '*') -> int:
+        try:
+            # Rows are only sent back when the caller collects them
+            options = {} if returned is not None else MINIMAL
+            query = self.client.table(table)
+            query = query.upsert(rows, on_conflict=on_conflict, **options) if on_conflict else query.insert(rows, **options)
+            if returned is not None:
+                query.params = query.params.add("select", columns)
+            response = query.execute()
+            if returned is not None:
+                returned.extend(response.data or [])
+            return len(rows)
+        except APIError as e:
+            if not is_row_error(e):
+                raise
+            if len(rows) == 1:
+                rejects.append({'table': table, 'row': rows[0], 'error': e.message, 'code': e.code})
+                return 0
+            middle = len(rows) // 2
+            return (self._write_bisecting(table, rows[:middle], on_conflict, rejects, returned, columns)
+                    + self._write_bisecting(table, rows[middle:], on_conflict, rejects, returned, columns))
+
+    async def bulk_write(self, table: str, rows: List[Dict], on_conflict: Optional[str] = None,
+                         returned: Optional[List[Dict]] = None, columns: str = '*') -> Tuple[int, List[Dict]]:
+        """Insert (or upsert on on_conflict) rows in one request, isolating bad rows on failure.
+
+        When the request is rejected because of row data, the batch is split in halves
+        recursively until the offending rows are found; everything else is still written.
+        Returns (rows written, rejects) where each reject is {'table', 'row', 'error', 'code'}.
+        Other errors (connection, permissions, schema) are raised as before. If given, `returned`
+        receives the written rows (limited to `columns`) in input order; otherwise nothing is
+        sent back. Facilities whose rows fail their foreign key were deleted from the database,
+        so they are dropped from the facility mirror and resolved afresh by the next write.
+        """
+        rejects: List[Dict] = []
+        written = self._write_bisecting(table, rows, on_conflict, rejects, returned, columns) if rows else 0
+        for reject in rejects:
+            facility_id = reject['row'].get('facility_id')
+            logger.error(f"Rejected {table} row for facility {facility_id}: {reject['error']} ({reject['code']})")
+            if self.mirror and facility_id and reject['code'] == FOREIGN_KEY_VIOLATION:
+                self.mirror.forget(facility_id)
+        return written, rejects
+
+    async def replace_availability_bulk(self, availability_records: List[Dict], chunk_size: int = 150) -> Optional[List[Dict]]:
+        """Replace availability for every facility in availability_records.
+
+        Each chunk of facilities costs one delete (facility_id IN (...)) and one bulk insert,
+        instead of a delete and an insert per facility. Rows rejected for their data are
+        isolated without failing the rest of the chunk and returned as bulk_write rejects
+        (e.g. a foreign key violation for a facility that was deleted); None if the call failed.
+        """
+        if not availability_records:
+            return []
+
+        by_facility: Dict[str, List[Dict]] = {}
+        for record in availability_records:
+            by_facility.setdefault(record['facility_id'], []).append(record)
+        facility_ids = list(by_facility)
+
+        rejects: List[Dict] = []
+        try:
+            # Chunk so the IN (...) filter stays well inside URL length limits
+            for i in range(0, len(facility_ids), chunk_size):
+                chunk_ids = facility_ids[i:i + chunk_size]
+                self.client.table("facility_availability").delete(returning=ReturnMethod.minimal).in_("facility_id", chunk_ids).execute()
+
+                chunk_records = [record for facility_id in chunk_ids for record in by_facility[facility_id]]
+                _, chunk_rejects = await self.bulk_write("facility_availability", chunk_records)
+                rejects.extend(chunk_rejects)
+
+            return rejects
+
+        except APIError as e:
+            logger.error(f"Error replacing availability for {len(facility_ids)} facilities: {e}")
+            return None
+
+    @staticmethod
+    def _sanitize_hours(facility_id: str, hours: List[Dict]) -> List[Dict[str, Any]]:
+        """Drop incomplete hour records and fill in slot/weekday_label defaults"""
+        sanitized: List[Dict[str, Any]] = []
+        for record in hours or []:
+            if not record:
+                continue
+
+            weekday = record.get('weekday')
+            open_time = record.get('open_time')
+            close_time = record.get('close_time')
+            if weekday is None or not open_time or not close_time:
+                continue
+
+            slot = record.get('slot') or 1
+
+            weekday_label = record.get('weekday_label')
+            if not weekday_label and isinstance(weekday, int) and 0 <= weekday <= 6:
+                weekday_label = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'][weekday]
+
+            sanitized.append({
+                'facility_id': facility_id,
+                'weekday': weekday,
+                'weekday_label': weekday_label,
+                'open_time': open_time,
+                'close_time': close_time,
+                'notes': record.get('notes'),
+                'slot': slot
+            })
+
+        sanitized.sort(key=lambda r: (r['weekday'], r['slot'], r['open_time']))
+        return sanitized
+
     async def replace_facility_hours(self, facility_id: str, hours: List[Dict]) -> bool:
         """Replace facility operating hours with new records"""
         try:
-            self.client.table("facility_hours").delete().eq("facility_id", facility_id).execute()
+            self.client.table("facility_hours").delete(returning=ReturnMethod.minimal).eq("facility_id", facility_id).execute()
 
             if not hours:
                 return True
 
-            sanitized: List[Dict[str, Any]] = []
-            for record in hours:
-                if not record:
-                    continue
-
-                weekday = record.get('weekday')
-                open_time = record.get('open_time')
-                close_time = record.get('close_time')
-                if weekday is None or not open_time or not close_time:
-                    continue
-
-                slot = record.get('slot') or 1
-
-                weekday_label = record.get('weekday_label')
-                if not weekday_label and isinstance(weekday, int) and 0 <= weekday <= 6:
-                    weekday_label = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'][weekday]
-
-                sanitized.append({
-                    'facility_id': facility_id,
-                    'weekday': weekday,
-                    'weekday_label': weekday_label,
-                    'open_time': open_time,
-                    'close_time': close_time,
-                    'notes': record.get('notes'),
-                    'slot': slot
-                })
-
+            sanitized = self._sanitize_hours(facility_id, hours)
             if not sanitized:
                 logger.debug(f"No valid operating hours to insert for facility {facility_id}")
                 return True
 
-            sanitized.sort(key=lambda r: (r['weekday'], r['slot'], r['open_time']))
+            written, _ = await self.bulk_write("facility_hours", sanitized)
+            return written > 0
 
+        except APIError as e:
+            logger.error(f"Error replacing facility hours for {facility_id}: {e}")
+            return False
+
+    async def get_service_ids_by_slugs(self, slugs: List[str]) -> Dict[str, str]:
+        """Map service slugs to service ids with one IN (...) lookup"""
+        if not slugs:
+            return {}
+        try:
             response = (
-                self.client.table("facility_hours")
-                .insert(sanitized)
+                self.client.table("services")
+                .select("id, slug")
+                .in_("slug", list(slugs))
                 .execute()
             )
+            return {row['slug']: row['id'] for row in response.data or []}
 
-            return len(response.data) > 0
+        except APIError as e:
+            logger.error(f"Error fetching {len(slugs)} services by slug: {e}")
+            return {}
+
+    async def sync_child_rows_bulk(self, table: str, facility_ids: List[str], rows: List[Dict],
+                                   conflict_keys: List[Tuple[str, ...]], delete_key: Tuple[str, ...],
+                                   chunk_size: int = 50, page_size: int = 1000) -> Optional[List[Dict]]:
+        """Make table hold exactly `rows` for the given facilities.
+
+        Rows are bulk upserted on the first natural key in conflict_keys whose columns they all
+        carry (one request per key). Existing rows of those facilities that match none of the new
+        natural keys are removed with one delete per chunk, filtered on delete_key. Existing rows
+        are read in pages of page_size ordered by delete_key, which must not exceed PostgREST's
+        max-rows (1000 by default) or rows past the cap would never be seen.
+        Returns the rows rejected for their data (see bulk_write), or None if the sync failed.
+        """
+        if not facility_ids:
+            return []
+
+        key_columns = sorted({column for key in conflict_keys for column in key} | set(delete_key))
+        groups: Dict[Tuple[str, ...], Dict[Tuple, Dict]] = {key: {} for key in conflict_keys}
+        for row in rows:
+            for key in conflict_keys:
+                if all(row.get(column) is not None for column in key):
+                    # Later rows win, so one statement never touches the same key twice
+                    groups[key][tuple(row[column] for column in key)] = row
+                    break
+
+        try:
+            stale: List[Dict] = []
+            existing_rows: List[Dict] = []
+            for i in range(0, len(facility_ids), chunk_size * 3):
+                offset = 0
+                while True:
+                    # Builders accumulate parameters, so each page gets a fresh query
+                    query = self.client.table(table).select(",".join(key_columns)).in_(
+                        "facility_id", facility_ids[i:i + chunk_size * 3]
+                    )
+                    for column in delete_key:
+                        query = query.order(column)
+                    page = query.range(offset, offset + page_size - 1).execute().data or []
+                    existing_rows.extend(page)
+                    if len(page) < page_size:
+                        break
+                    offset += page_size
+
+            for existing in existing_rows:
+                kept = any(
+                    all(existing.get(column) is not None for column in key)
+                    and tuple(existing[column] for column in key) in groups[key]
+                    for key in conflict_keys
+                )
+                if not kept:
+                    stale.append(existing)
+
+            rejects: List[Dict] = []
+            for key, keyed_rows in groups.items():
+                if keyed_rows:
+                    _, key_rejects = await self.bulk_write(table, list(keyed_rows.values()), on_conflict=",".join(key))
+                    rejects.extend(key_rejects)
+
+            for i in range(0, len(stale), chunk_size):
+                conditions = [
+                    "and(" + ",".join(f"{column}.eq.{existing[column]}" for column in delete_key) + ")"
+                    for existing in stale[i:i + chunk_size]
+                ]
+                self.client.table(table).delete(returning=ReturnMethod.minimal).or_(",".join(conditions)).execute()
+
+            return rejects
 
         except APIError as e:
-            logger.error(f"Error replacing facility hours for {facility_id}: {e}")
-            return False
+            logger.error(f"Error syncing {table} for {len(facility_ids)} facilities: {e}")
+            return None
+
+    async def retire_unseen_facilities(self, source: str, since: datetime, max_fraction: float = 0.05,
+                                       purge: bool = False, dry_run: bool = False) -> Optional[Dict]:
+        """Mark active facilities the source has not sighted since `since` inactive, in one call.
+
+        Returns {'active', 'unseen', 'retired', 'purged', 'refused'}; nothing is retired
+        ('refused') when more than max_fraction of the source's active facilities are unseen.
+        Returns None when the call fails. Requires migrations/004_facility_sightings.sql.
+        """
+        try:
+            response = self.client.rpc("retire_unseen_facilities", {
+                "p_source": source,
+                "p_since": since.isoformat(),
+                "p_max_fraction": max_fraction,
+                "p_purge": purge,
+                "p_dry_run": dry_run,
+            }).execute()
+            return response.data
+
+        except APIError as e:
+            logger.error(f"Error retiring unseen {source} facilities: {e}")
+            return None
+
+    async def roll_up_observations(self, before: datetime, period: str = 'day',
+                                   batch_size: int = 10000) -> Optional[Dict]:
+        """Roll up and delete one batch of facility_observations made before `before`.
+
+        Returns {'rolled_up', 'deleted', 'remaining'}, or None when the call fails.
+        Requires migrations/007_observation_retention.sql.
+        """
+        try:
+            response = self.client.rpc("roll_up_facility_observations", {
+                "p_before": before.isoformat(),
+                "p_period": period,
+                "p_batch_size": batch_size,
+            }).execute()
+            return response.data
+
+        except APIError as e:
+            logger.error(f"Error rolling up facility observations: {e}")
+            return None
+
+    async def observation_storage(self) -> Dict:
+        """Estimated rows and total bytes of facility_observations and its rollups ({} on failure)"""
+        try:
+            response = self.client.rpc("facility_observation_storage", {}).execute()
+            return response.data or {}
+
+        except APIError as e:
+            logger.error(f"Error fetching observation storage: {e}")
+            return {}
+
+    async def refresh_search_documents(self, facility_ids: List[str],
+                                       changed_since: Optional[datetime] = None) -> Optional[int]:
+        """Rebuild the search documents of facility_ids and of facilities updated since changed_since.
+
+        Only documents whose contents changed are rewritten; returns how many were, or None when
+        the call fails. Requires migrations/008_facility_search_documents.sql.
+        """
+        try:
+            response = self.client.rpc("refresh_facility_search_documents", {
+                "p_facility_ids": facility_ids,
+                "p_changed_since": changed_since.isoformat() if changed_since else None,
+            }).execute()
+            return response.data
+
+        except APIError as e:
+            logger.error(f"Error refreshing search documents for {len(facility_ids)} facilities: {e}")
+            return None
+
+    async def ingest_facility_bundles(self, bundles: List[Dict]) -> Optional[List[Dict]]:
+        """Upsert a page of facility bundles with one call to the ingest_facility_bundles function.
+
+        Returns one outcome per bundle, in order: {'index', 'facility_id', 'created'} or
+        {'index', 'error', 'sqlstate'}. Returns None when the call itself fails.
+        Requires migrations/002_ingest_facility_bundle.sql.
+        """
+        if not bundles:
+            return []
+        try:
+            response = self.client.rpc("ingest_facility_bundles", {"bundles": bundles}).execute()
+            return response.data or []
+
+        except APIError as e:
+            logger.error(f"Error ingesting {len(bundles)} facility bundles: {e}")
+            return None
 
     async def get_facility_stats(self) -> Dict:
-        """Get basic statistics about facilities in the database"""
+        """Facility counts aggregated in the database with one call to facility_stats().
+
+        Returns {'total_facilities', 'facility_types', 'statuses', 'freshness', 'sources'}, where
+        'sources' holds per crawl source {'facilities', 'active', 'last_seen_at', 'freshness'}.
+        Requires migrations/005_facility_stats.sql; without it only the total is returned.
+        """
         try:
-            # Count total facilities
-            total_response = (
-                self.client.table("facilities")
-                .select("id", count="exact")
-                .execute()
-            )
-            
-            # Count by facility type
-            type_response = (
-                self.client.table("facilities")
-                .select("facility_type")
-                .execute()
-            )
-            
-            facility_types = {}
-            for facility in type_response.data:
-                facility_type = facility['facility_type']
-                facility_types[facility_type] = facility_types.get(facility_type, 0) + 1
-            
-            return {
-                'total_facilities': total_response.count,
-                'facility_types': facility_types
-            }
-            
+            response = self.client.rpc("facility_stats", {}).execute()
+            return response.data or {}
         except APIError as e:
             logger.error(f"Error fetching stats: {e}")
+
+        try:
+            # Count only; no facility rows are transferred
+            total_response = self.client.table("facilities").select("id", count="exact", head=True).execute()
+            return {'total_facilities': total_response.count}
+        except APIError as e:
+            logger.error(f"Error counting facilities: {e}")
             return {}
 
     async def test_connection(self) -> bool:
@@ -0,0 +1,433 @@
+"""
+NaviCare Page Range Work Queue
+Lease-based queue that lets any number of crawler workers drain a page range dynamically
+"""
+
+import os
+import uuid
+import time
+import sqlite3
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+LEASED = 'leased'
+DONE = 'done'
+# Ranges that used up max_attempts; they are not claimed again
+FAILED = 'failed'
+
+
+@dataclass
+class PageLease:
+    """A page range claimed by a worker until lease_expires_at"""
+    range_id: int
+    crawl_id: str
+    start_page: int
+    end_page: int
+    worker_id: str
+    lease_token: str
+    lease_expires_at: float
+    attempts: int
+
+
+class PageRangeWorkQueue:
+    """Base class for work queue backends"""
+
+    def __init__(self, lease_seconds: int = 900, max_attempts: int = 3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+    async def initialize(self):
+        """Create backing storage if needed"""
+        raise NotImplementedError
+
+    async def seed(self, crawl_id: str, start_page: int, end_page: int, chunk_size: int) -> int:
+        """Split start_page..end_page into chunks; existing ranges are kept. Returns ranges added."""
+        raise NotImplementedError
+
+    async def claim(self, crawl_id: str, worker_id: str) -> Optional[PageLease]:
+        """Claim the next pending or expired range, or None when the crawl is drained"""
+        raise NotImplementedError
+
+    async def renew(self, lease: PageLease) -> bool:
+        """Extend a lease; False if the lease was lost to another worker"""
+        raise NotImplementedError
+
+    async def complete(self, lease: PageLease) -> bool:
+        """Mark a leased range as done"""
+        raise NotImplementedError
+
+    async def release(self, lease: PageLease) -> bool:
+        """Give a range back to the queue so another worker can pick it up (failed once out of attempts)"""
+        raise NotImplementedError
+
+    async def progress(self, crawl_id: str) -> Dict[str, int]:
+        """Count ranges by status for a crawl"""
+        raise NotImplementedError
+
+    async def close(self):
+        """Release backend resources"""
+
+    @staticmethod
+    def _chunk(start_page: int, end_page: int, chunk_size: int):
+        chunk_size = max(1, chunk_size)
+        for chunk_start in range(start_page, end_page + 1, chunk_size):
+            yield chunk_start, min(chunk_start + chunk_size - 1, end_page)
+
+
+class SQLiteWorkQueue(PageRangeWorkQueue):
+    """Work queue stored in a local SQLite file (single host, many processes)"""
+
+    def __init__(self, path: str, lease_seconds: int = 900, max_attempts: int = 3):
+        super().__init__(lease_seconds, max_attempts)
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+
+    async def initialize(self):
+        self.conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_page_ranges (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                crawl_id TEXT NOT NULL,
+                start_page INTEGER NOT NULL,
+                end_page INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_token TEXT,
+                lease_expires_at REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                completed_at REAL,
+                UNIQUE (crawl_id, start_page)
+            )
+        """)
+
+    async def seed(self, crawl_id: str, start_page: int, end_page: int, chunk_size: int) -> int:
+        added = 0
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for chunk_start, chunk_end in self._chunk(start_page, end_page, chunk_size):
+                cursor = self.conn.execute(
+                    "INSERT OR IGNORE INTO crawl_page_ranges (crawl_id, start_page, end_page) VALUES (?, ?, ?)",
+                    (crawl_id, chunk_start, chunk_end)
+                )
+                added += cursor.rowcount
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return added
+
+    async def claim(self, crawl_id: str, worker_id: str) -> Optional[PageLease]:
+        now = time.time()
+        # BEGIN IMMEDIATE takes the write lock up front so two workers cannot claim the same row
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                """
+                UPDATE crawl_page_ranges
+                SET status = ?, worker_id = NULL, lease_token = NULL, lease_expires_at = NULL
+                WHERE crawl_id = ?
+                  AND attempts >= ?
+                  AND (status = ? OR (status = ? AND lease_expires_at < ?))
+                """,
+                (FAILED, crawl_id, self.max_attempts, PENDING, LEASED, now)
+            )
+            row = self.conn.execute(
+                """
+                SELECT id, start_page, end_page, attempts FROM crawl_page_ranges
+                WHERE crawl_id = ?
+                  AND attempts < ?
+                  AND (status = ? OR (status = ? AND lease_expires_at < ?))
+                ORDER BY start_page
+                LIMIT 1
+                """,
+                (crawl_id, self.max_attempts, PENDING, LEASED, now)
+            ).fetchone()
+
+            if not row:
+                self.conn.execute("COMMIT")
+                return None
+
+            token = uuid.uuid4().hex
+            expires_at = now + self.lease_seconds
+            self.conn.execute(
+                """
+                UPDATE crawl_page_ranges
+                SET status = ?, worker_id = ?, lease_token = ?, lease_expires_at = ?, attempts = attempts + 1
+                WHERE id = ?
+                """,
+                (LEASED, worker_id, token, expires_at, row['id'])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return PageLease(
+            range_id=row['id'],
+            crawl_id=crawl_id,
+            start_page=row['start_page'],
+            end_page=row['end_page'],
+            worker_id=worker_id,
+            lease_token=token,
+            lease_expires_at=expires_at,
+            attempts=row['attempts'] + 1
+        )
+
+    async def renew(self, lease: PageLease) -> bool:
+        expires_at = time.time() + self.lease_seconds
+        cursor = self.conn.execute(
+            "UPDATE crawl_page_ranges SET lease_expires_at = ? WHERE id = ? AND lease_token = ? AND status = ?",
+            (expires_at, lease.range_id, lease.lease_token, LEASED)
+        )
+        if cursor.rowcount:
+            lease.lease_expires_at = expires_at
+        return cursor.rowcount > 0
+
+    async def complete(self, lease: PageLease) -> bool:
+        cursor = self.conn.execute(
+            """
+            UPDATE crawl_page_ranges
+            SET status = ?, lease_token = NULL, lease_expires_at = NULL, completed_at = ?
+            WHERE id = ? AND lease_token = ?
+            """,
+            (DONE, time.time(), lease.range_id, lease.lease_token)
+        )
+        return cursor.rowcount > 0
+
+    async def release(self, lease: PageLease) -> bool:
+        cursor = self.conn.execute(
+            """
+            UPDATE crawl_page_ranges
+            SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                worker_id = NULL, lease_token = NULL, lease_expires_at = NULL
+            WHERE id = ? AND lease_token = ?
+            """,
+            (self.max_attempts, FAILED, PENDING, lease.range_id, lease.lease_token)
+        )
+        return cursor.rowcount > 0
+
+    async def progress(self, crawl_id: str) -> Dict[str, int]:
+        rows = self.conn.execute(
+            "SELECT status, COUNT(*) AS n FROM crawl_page_ranges WHERE crawl_id = ? GROUP BY status",
+            (crawl_id,)
+        ).fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    async def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+class PostgresWorkQueue(PageRangeWorkQueue):
+    """Work queue stored in a Postgres table (many hosts, e.g. parallel GitHub Actions jobs)"""
+
+    def __init__(self, dsn: str, lease_seconds: int = 900, max_attempts: int = 3):
+        super().__init__(lease_seconds, max_attempts)
+        self.dsn = dsn
+        self.pool = None
+
+    async def initialize(self):
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        await self.pool.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_page_ranges (
+                id BIGSERIAL PRIMARY KEY,
+                crawl_id TEXT NOT NULL,
+                start_page INTEGER NOT NULL,
+                end_page INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_token TEXT,
+                lease_expires_at TIMESTAMPTZ,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                completed_at TIMESTAMPTZ,
+                UNIQUE (crawl_id, start_page)
+            )
+        """)
+
+    async def seed(self, crawl_id: str, start_page: int, end_page: int, chunk_size: int) -> int:
+        chunks = list(self._chunk(start_page, end_page, chunk_size))
+        added = 0
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                for chunk_start, chunk_end in chunks:
+                    result = await conn.execute(
+                        """
+                        INSERT INTO crawl_page_ranges (crawl_id, start_page, end_page)
+                        VALUES ($1, $2, $3)
+                        ON CONFLICT (crawl_id, start_page) DO NOTHING
+                        """,
+                        crawl_id, chunk_start, chunk_end
+                    )
+                    added += int(result.split()[-1])
+        return added
+
+    async def claim(self, crawl_id: str, worker_id: str) -> Optional[PageLease]:
+        token = uuid.uuid4().hex
+        await self.pool.execute(
+            """
+            UPDATE crawl_page_ranges
+            SET status = $1, worker_id = NULL, lease_token = NULL, lease_expires_at = NULL
+            WHERE crawl_id = $2
+              AND attempts >= $3
+              AND (status = $4 OR (status = $5 AND lease_expires_at < now()))
+            """,
+            FAILED, crawl_id, self.max_attempts, PENDING, LEASED
+        )
+        # SKIP LOCKED lets concurrent workers claim different rows without blocking each other
+        row = await self.pool.fetchrow(
+            """
+            UPDATE crawl_page_ranges
+            SET status = $4, worker_id = $2, lease_token = $3,
+                lease_expires_at = now() + make_interval(secs => $5), attempts = attempts + 1
+            WHERE id = (
+                SELECT id FROM crawl_page_ranges
+                WHERE crawl_id = $1
+                  AND attempts < $6
+                  AND (status = $7 OR (status = $4 AND lease_expires_at < now()))
+                ORDER BY start_page
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, start_page, end_page, attempts, extract(epoch FROM lease_expires_at) AS expires_at
+            """,
+            crawl_id, worker_id, token, LEASED, float(self.lease_seconds), self.max_attempts, PENDING
+        )
+        if not row:
+            return None
+
+        return PageLease(
+            range_id=row['id'],
+            crawl_id=crawl_id,
+            start_page=row['start_page'],
+            end_page=row['end_page'],
+            worker_id=worker_id,
+            lease_token=token,
+            lease_expires_at=float(row['expires_at']),
+            attempts=row['attempts']
+        )
+
+    async def renew(self, lease: PageLease) -> bool:
+        expires_at = await self.pool.fetchval(
+            """
+            UPDATE crawl_page_ranges SET lease_expires_at = now() + make_interval(secs => $3)
+            WHERE id = $1 AND lease_token = $2 AND status = $4
+            RETURNING extract(epoch FROM lease_expires_at)
+            """,
+            lease.range_id, lease.lease_token, float(self.lease_seconds), LEASED
+        )
+        if expires_at is None:
+            return False
+        lease.lease_expires_at = float(expires_at)
+        return True
+
+    async def complete(self, lease: PageLease) -> bool:
+        result = await self.pool.execute(
+            """
+            UPDATE crawl_page_ranges
+            SET status = $3, lease_token = NULL, lease_expires_at = NULL, completed_at = now()
+            WHERE id = $1 AND lease_token = $2
+            """,
+            lease.range_id, lease.lease_token, DONE
+        )
+        return result.endswith(" 1")
+
+    async def release(self, lease: PageLease) -> bool:
+        result = await self.pool.execute(
+            """
+            UPDATE crawl_page_ranges
+            SET status = CASE WHEN attempts >= $5 THEN $4 ELSE $3 END,
+                worker_id = NULL, lease_token = NULL, lease_expires_at = NULL
+            WHERE id = $1 AND lease_token = $2
+            """,
+            lease.range_id, lease.lease_token, PENDING, FAILED, self.max_attempts
+        )
+        return result.endswith(" 1")
+
+    async def progress(self, crawl_id: str) -> Dict[str, int]:
+        rows = await self.pool.fetch(
+            "SELECT status, COUNT(*) AS n FROM crawl_page_ranges WHERE crawl_id = $1 GROUP BY status",
+            crawl_id
+        )
+        return {row['status']: row['n'] for row in rows}
+
+    async def close(self):
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+
+
+def create_work_queue(backend: str, location: Optional[str] = None,
+                      lease_seconds: int = 900, max_attempts: int = 3) -> PageRangeWorkQueue:
+    """Create a work queue backend ('sqlite' or 'postgres')"""
+    if backend == 'sqlite':
+        return SQLiteWorkQueue(location or 'crawl_queue.db', lease_seconds, max_attempts)
+    if backend == 'postgres':
+        dsn = location or os.getenv('DATABASE_URL')
+        if not dsn:
+            raise ValueError("DATABASE_URL environment variable is required for the postgres work queue")
+        return PostgresWorkQueue(dsn, lease_seconds, max_attempts)
+    raise ValueError(f"Unknown work queue backend: {backend}")
+
+
+async def _give_back(queue: PageRangeWorkQueue, lease: PageLease):
+    if lease.attempts >= queue.max_attempts:
+        logger.error(f"Pages {lease.start_page}-{lease.end_page} failed {lease.attempts} times; marking the range failed")
+    await queue.release(lease)
+
+
+async def drain_work_queue(queue: PageRangeWorkQueue, crawl_id: str, worker_id: str,
+                           crawl_range: Callable[[int, int], Awaitable[Optional[List[int]]]]) -> int:
+    """Claim ranges until the crawl is drained, renewing each lease while crawl_range runs.
+
+    crawl_range returns the pages it could not fetch; a range with failed pages (or that raised)
+    is released for another attempt, and marked failed once it has used up max_attempts.
+    Returns the number of ranges completed by this worker.
+    """
+    completed = 0
+    renew_interval = max(1.0, queue.lease_seconds / 3)
+
+    while True:
+        lease = await queue.claim(crawl_id, worker_id)
+        if not lease:
+            logger.info(f"Worker {worker_id}: no more ranges to claim for crawl {crawl_id}")
+            return completed
+
+        logger.info(f"Worker {worker_id} claimed pages {lease.start_page}-{lease.end_page} "
+                    f"(attempt {lease.attempts})")
+
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(renew_interval)
+                if not await queue.renew(lease):
+                    logger.warning(f"Lease lost for pages {lease.start_page}-{lease.end_page}")
+                    return
+
+        renewer = asyncio.create_task(keep_alive())
+        try:
+            failed_pages = await crawl_range(lease.start_page, lease.end_page)
+        except Exception as e:
+            logger.error(f"Error crawling pages {lease.start_page}-{lease.end_page}: {e}")
+            await _give_back(queue, lease)
+            continue
+        finally:
+            renewer.cancel()
+
+        if failed_pages:
+            logger.error(f"Pages {failed_pages} of range {lease.start_page}-{lease.end_page} could not be fetched")
+            await _give_back(queue, lease)
+            continue
+
+        if await queue.complete(lease):
+            completed += 1
+        else:
+            logger.warning(f"Could not complete pages {lease.start_page}-{lease.end_page}; lease had expired")
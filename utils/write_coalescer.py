@@ -0,0 +1,126 @@
+"""
+NaviCare Write Coalescer
+Group commit for single-row inserts: rows for the same table and columns that arrive within a short
+window are sent as one bulk insert, and each caller gets back its own inserted row
+"""
+
+import asyncio
+import logging
+from typing import Dict, List, Optional, Set, Tuple
+
+from postgrest import APIError
+
+logger = logging.getLogger(__name__)
+
+
+class WriteCoalescer:
+    """Merges concurrent single-row inserts issued through SupabaseClient.insert_row.
+
+    A batch is flushed `window` seconds after its first row arrives, or as soon as it holds
+    `max_batch` rows (scaled down with the database health limit when one is given). Rows
+    rejected for their data are isolated with SupabaseClient.bulk_write's bisection, so only
+    their callers see an APIError; a failed request fails every caller in it.
+    """
+
+    def __init__(self, db_client, window: float, max_batch: int, health=None):
+        self.db_client = db_client
+        self.health = health
+        self.window = window
+        self.max_batch = max_batch
+        self.pending: Dict[Tuple, List[Tuple[Dict, asyncio.Future]]] = {}
+        self.timers: Dict[Tuple, asyncio.TimerHandle] = {}
+        # Flushes in flight; the loop only keeps weak references to tasks
+        self.tasks: Set[asyncio.Task] = set()
+        self.stats = {'rows': 0, 'batches': 0}
+
+    async def insert(self, table: str, row: Dict, columns: Optional[str] = '*') -> Optional[Dict]:
+        """Queue one row and wait for the batch it lands in; returns the inserted row limited to
+        `columns`, or {} when columns is None"""
+        # PostgREST fills missing keys with NULL in a bulk insert, so only rows with the same columns are merged
+        key = (table, tuple(sorted(row)), columns)
+        future = asyncio.get_running_loop().create_future()
+        batch = self.pending.setdefault(key, [])
+        batch.append((row, future))
+
+        max_batch = self.health.scaled(self.max_batch) if self.health else self.max_batch
+        if len(batch) >= max_batch:
+            self._flush_later(key, 0)
+        elif len(batch) == 1:
+            self._flush_later(key, self.window)
+        return await future
+
+    def _flush_later(self, key: Tuple, delay: float):
+        timer = self.timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self.timers[key] = asyncio.get_running_loop().call_later(delay, self._start_flush, key)
+
+    def _start_flush(self, key: Tuple):
+        task = asyncio.get_running_loop().create_task(self.flush(key))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        task.add_done_callback(self._log_failure)
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        if not task.cancelled() and task.exception():
+            logger.error(f"Coalesced write batch failed: {task.exception()}")
+
+    async def close(self):
+        """Flush batches still waiting for their window and wait for every flush in flight"""
+        for key in list(self.pending):
+            timer = self.timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            self._start_flush(key)
+        while self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def flush(self, key: Tuple):
+        """Send one pending batch and resolve its callers' futures"""
+        self.timers.pop(key, None)
+        batch = self.pending.pop(key, [])
+        if not batch:
+            return
+        if self.health:
+            await self.health.wait_until_writable()
+        table, _, columns = key
+        rows = [row for row, _ in batch]
+        self.stats['rows'] += len(rows)
+        self.stats['batches'] += 1
+
+        # Batches whose callers need nothing back are written with return=minimal
+        inserted: Optional[List[Dict]] = [] if columns is not None else None
+        try:
+            _, rejects = await self.db_client.bulk_write(table, rows, returned=inserted,
+                                                         columns=columns or '*')
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        rejected = {id(reject['row']): reject for reject in rejects}
+        returned_rows = iter(inserted) if inserted is not None else None
+        for row, future in batch:
+            reject = rejected.get(id(row))
+            # Returned rows line up with the rows that were not rejected, cancelled callers included
+            if reject:
+                result = None
+            else:
+                result = next(returned_rows, None) if returned_rows is not None else {}
+            if future.done():
+                continue
+            if reject:
+                future.set_exception(APIError({
+                    'message': reject['error'], 'code': reject['code'], 'hint': None, 'details': None
+                }))
+            else:
+                future.set_result(result)
+
+    def summary(self) -> Dict:
+        return {
+            'coalesced_rows': self.stats['rows'],
+            'coalesced_batches': self.stats['batches'],
+            'rows_per_batch': round(self.stats['rows'] / self.stats['batches'], 1) if self.stats['batches'] else 0.0,
+        }
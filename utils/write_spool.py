@@ -0,0 +1,146 @@
+"""
+NaviCare Write Spool
+Local append-only file of built page bundles that could not be written because the database was
+unavailable, drained in order once it recovers
+"""
+
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.bundle_ingest import build_page_bundles, ingest_bundles
+from utils.db_health import CLOSED
+
+logger = logging.getLogger(__name__)
+
+
+class WriteSpool:
+    """Append-only JSON lines file of page write batches, with a drained-up-to byte offset.
+
+    Each line holds one page: its source, URL, the built facility bundles and the source records
+    they came from (so rejected bundles can still be dead-lettered). drain() writes entries in
+    order and checkpoints the offset after each one; bundle ingest is an upsert, so a batch that
+    is written again after a crash mid-drain does no harm. The file is truncated once fully drained.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset_path = f"{path}.offset"
+        self._lock = threading.Lock()
+        self.stats = {'spooled_pages': 0, 'spooled_bundles': 0, 'drained_pages': 0, 'drained_bundles': 0}
+
+    def append(self, source: str, page_url: Optional[str], page_number: Optional[int],
+               bundles: List[Dict], records: List[Dict]):
+        """Spool one page of built bundles"""
+        line = json.dumps({
+            'source': source,
+            'page_url': page_url,
+            'page_number': page_number,
+            'bundles': bundles,
+            'records': records,
+            'spooled_at': datetime.now(timezone.utc).isoformat(),
+        }, default=str) + '\n'
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+            self.stats['spooled_pages'] += 1
+            self.stats['spooled_bundles'] += len(bundles)
+        logger.warning(f"Spooled {len(bundles)} {source} bundles from page {page_number} to {self.path}")
+
+    def _read_offset(self) -> int:
+        try:
+            with open(self.offset_path, 'r', encoding='utf-8') as f:
+                return int(f.read().strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
+
+    def _write_offset(self, offset: int):
+        tmp_path = f"{self.offset_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(str(offset))
+        os.replace(tmp_path, self.offset_path)
+
+    def pending(self) -> bool:
+        """Whether spooled pages are waiting to be written"""
+        return os.path.exists(self.path) and os.path.getsize(self.path) > self._read_offset()
+
+    def _entries(self) -> Iterator[Tuple[int, Optional[Dict]]]:
+        """Yield (offset after the line, entry) for every undrained line; None for corrupt lines"""
+        offset = self._read_offset()
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            while True:
+                line = f.readline()
+                # A line without its newline is still being appended
+                if not line.endswith(b'\n'):
+                    return
+                offset += len(line)
+                try:
+                    yield offset, json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt spool entry in {self.path} before offset {offset}")
+                    yield offset, None
+
+    async def drain(self, write: Callable[[Dict], Awaitable[bool]]) -> int:
+        """Write spooled pages in order until one fails; returns the number of pages drained"""
+        if not self.pending():
+            return 0
+        drained = 0
+        for offset, entry in self._entries():
+            if entry is not None:
+                if not await write(entry):
+                    return drained
+                drained += 1
+                self.stats['drained_pages'] += 1
+                self.stats['drained_bundles'] += len(entry.get('bundles', []))
+            self._write_offset(offset)
+
+        with self._lock:
+            # Start over with an empty file unless another writer appended in the meantime
+            if os.path.getsize(self.path) == self._read_offset():
+                open(self.path, 'w').close()
+                os.remove(self.offset_path)
+        logger.info(f"Drained {drained} spooled pages from {self.path}")
+        return drained
+
+    def summary(self) -> Dict:
+        return {**self.stats, 'spool_pending': self.pending()}
+
+
+async def drain_spool(crawler) -> int:
+    """Write a crawler's spooled pages with its ingest path (bundle RPC or COPY) while the database is writable"""
+    ingest = crawler.copy_loader.load if crawler.copy_loader else None
+
+    async def write(entry: Dict) -> bool:
+        if crawler.db_client.health.state != CLOSED:
+            return False
+        return await ingest_bundles(crawler, entry['source'], entry['bundles'], entry['records'], ingest)
+
+    return await crawler.spool.drain(write)
+
+
+async def spool_page(crawler, source: str, records: List[Dict], page_url: Optional[str],
+                     page_number: Optional[int], build_bundle: Callable[[Dict], Optional[Dict]]) -> bool:
+    """Spool a page instead of writing it while the database circuit breaker is open.
+
+    Older spooled pages are drained first once the database is writable again; if any are left,
+    the new page is spooled behind them so pages reach the database in crawl order. Returns
+    True if the page was spooled. Does nothing when the crawler has no spool.
+    """
+    spool = crawler.spool
+    if spool is None:
+        return False
+    if crawler.db_client.health.state == CLOSED and spool.pending():
+        await drain_spool(crawler)
+    if crawler.db_client.health.state == CLOSED and not spool.pending():
+        return False
+
+    bundles, bundled_records = build_page_bundles(crawler, source, records, build_bundle)
+    spool.append(source, page_url, page_number, bundles, bundled_records)
+    return True
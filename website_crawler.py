@@ -9,6 +9,7 @@ Website crawler for RateMDs facilities.
 import os
 import sys
 import time
+import asyncio
 import random
 import re
 import json
@@ -24,7 +25,7 @@ from dotenv import load_dotenv
 
 # Supabase client helper
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from utils.supabase_client import SupabaseClient
+from utils.supabase_client import SupabaseClient, MINIMAL
 
 # -------------------------
 # Logging configuration
@@ -167,6 +168,7 @@ def update_facility_website(supabase_client: SupabaseClient, website_url: str, f
     """Update the facility website in Supabase.
 
     Matching priority:
+    0) facility id from the local facility mirror, when FACILITY_MIRROR_PATH is set
     1) slug derived from detail_url
     2) name + city + province (if available)
     """
@@ -181,6 +183,16 @@ def update_facility_website(supabase_client: SupabaseClient, website_url: str, f
 
         update_data = {"website": website_url}
 
+        # Resolve the id from the facility mirror when enabled: one update by primary key
+        mirror = supabase_client.mirror
+        known = mirror.find(slug, facility.get("name"), facility.get("city"), facility.get("province")) if mirror else None
+        if known:
+            resp = client.table("facilities").update(update_data, **MINIMAL).eq("id", known["id"]).execute()
+            if resp.count:
+                return True
+            # Mirrored id no longer in the database; fall back to the slug/name matching below
+            mirror.forget(known["id"])
+
         # Try match by slug first
         if slug:
             resp = (
@@ -245,8 +257,9 @@ def main():
         logging.error("SUPABASE_URL and SUPABASE_KEY environment variables are required")
         return
 
-    # Initialize Supabase client
+    # Initialize Supabase client and bring the facility mirror (if enabled) up to date
     supabase_client = SupabaseClient()
+    asyncio.run(supabase_client.sync_mirror())
 
     input_file = "ratemd.json"
 